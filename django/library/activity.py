@@ -0,0 +1,25 @@
+"""
+Append-only user activity log
+
+Events are inserted with bulk_create, which skips per-object save()
+and signal dispatch; batch operations pass all their events in one call.
+"""
+from .caching import invalidate_dashboard
+from .models import ActivityEvent
+
+
+def event(user, action, description, book=None):
+    """Build an unsaved ActivityEvent"""
+    return ActivityEvent(user=user, action=action, description=description[:512], book=book)
+
+
+def record(user, action, description, book=None):
+    """Append a single event to the user's activity log"""
+    record_many([event(user, action, description, book=book)])
+
+
+def record_many(events):
+    """Append many events in one INSERT"""
+    if events:
+        ActivityEvent.objects.bulk_create(events)
+        invalidate_dashboard(*(event.user_id for event in events))
@@ -46,6 +46,15 @@ class BookAdmin(admin.ModelAdmin):
     - Audit trail of modifications
     - Permission-based access controls
     """
-    list_display = ("title", "author", "category", "added_by", "created_at")
+    list_display = ("title", "author", "category", "total_copies", "available_copies", "added_by", "created_at")
+    # Copy counters change atomically through circulation.py (and the API), not via form saves
+    readonly_fields = ("is_available", "total_copies", "available_copies")
+
+    def save_model(self, request, obj, form, change):
+        """Write only the edited fields, so concurrent counter updates survive"""
+        if change:
+            obj.save(update_fields=form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
     search_fields = ("title", "author", "category")
     list_filter = ("category", "added_by")
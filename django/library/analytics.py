@@ -0,0 +1,148 @@
+"""
+Vectorized circulation analytics
+
+Loan columns are streamed from the database with values_list().iterator()
+into NumPy arrays, chunk by chunk, and every figure in the report is then
+computed with array operations instead of per-object Python. Dates are
+held as datetime64[D], so date differences are plain integer day counts.
+
+Unless given a queryset, load_loans() reads the archived loans too (see
+archive.py), so the report covers the whole history.
+
+Fines are recomputed from the dates with the same rule as
+Loan.mark_as_returned and circulation.sweep_overdue (whole days past
+due_date at Loan.FINE_PER_DAY), so the report does not depend on the
+sweep having run.
+"""
+from itertools import chain, islice
+
+import numpy as np
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Book, Loan, LoanArchive
+
+PERCENTILES = (50, 90, 95)
+# Days-overdue buckets for open loans: 1-7, 8-14, 15-30, 31-60, 61-90, 91+
+OVERDUE_BUCKETS = (1, 8, 15, 31, 61, 91)
+
+
+def load_loans(queryset=None, chunk_size=100000):
+    """
+    Read loan columns into NumPy arrays
+
+    Returns a dict of equally long arrays: loan_date, due_date and
+    returned_at (datetime64[D], NaT while a loan is open), book_id and
+    user_id (int64). Without a queryset, both Loan and LoanArchive are read.
+    """
+    querysets = [Loan.objects.all(), LoanArchive.objects.all()] if queryset is None else [queryset]
+    rows = chain.from_iterable(
+        qs.order_by()
+        .annotate(loan_day=TruncDate("loan_date"))
+        .values_list("loan_day", "due_date", "returned_at", "book_id", "user_id")
+        .iterator(chunk_size=chunk_size)
+        for qs in querysets
+    )
+    chunks = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        loan_date, due_date, returned_at, book_id, user_id = zip(*chunk)
+        chunks.append((
+            np.array(loan_date, dtype="datetime64[D]"),
+            np.array(due_date, dtype="datetime64[D]"),
+            np.array(returned_at, dtype="datetime64[D]"),
+            np.array(book_id, dtype=np.int64),
+            np.array(user_id, dtype=np.int64),
+        ))
+    names = ("loan_date", "due_date", "returned_at", "book_id", "user_id")
+    dtypes = ("datetime64[D]",) * 3 + (np.int64,) * 2
+    if not chunks:
+        return {name: np.array([], dtype=dtype) for name, dtype in zip(names, dtypes)}
+    return {name: np.concatenate(column) for name, column in zip(names, zip(*chunks))}
+
+
+def categorize(book_ids):
+    """Map book ids to category codes; returns (codes, category names)"""
+    books = list(Book.objects.order_by("id").values_list("id", "category"))
+    if not books:
+        return np.zeros(len(book_ids), dtype=np.int64), []
+    ids, categories = zip(*books)
+    ids = np.array(ids, dtype=np.int64)
+    names, book_codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+    return book_codes[np.searchsorted(ids, book_ids)], list(names)
+
+
+def duration_summary(days):
+    """Mean and percentiles of an array of loan durations in days"""
+    if not len(days):
+        return {"mean": None, **{f"p{p}": None for p in PERCENTILES}}
+    values = np.percentile(days, PERCENTILES)
+    return {
+        "mean": round(float(days.mean()), 2),
+        **{f"p{p}": round(float(value), 2) for p, value in zip(PERCENTILES, values)},
+    }
+
+
+def circulation_report(today=None, loans=None):
+    """Compute library-wide circulation and fine figures from loan columns"""
+    today = np.datetime64(today or timezone.now().date(), "D")
+    loans = load_loans() if loans is None else loans
+    returned = ~np.isnat(loans["returned_at"])
+
+    # Days past due: at return for returned loans, as of today for open ones
+    end = np.where(returned, loans["returned_at"], today)
+    days_late = np.maximum((end - loans["due_date"]).astype(np.int64), 0)
+    late_returned = returned & (days_late > 0)
+    overdue = ~returned & (days_late > 0)
+
+    fine = Loan.FINE_PER_DAY
+    charged = int(days_late[returned].sum()) * fine
+    outstanding = int(days_late[overdue].sum()) * fine
+
+    buckets = np.searchsorted(OVERDUE_BUCKETS, days_late[overdue], side="right") - 1
+    bucket_counts = np.bincount(buckets, minlength=len(OVERDUE_BUCKETS))
+    labels = [f"{low}-{high - 1}" for low, high in zip(OVERDUE_BUCKETS, OVERDUE_BUCKETS[1:])]
+    labels.append(f"{OVERDUE_BUCKETS[-1]}+")
+
+    durations = (loans["returned_at"][returned] - loans["loan_date"][returned]).astype(np.int64)
+    codes, names = categorize(loans["book_id"])
+    returned_codes = codes[returned]
+    loans_per_category = np.bincount(codes, minlength=len(names))
+    # Group returned durations by category once, then slice each group
+    order = np.argsort(returned_codes, kind="stable")
+    groups = np.split(durations[order], np.cumsum(np.bincount(returned_codes, minlength=len(names)))[:-1])
+
+    return {
+        "as_of": str(today),
+        "loans": {
+            "total": int(len(returned)),
+            "returned": int(returned.sum()),
+            "open": int((~returned).sum()),
+            "overdue": int(overdue.sum()),
+            "borrowers": int(len(np.unique(loans["user_id"]))),
+        },
+        "fines": {
+            "charged": f"{charged:.2f}",
+            "outstanding": f"{outstanding:.2f}",
+            "total": f"{charged + outstanding:.2f}",
+        },
+        "late_returns": {
+            "count": int(late_returned.sum()),
+            "rate": round(float(late_returned.sum() / returned.sum()), 4) if returned.any() else None,
+        },
+        "overdue_distribution": [
+            {"days": label, "count": int(count)} for label, count in zip(labels, bucket_counts)
+        ],
+        "loan_duration": duration_summary(durations),
+        "categories": sorted(
+            (
+                {"category": name, "loans": int(loans_per_category[code]), "returned": len(group),
+                 **duration_summary(group)}
+                for code, (name, group) in enumerate(zip(names, groups))
+                if loans_per_category[code]
+            ),
+            key=lambda row: -row["loans"],
+        ),
+    }
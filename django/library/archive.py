@@ -0,0 +1,81 @@
+"""
+Hot/cold split of the loan history
+
+Returned loans make up nearly all of the loan table but are only read for
+history and statistics. archive_loans() moves those returned before a
+cutoff into LoanArchive in pk batches (one INSERT and two DELETEs per
+batch), so Loan keeps only the hot set that checkout, returns, overdue
+sweeps and dashboards work on.
+
+Readers of the whole history go through loan_history() (one UNION ALL
+over both tables) or, for aggregates, query both tables and combine the
+results. Archiving a loan does not change its status, so the materialized
+loans_returned counter is left alone; stats.aggregate_counters() counts
+archived loans as returned.
+"""
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, Value
+
+from .models import Loan, LoanArchive, NotificationLog
+
+ARCHIVED_FIELDS = ("id", "book_id", "user_id", "loan_date", "due_date", "returned_at", "fine")
+
+
+def archive_loans(before, batch_size=5000):
+    """
+    Move loans returned before the given date into LoanArchive
+
+    Returns the number of loans archived.
+    """
+    returned = Loan.objects.filter(status="RETURNED", returned_at__lt=before)
+    archived = 0
+    while True:
+        batch = list(returned.order_by("pk").values(*ARCHIVED_FIELDS)[:batch_size])
+        if not batch:
+            return archived
+        ids = [row["id"] for row in batch]
+        with transaction.atomic():
+            LoanArchive.objects.bulk_create(LoanArchive(**row) for row in batch)
+            # Reminders only matter while a loan is open
+            NotificationLog.objects.filter(loan_id__in=ids).delete()
+            delete_loans(ids)
+        archived += len(batch)
+
+
+def delete_loans(ids):
+    """
+    Delete loan rows without the per-row post_delete signals
+
+    QuerySet.delete() would send post_delete for every loan and count the
+    archived loans out of loans_returned, but they are still returned
+    loans. Nothing else references a loan once its reminders are gone, so
+    one DELETE statement is all that is needed; the foreign key
+    constraints still reject it if that ever changes.
+    """
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {Loan._meta.db_table} WHERE id IN ({placeholders})", ids)
+
+
+def loan_history(user=None, book=None):
+    """
+    Loans from both tables as one queryset of dicts, newest first
+
+    Rows carry the LoanSerializer fields plus an "archived" flag.
+    """
+    fields = ("id", "book", "user", "loan_date", "due_date", "returned_at", "fine")
+    columns = {
+        "book_title": F("book__title"),
+        "user_username": F("user__username"),
+    }
+    # UNION matches columns by position: model fields come first, then
+    # annotations in order, so status is the first annotation on the archive
+    hot = Loan.objects.values(*fields, "status", **columns, archived=Value(False, output_field=BooleanField()))
+    cold = LoanArchive.objects.values(
+        *fields, status=Value("RETURNED"), **columns, archived=Value(True, output_field=BooleanField())
+    )
+    if user is not None:
+        hot, cold = hot.filter(user=user), cold.filter(user=user)
+    if book is not None:
+        hot, cold = hot.filter(book=book), cold.filter(book=book)
+    return hot.union(cold, all=True).order_by("-loan_date", "-id")
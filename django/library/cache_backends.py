@@ -0,0 +1,263 @@
+"""
+Node-local shared cache backend built on SQLite in WAL mode
+
+All worker processes on a machine open the same database file, so a write
+or an invalidation in one gunicorn worker is immediately visible to the
+others, without running an external cache service.
+
+Configuration:
+    CACHES = {
+        "default": {
+            "BACKEND": "library.cache_backends.SQLiteCache",
+            "LOCATION": "/var/tmp/library_cache.sqlite3",
+            "OPTIONS": {
+                "MAX_SIZE": 64 * 1024 * 1024,  # bytes of pickled values
+                "MAX_ENTRIES": 100000,
+                "CULL_FREQUENCY": 10,          # evict down to 90% when full
+            },
+        }
+    }
+
+Eviction is least-recently-used: reads refresh an entry's access time and,
+when the byte-size or entry cap is exceeded, the oldest entries are
+dropped. Hit and miss counters are kept per process and periodically
+folded into the shared database; get_stats() reports the totals.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed);
+CREATE TABLE IF NOT EXISTS cache_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_meta (name, value) VALUES
+    ('size', 0), ('entries', 0), ('hits', 0), ('misses', 0);
+CREATE TRIGGER IF NOT EXISTS cache_entries_insert AFTER INSERT ON cache_entries BEGIN
+    UPDATE cache_meta SET value = value + NEW.size WHERE name = 'size';
+    UPDATE cache_meta SET value = value + 1 WHERE name = 'entries';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_delete AFTER DELETE ON cache_entries BEGIN
+    UPDATE cache_meta SET value = value - OLD.size WHERE name = 'size';
+    UPDATE cache_meta SET value = value - 1 WHERE name = 'entries';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_entries_update AFTER UPDATE OF size ON cache_entries BEGIN
+    UPDATE cache_meta SET value = value + NEW.size - OLD.size WHERE name = 'size';
+END;
+"""
+
+# Reads refresh an entry's LRU timestamp at most this often (seconds)
+TOUCH_RESOLUTION = 1.0
+# Local hit/miss counters are written to the shared database this often
+STATS_FLUSH_INTERVAL = 1.0
+
+
+class SQLiteCache(BaseCache):
+    """Size-bounded LRU cache shared by all processes through one SQLite file"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = str(location)
+        self._max_size = int(options.get("MAX_SIZE", params.get("max_size", 64 * 1024 * 1024)))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._pending = {"hits": 0, "misses": 0}
+        self._last_flush = time.monotonic()
+
+    # Connection handling
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _write(self, statements):
+        """Run (sql, params) pairs in one IMMEDIATE transaction and return the last cursor"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = None
+            for sql, params in statements:
+                cursor = connection.execute(sql, params)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor
+
+    # Statistics
+
+    def _record(self, counter):
+        with self._stats_lock:
+            self._pending[counter] += 1
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Fold this process's hit/miss counters into the shared totals"""
+        with self._stats_lock:
+            pending, self._pending = self._pending, {"hits": 0, "misses": 0}
+            self._last_flush = time.monotonic()
+        if not any(pending.values()):
+            return
+        self._write([
+            ("UPDATE cache_meta SET value = value + ? WHERE name = ?", (count, name))
+            for name, count in pending.items()
+        ])
+
+    def get_stats(self):
+        """Return shared hit/miss counters and current size of the cache"""
+        self.flush_stats()
+        stats = dict(self._connection().execute("SELECT name, value FROM cache_meta"))
+        stats["max_size"] = self._max_size
+        stats["max_entries"] = self._max_entries
+        return stats
+
+    # Cache API
+
+    def _expiry(self, timeout):
+        """Absolute expiry time for a timeout, or None for never"""
+        return self.get_backend_timeout(timeout)
+
+    def _store(self, key, value, timeout, mode):
+        expires = self._expiry(timeout)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        if mode == "add":
+            statements = [
+                ("DELETE FROM cache_entries WHERE key = ? AND expires IS NOT NULL AND expires <= ?", (key, now)),
+                (
+                    "INSERT OR IGNORE INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, expires, now, len(blob)),
+                ),
+            ]
+        else:
+            statements = [(
+                "INSERT INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires, "
+                "accessed = excluded.accessed, size = excluded.size",
+                (key, blob, expires, now, len(blob)),
+            )]
+        stored = self._write(statements).rowcount > 0
+        if stored:
+            self._cull_if_needed()
+        return stored
+
+    def _cull_if_needed(self):
+        """Evict expired entries, then least recently used ones, once over a cap"""
+        connection = self._connection()
+        meta = dict(connection.execute("SELECT name, value FROM cache_meta WHERE name IN ('size', 'entries')"))
+        if meta["size"] <= self._max_size and meta["entries"] <= self._max_entries:
+            return
+        keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+        self._write([
+            ("DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)),
+            (
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM ("
+                "  SELECT key,"
+                "   SUM(size) OVER (ORDER BY accessed DESC, key ROWS UNBOUNDED PRECEDING) AS kept_size,"
+                "   ROW_NUMBER() OVER (ORDER BY accessed DESC, key) AS kept_entries"
+                "  FROM cache_entries)"
+                " WHERE kept_size > ? OR kept_entries > ?)",
+                (int(self._max_size * keep), int(self._max_entries * keep)),
+            ),
+        ])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store(key, value, timeout, "add")
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, timeout, "set")
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            "SELECT value, expires, accessed FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            self._record("misses")
+            return default
+        value, _, accessed = row
+        if now - accessed >= TOUCH_RESOLUTION:
+            connection.execute("UPDATE cache_entries SET accessed = ? WHERE key = ?", (now, key))
+        self._record("hits")
+        return pickle.loads(value)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write([(
+            "UPDATE cache_entries SET expires = ?, accessed = ? "
+            "WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self._expiry(timeout), time.time(), key, time.time()),
+        )])
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._write([("DELETE FROM cache_entries WHERE key = ?", (key,))])
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically increment a value across all processes"""
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                "UPDATE cache_entries SET value = ?, size = ?, accessed = ? WHERE key = ?",
+                (blob, len(blob), time.time(), key),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return new_value
+
+    def clear(self):
+        self._write([("DELETE FROM cache_entries", ())])
@@ -0,0 +1,129 @@
+"""
+Versioned caching for catalog (book) responses, and per-user dashboards
+
+Every cached catalog response is stored under the current catalog version,
+using the cache framework's built-in key versioning. Any write to the
+catalog bumps the version, so all cached listings go stale at once and can
+otherwise be cached without a timeout. Old versions are never read again
+and age out of the cache through normal eviction.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = "library:catalog_version"
+
+
+def _initial_version():
+    """Seed for a missing counter; time-based so it never reuses an old version"""
+    return time.time_ns() // 1000
+
+
+def get_catalog_version():
+    """Return the current catalog version, creating the counter if needed"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, _initial_version())
+    return version
+
+
+def _incr_catalog_version():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached catalog response
+
+    Bumps immediately, and again once the surrounding transaction commits,
+    so a response rendered from pre-commit data cannot outlive the write.
+    """
+    _incr_catalog_version()
+    transaction.on_commit(_incr_catalog_version)
+
+
+def catalog_cache_key(prefix, request):
+    """Build a cache key for a catalog response from the full request URL"""
+    url = request.build_absolute_uri()
+    return f"library:catalog:{prefix}:{hashlib.md5(url.encode()).hexdigest()}"
+
+
+def catalog_cache_page(view_func):
+    """
+    Cache a Django view's rendered GET responses under the catalog version
+
+    Drop-in replacement for cache_page on catalog views: entries never
+    time out but are invalidated by bump_catalog_version().
+    """
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view_func(request, *args, **kwargs)
+        key = catalog_cache_key("page", request)
+        version = get_catalog_version()
+        cached = cache.get(key, version=version)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, "render") and callable(response.render):
+                response.render()
+            cache.set(key, (response.content, response["Content-Type"]), timeout=None, version=version)
+        return response
+    return wrapped_view
+
+
+class CatalogCacheMixin:
+    """
+    Caches list and retrieve responses of a catalog ViewSet
+
+    The serialized data (not the rendered bytes) is cached, so content
+    negotiation still picks the renderer per request. Permission checks
+    run before the cache is consulted.
+    """
+
+    def cached_response(self, prefix, handler, request, *args, **kwargs):
+        """Serve handler's data from the cache, filling it on a miss"""
+        key = catalog_cache_key(prefix, request)
+        version = get_catalog_version()
+        data = cache.get(key, version=version)
+        if data is None:
+            data = handler(request, *args, **kwargs).data
+            cache.set(key, data, timeout=None, version=version)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response("list", super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response("detail", super().retrieve, request, *args, **kwargs)
+
+
+def dashboard_cache_key(user_id):
+    """Cache key of a user's compiled dashboard payload"""
+    return f"library:dashboard:{user_id}"
+
+
+def invalidate_dashboard(*user_ids):
+    """
+    Drop the cached dashboards of the given users
+
+    Deletes immediately, and again once the surrounding transaction
+    commits, mirroring bump_catalog_version().
+    """
+    keys = [dashboard_cache_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,561 @@
+"""
+Set-based loan circulation
+
+Books carry copy counters (total_copies, available_copies) that are only
+changed here, with atomic F() updates, never through Book.save().
+is_available mirrors "at least one copy on the shelf" and flips in a
+second conditional UPDATE, whose row count tells exactly whether the
+materialized books_available counter moves.
+
+checkout() claims a copy and records the loan in one transaction; the claim
+is a single conditional UPDATE, so concurrent checkouts of the last copy
+cannot both succeed.
+bulk_checkout() and bulk_return() handle a whole desk scan with a fixed
+number of statements, whatever the number of items.
+
+Reservations form a FIFO hold queue per book. place_hold() sets a shelf
+copy aside (ACTIVE, until the pickup deadline) or appends the patron to
+the queue (WAITING, ordered by position). Returned copies go through
+restock(), which hands them to the heads of the queues before any reach
+the shelf: waiters whose wait ran out are expired in one UPDATE, the
+next in line per book are picked in one windowed query over
+reservation_queue_idx and promoted in another UPDATE, so a return costs
+the same number of queries however long the queue is.
+
+expire_holds() is the bulk counterpart of that lazy expiry: it expires
+every hold past expires_at in pk batches through reservation_expiry_idx,
+passing held copies on. purge_holds() deletes closed holds past the
+retention period in chunks.
+
+sweep_overdue() moves ACTIVE loans past their due date to OVERDUE and keeps
+the accrued fine of every overdue loan current, entirely in SQL: loans are
+picked in primary-key batches through loan_status_due_idx and each batch is
+written with a single UPDATE. A run with nothing to do only scans the
+overdue slice of that index, so the job is safe to schedule every minute.
+
+Queryset updates bypass the model signals, so every function here adjusts
+the materialized counters, the catalog version and dashboards itself.
+Every transaction here runs in stats.atomic(), so the counter rows are
+written once, last and in the same order by all of them.
+
+Lock order: every transaction locks the book rows it touches first, in pk
+order (lock_books()), then loan and reservation rows, and the counter
+rows last, so no two circulation transactions can wait on each other in
+a cycle. On SQLite, which locks the whole database, lock_books() is a
+no-op.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Func, IntegerField, Max, Value, When, Window
+from django.db.models.functions import Least, RowNumber
+from django.utils import timezone
+
+from . import activity, stats
+from .caching import bump_catalog_version, invalidate_dashboard
+from .models import Book, Loan, Reservation
+
+# Most items accepted by one bulk_checkout / bulk_return call
+BULK_LIMIT = 100
+# Days a copy set aside for a hold waits for pickup
+HOLD_PICKUP_DAYS = 3
+# Days a patron waits in a hold queue before the hold expires
+HOLD_WAIT_DAYS = 30
+# Reservation statuses that are final, and eventually purged
+CLOSED_HOLD_STATUSES = ("FULFILLED", "EXPIRED", "CANCELLED")
+
+
+class BookUnavailable(Exception):
+    """No copy of the requested book is on the shelf"""
+
+
+class CopiesOnLoan(Exception):
+    """More copies would be removed than are on the shelf"""
+
+
+class AlreadyReserved(Exception):
+    """The patron already holds or waits for the book"""
+
+
+class AlreadyReturned(Exception):
+    """The loan was returned, possibly by a concurrent request"""
+
+
+class HoldClosed(Exception):
+    """The reservation is no longer waiting or held, possibly changed concurrently"""
+
+
+def lock_books(book_ids):
+    """Lock the rows of book_ids in pk order, before any loan, reservation or counter row"""
+    list(Book.objects.select_for_update().filter(pk__in=set(book_ids)).order_by("pk").values_list("pk", flat=True))
+
+
+def claim_copies(book_ids):
+    """
+    Take one copy of each book off the shelf; returns how many were claimed
+
+    Books without a copy on the shelf are skipped, so callers compare the
+    result with len(book_ids).
+    """
+    claimed = Book.objects.filter(pk__in=book_ids, is_available=True, available_copies__gt=0).update(
+        available_copies=F("available_copies") - 1
+    )
+    emptied = Book.objects.filter(pk__in=book_ids, is_available=True, available_copies=0).update(is_available=False)
+    stats.adjust(copies_available=-claimed, books_available=-emptied)
+    return claimed
+
+
+def release_copies(book_ids):
+    """Put returned copies back on the shelf; book_ids may repeat a book"""
+    counts = Counter(book_ids)
+    if not counts:
+        return
+    if len(counts) == 1:
+        returned = Value(next(iter(counts.values())))
+    else:
+        returned = Case(
+            *[When(pk=pk, then=Value(count)) for pk, count in counts.items()], output_field=IntegerField()
+        )
+    # Least() keeps legacy rows (lent without a claimed copy) within their stock
+    Book.objects.filter(pk__in=counts).update(
+        available_copies=Least(F("available_copies") + returned, F("total_copies"))
+    )
+    restocked = Book.objects.filter(pk__in=counts, is_available=False, available_copies__gt=0).update(
+        is_available=True
+    )
+    stats.adjust(copies_available=sum(counts.values()), books_available=restocked)
+
+
+def checkout(book, user, due_date):
+    """
+    Lend a copy of book to user atomically and return the new Loan
+
+    A copy held for user is picked up instead of claiming one from the
+    shelf. Raises BookUnavailable if other checkouts claimed every copy
+    first.
+    """
+    with stats.atomic():
+        lock_books([book.pk])
+        held = bool(pick_up_holds([book.pk], user))
+        # UPDATE ... SET available_copies = available_copies - 1
+        # WHERE id = %s AND is_available AND available_copies > 0
+        if not held and not claim_copies([book.pk]):
+            raise BookUnavailable(book.pk)
+        loan = Loan.objects.create(book=book, user=user, due_date=due_date)
+        if not held:
+            bump_catalog_version()
+    if not held:
+        book.available_copies -= 1
+        book.is_available = book.available_copies > 0
+    return loan
+
+
+def return_loan(loan, today=None):
+    """
+    Close loan and put its copy back on the shelf, in one transaction
+
+    The loan is re-read under lock, so a stale instance (returned or swept
+    to OVERDUE since it was loaded) never returns a copy twice or moves the
+    wrong status counter. Raises AlreadyReturned if it is already closed.
+    """
+    with stats.atomic():
+        lock_books([loan.book_id])
+        locked = Loan.objects.select_for_update().get(pk=loan.pk)
+        if locked.status == "RETURNED":
+            raise AlreadyReturned(loan.pk)
+        # The signals move the counter of the locked row's status
+        locked.close(today or timezone.now().date())
+        locked.save()
+        restock([loan.book_id])
+        bump_catalog_version()
+    loan.status, loan.returned_at, loan.fine = locked.status, locked.returned_at, locked.fine
+    loan._counted_status = locked.status
+
+
+def set_total_copies(book, total_copies):
+    """
+    Change how many copies of book the library owns
+
+    Copies on loan are kept; raises CopiesOnLoan if fewer copies would
+    remain than are currently lent out.
+    """
+    with stats.atomic():
+        locked = Book.objects.select_for_update().get(pk=book.pk)
+        delta = total_copies - locked.total_copies
+        available = locked.available_copies + delta
+        if available < 0:
+            raise CopiesOnLoan(locked.total_copies - locked.available_copies)
+        if delta > 0:
+            # New copies serve the hold queue before reaching the shelf
+            available -= serve_queues(Counter({book.pk: delta}))[book.pk]
+        Book.objects.filter(pk=book.pk).update(
+            total_copies=total_copies, available_copies=available, is_available=available > 0
+        )
+        stats.adjust(
+            copies_total=delta,
+            copies_available=available - locked.available_copies,
+            books_available=int(available > 0) - int(locked.is_available),
+        )
+        bump_catalog_version()
+    book.total_copies, book.available_copies, book.is_available = total_copies, available, available > 0
+
+
+def bulk_checkout(book_ids, user, due_date):
+    """
+    Lend one copy each of several books to one user in a single transaction
+
+    Availability is read and locked in one query, copies held for user are
+    picked up and the rest claimed with one UPDATE each, and the loans
+    inserted with one bulk INSERT. Returns one
+    result per requested id, in request order: {"book", "loan"} on success,
+    {"book", "error"} otherwise.
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    with stats.atomic():
+        books = Book.objects.select_for_update().order_by("pk").in_bulk(book_ids)
+        held = pick_up_holds(list(books), user)
+        claimable = [
+            pk for pk in book_ids
+            if pk in books and pk not in held and books[pk].is_available and books[pk].available_copies > 0
+        ]
+        if claim_copies(claimable) != len(claimable):
+            # Only reachable without row locks (SQLite): another writer got in first
+            raise BookUnavailable(claimable)
+        loans = Loan.objects.bulk_create(
+            Loan(book=books[pk], user=user, due_date=due_date) for pk in book_ids if pk in held or pk in claimable
+        )
+        # bulk_create skips the model signals
+        stats.adjust(**{stats.loan_counter("ACTIVE"): len(loans)})
+        if loans:
+            bump_catalog_version()
+            # Also invalidates the borrower's dashboard
+            activity.record_many([
+                activity.event(user, "LOAN_CREATED", f"Loan created for '{loan.book.title}'", book=loan.book)
+                for loan in loans
+            ])
+
+    loans_by_book = {loan.book_id: loan for loan in loans}
+    results = []
+    for pk in book_ids:
+        if pk in loans_by_book:
+            results.append({"book": pk, "loan": loans_by_book[pk].pk})
+        elif pk in books:
+            results.append({"book": pk, "error": "Book is currently unavailable."})
+        else:
+            results.append({"book": pk, "error": "Book not found."})
+    return results
+
+
+def bulk_return(loan_ids, queryset=None, today=None):
+    """
+    Return several loans in a single transaction
+
+    queryset restricts which loans may be returned (e.g. the caller's own).
+    Loans are read and locked in one query, closed with one bulk_update and
+    their copies passed on with restock(). Returns one result per requested
+    id, in request order: {"loan", "fine"} on success, {"loan", "error"}
+    otherwise.
+    """
+    loan_ids = list(dict.fromkeys(loan_ids))
+    queryset = Loan.objects.all() if queryset is None else queryset
+    today = today or timezone.now().date()
+    with stats.atomic():
+        lock_books(queryset.filter(pk__in=loan_ids).values_list("book_id", flat=True))
+        loans = queryset.select_for_update(of=("self",)).select_related("book").in_bulk(loan_ids)
+        open_loans = [loans[pk] for pk in loan_ids if pk in loans and loans[pk].status != "RETURNED"]
+        deltas = {stats.loan_counter("RETURNED"): len(open_loans)}
+        for loan in open_loans:
+            counter = stats.loan_counter(loan.status)
+            deltas[counter] = deltas.get(counter, 0) - 1
+            loan.close(today)
+        Loan.objects.bulk_update(open_loans, ["status", "returned_at", "fine"])
+        restock([loan.book_id for loan in open_loans])
+        # bulk_update skips the model signals
+        stats.adjust(**deltas)
+        if open_loans:
+            bump_catalog_version()
+            invalidate_dashboard(*(loan.user_id for loan in open_loans))
+
+    returned = {loan.pk for loan in open_loans}
+    results = []
+    for pk in loan_ids:
+        if pk not in loans:
+            results.append({"loan": pk, "error": "Loan not found."})
+        elif pk in returned:
+            results.append({"loan": pk, "fine": f"{loans[pk].fine:.2f}"})
+        else:
+            results.append({"loan": pk, "error": "Book already returned!"})
+    return results
+
+
+def place_hold(book, user):
+    """
+    Reserve book for user and return the new Reservation
+
+    A copy on the shelf is set aside at once (ACTIVE, to be picked up
+    within HOLD_PICKUP_DAYS); otherwise the patron joins the end of the
+    book's queue (WAITING, for at most HOLD_WAIT_DAYS). Raises
+    AlreadyReserved if user already holds or waits for the book.
+    """
+    now = timezone.now()
+    with stats.atomic():
+        # Serializes holds on the book, so two patrons never get the same position
+        lock_books([book.pk])
+        if Reservation.objects.filter(book=book, user=user, status__in=("WAITING", "ACTIVE")).exists():
+            raise AlreadyReserved(book.pk)
+        if claim_copies([book.pk]):
+            reservation = Reservation.objects.create(
+                book=book, user=user, status="ACTIVE", expires_at=now + timedelta(days=HOLD_PICKUP_DAYS)
+            )
+            bump_catalog_version()
+            return reservation
+        # Positions only grow; a patron leaving the queue leaves a harmless gap
+        last = Reservation.objects.filter(book=book, status="WAITING").aggregate(last=Max("position"))["last"]
+        return Reservation.objects.create(
+            book=book, user=user, status="WAITING", position=(last or 0) + 1,
+            expires_at=now + timedelta(days=HOLD_WAIT_DAYS),
+        )
+
+
+def serve_queues(copies):
+    """
+    Hand returned copies to the heads of the books' hold queues
+
+    copies maps book id -> copies coming back. Waiters whose wait ran out
+    are expired on the way (lazily, in one UPDATE); the next in line get
+    the copies set aside for pickup. Runs a fixed number of queries, and
+    returns a Counter of copies handed out per book.
+    """
+    copies = {pk: count for pk, count in copies.items() if count > 0}
+    if not copies:
+        return Counter()
+    now = timezone.now()
+    waiting = Reservation.objects.filter(book_id__in=copies, status="WAITING")
+    expired = waiting.filter(expires_at__lte=now).update(status="EXPIRED")
+
+    # ROW_NUMBER() OVER (PARTITION BY book_id ORDER BY position, id), via reservation_queue_idx
+    candidates = [
+        hold for hold in (
+            waiting.annotate(
+                rank=Window(RowNumber(), partition_by=[F("book_id")], order_by=[F("position").asc(), F("id").asc()])
+            )
+            .filter(rank__lte=max(copies.values()))
+            .select_related("book", "user")
+        )
+        if hold.rank <= copies[hold.book_id]
+    ]
+    if not candidates:
+        heads, ready = [], 0
+    else:
+        # Window queries cannot lock rows: lock the picked holds and keep only
+        # those still waiting, so a hold promoted by a concurrent writer is not
+        # counted (or announced) twice and its copy goes to the shelf instead
+        still_waiting = set(
+            Reservation.objects.select_for_update()
+            .filter(pk__in=[hold.pk for hold in candidates], status="WAITING")
+            .values_list("pk", flat=True)
+        )
+        heads = [hold for hold in candidates if hold.pk in still_waiting]
+        ready = Reservation.objects.filter(pk__in=still_waiting, status="WAITING").update(
+            status="ACTIVE", expires_at=now + timedelta(days=HOLD_PICKUP_DAYS)
+        )
+    # queryset updates skip the model signals
+    stats.adjust(
+        reservations_waiting=-(expired + ready), reservations_expired=expired, reservations_active=ready,
+    )
+    # Also invalidates the patrons' dashboards
+    activity.record_many([
+        activity.event(hold.user, "HOLD_READY", f"Reserved copy of '{hold.book.title}' is ready for pickup",
+                       book=hold.book)
+        for hold in heads
+    ])
+    return Counter(hold.book_id for hold in heads)
+
+
+def restock(book_ids):
+    """Pass returned copies to waiting patrons first and the rest to the shelf"""
+    returned = Counter(book_ids)
+    release_copies(list((returned - serve_queues(returned)).elements()))
+
+
+def pick_up_holds(book_ids, user):
+    """
+    Fulfil user's ACTIVE holds on book_ids; returns the set of books picked up
+
+    The held copies are already off the shelf, so the caller lends them
+    without claiming another.
+    """
+    holds = Reservation.objects.filter(
+        book_id__in=book_ids, user=user, status="ACTIVE", expires_at__gt=timezone.now()
+    )
+    picked = set(holds.values_list("book_id", flat=True))
+    if picked:
+        fulfilled = holds.update(status="FULFILLED")
+        stats.adjust(reservations_active=-fulfilled, reservations_fulfilled=fulfilled)
+    return picked
+
+
+def close_hold(reservation, status):
+    """
+    Expire or cancel reservation; a copy it held goes to the next in line
+
+    The reservation is re-read under lock: raises HoldClosed if it was
+    picked up, cancelled or expired since it was loaded, so a copy already
+    lent is never put back on the shelf.
+    """
+    with stats.atomic():
+        lock_books([reservation.book_id])
+        locked = Reservation.objects.select_for_update().get(pk=reservation.pk)
+        if locked.status not in ("WAITING", "ACTIVE"):
+            raise HoldClosed(reservation.pk)
+        held = locked.status == "ACTIVE"
+        locked.status = status
+        locked.save()
+        if held:
+            restock([reservation.book_id])
+            bump_catalog_version()
+    reservation.status = reservation._counted_status = status
+
+
+class DaysSince(Func):
+    """Whole days from a date expression to a given (later) date"""
+    output_field = IntegerField()
+
+    def __init__(self, expression, today):
+        super().__init__(Value(today), expression)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date is an integer number of days
+        return super().as_sql(compiler, connection, template="(%(expressions)s)", arg_joiner=" - ", **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="CAST(julianday(%(expressions)s) AS INTEGER)", arg_joiner=") - julianday(",
+            **extra_context,
+        )
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function="DATEDIFF", arg_joiner=", ", **extra_context)
+
+
+def accrued_fine(today):
+    """SQL expression for a loan's fine as of today"""
+    return ExpressionWrapper(
+        DaysSince("due_date", today) * Value(Loan.FINE_PER_DAY),
+        output_field=DecimalField(max_digits=6, decimal_places=2),
+    )
+
+
+def _sweep(queryset, batch_size, changes, counters=None):
+    """
+    Apply changes to queryset in pk batches until it is empty
+
+    counters, if given, is an (old, new) pair of status counters the
+    updated rows move between. Returns the number of rows updated.
+    """
+    updated = 0
+    while True:
+        batch = list(queryset.order_by("pk").values_list("pk", "user_id")[:batch_size])
+        if not batch:
+            return updated
+        with stats.atomic():
+            # Re-apply the filter so loans returned meanwhile are left alone
+            count = queryset.filter(pk__in=[pk for pk, _ in batch]).update(**changes)
+            if counters:
+                old, new = counters
+                stats.adjust(**{old: -count, new: count})
+            invalidate_dashboard(*(user_id for _, user_id in batch))
+        updated += count
+
+
+def sweep_overdue(today=None, batch_size=5000):
+    """
+    Mark loans past due as OVERDUE and bring their fines up to date
+
+    Returns:
+        (marked, accrued): loans moved to OVERDUE, and already-overdue loans
+        whose fine grew since the last sweep
+    """
+    today = today or timezone.now().date()
+    fine = accrued_fine(today)
+    marked = _sweep(
+        Loan.objects.filter(status="ACTIVE", due_date__lt=today),
+        batch_size, {"status": "OVERDUE", "fine": fine},
+        counters=(stats.loan_counter("ACTIVE"), stats.loan_counter("OVERDUE")),
+    )
+    accrued = _sweep(
+        Loan.objects.filter(status="OVERDUE", due_date__lt=today).filter(fine__lt=fine),
+        batch_size, {"fine": fine},
+    )
+    return marked, accrued
+
+
+def expire_holds(now=None, batch_size=5000):
+    """
+    Expire every hold past its deadline and pass held copies on
+
+    WAITING holds are expired with one UPDATE per batch. ACTIVE holds are
+    locked and expired per batch, and their copies go through restock(),
+    so the next patrons in line get them.
+
+    Returns:
+        (waiting, held): expired holds that were queued, and that had a copy set aside
+    """
+    now = now or timezone.now()
+    waiting = _sweep(
+        Reservation.objects.filter(status="WAITING", expires_at__lte=now),
+        batch_size, {"status": "EXPIRED"},
+        counters=(stats.reservation_counter("WAITING"), stats.reservation_counter("EXPIRED")),
+    )
+    stale = Reservation.objects.filter(status="ACTIVE", expires_at__lte=now)
+    held = 0
+    while True:
+        batch = list(stale.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            return waiting, held
+        with stats.atomic():
+            lock_books(stale.filter(pk__in=batch).values_list("book_id", flat=True))
+            # Re-read under lock so holds picked up meanwhile are left alone
+            holds = list(stale.select_for_update().filter(pk__in=batch).values_list("pk", "book_id", "user_id"))
+            Reservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).update(status="EXPIRED")
+            stats.adjust(**{
+                stats.reservation_counter("ACTIVE"): -len(holds),
+                stats.reservation_counter("EXPIRED"): len(holds),
+            })
+            restock([book_id for _, book_id, _ in holds])
+            bump_catalog_version()
+            invalidate_dashboard(*(user_id for _, _, user_id in holds))
+        held += len(holds)
+
+
+def purge_holds(before, batch_size=5000):
+    """
+    Delete closed holds created before the given datetime, in chunks
+
+    Returns the number of reservations deleted.
+    """
+    closed = Reservation.objects.filter(status__in=CLOSED_HOLD_STATUSES, created_at__lt=before)
+    deleted = 0
+    while True:
+        batch = list(closed.order_by("pk").values_list("pk", "status")[:batch_size])
+        if not batch:
+            return deleted
+        with stats.atomic():
+            # One DELETE through the cursor instead of QuerySet.delete(), which
+            # would load every hold to send its post_delete signal. Nothing
+            # references reservations, and the signals' counter updates are
+            # replaced by one adjustment per status; closed holds are not on
+            # any dashboard, so no cache needs invalidating
+            placeholders = ", ".join(["%s"] * len(batch))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"DELETE FROM {Reservation._meta.db_table} WHERE id IN ({placeholders})",
+                    [pk for pk, _ in batch],
+                )
+            stats.adjust(**{
+                stats.reservation_counter(status): -count
+                for status, count in Counter(status for _, status in batch).items()
+            })
+        deleted += len(batch)
@@ -0,0 +1,56 @@
+"""
+Production-safe per-request database instrumentation
+
+QueryRecorder is a connection.execute_wrapper that counts queries and the
+time spent in them. It also tallies each distinct SQL string, so repeated
+query shapes (the same statement with different parameters, the usual
+sign of an N+1 lookup) can be found once the request is done. Per query
+it costs two perf_counter() calls and a dict increment; SQL is only
+normalized into shapes at the end, once per distinct statement.
+"""
+import re
+import time
+from collections import Counter
+
+# "IN (%s, %s, %s)" -> "IN (%s, ...)", so batches of any size share a shape
+PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+# Inlined numbers, e.g. LIMIT 51
+NUMBER = re.compile(r"\b\d+\b")
+
+
+def query_shape(sql):
+    """SQL with parameter lists and inlined numbers collapsed"""
+    return NUMBER.sub("N", PLACEHOLDER_LIST.sub("%s, ...", sql))
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper recording query count, time and shapes
+
+    Install with connection.execute_wrapper(recorder) around a unit of work.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def shapes(self):
+        """Counter of executions per query shape"""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[query_shape(sql)] += count
+        return shapes
+
+    def repeated(self, threshold):
+        """[(shape, count)] of shapes executed at least threshold times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes().most_common() if count >= threshold]
@@ -0,0 +1,123 @@
+"""
+Fast list serialization and JSON rendering
+
+Building a ModelSerializer representation walks every field of every
+object (and, for loans, book.title and user.username through the related
+instances), which dominates the CPU time of large listings. For list
+actions, ValuesListMixin reads the page as values_list() rows instead and
+turns each row into the serializer's output with one converter per field,
+taken from the serializer's own fields. No model instance or per-object
+field walk is involved, and the output is the same.
+
+FastJSONRenderer renders responses with orjson when it is installed and
+with JSONRenderer's stdlib encoder otherwise; both produce the same bytes
+for the data these endpoints return.
+
+FAST_LISTS=False switches list actions back to the serializers.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+try:
+    import orjson
+except ImportError:
+    # Optional: JSONRenderer's stdlib encoder is used instead
+    orjson = None
+
+# Field classes whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = {
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField,
+    serializers.IntegerField, serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField,
+}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when available
+
+    Output matches JSONRenderer byte for byte: compact separators, UTF-8
+    without escaping, U+2028/U+2029 escaped, and everything that is not a
+    JSON primitive (dates, decimals, dataclasses...) converted by the same
+    encoder_class. Indented output, ASCII-only settings and values orjson
+    cannot encode (e.g. integers beyond 64 bits) fall back to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+class ValuesListMixin:
+    """
+    Serves a ViewSet's list action from values_list() rows
+
+    Each readable serializer field is read from the column named by its
+    source (book.title -> book__title). Fields the column cannot express
+    directly, such as StringRelatedField, map to a column or expression in
+    `list_columns` that yields the final representation; expressions are
+    annotated onto the queryset. Pagination, filtering and caching work as
+    on the serializer path; keyset pagination reads its position from the
+    named rows.
+    """
+    list_columns = {}
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_LISTS:
+            return super().list(request, *args, **kwargs)
+        names, columns, converters, queryset = self.list_plan(self.filter_queryset(self.get_queryset()))
+        rows = queryset.values_list(*columns, named=True)
+        page = self.paginate_queryset(rows)
+        data = self.list_data(rows if page is None else page, names, converters)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def list_plan(self, queryset):
+        """Return (output names, columns, {name: converter}, queryset with expressions annotated)"""
+        names, columns, converters, annotations = [], [], {}, {}
+        for field in self.get_serializer().fields.values():
+            if field.write_only:
+                continue
+            name = field.field_name
+            column = self.list_columns.get(name)
+            if column is None:
+                if field.source == "*" or (
+                    isinstance(field, serializers.RelatedField)
+                    and not isinstance(field, serializers.PrimaryKeyRelatedField)
+                ):
+                    raise ImproperlyConfigured(
+                        f"{type(self).__name__}.list_columns needs an entry for the field '{name}'."
+                    )
+                column = field.source.replace(".", "__")
+            elif not isinstance(column, str):
+                annotations[f"list_{name}"], column = column, f"list_{name}"
+            names.append(name)
+            columns.append(column)
+            if name in self.list_columns or type(field) in PASSTHROUGH_FIELDS:
+                continue
+            converters[name] = field.to_representation
+        return names, columns, converters, queryset.annotate(**annotations) if annotations else queryset
+
+    def list_data(self, rows, names, converters):
+        """Build the serializer-shaped dicts; None is never converted, as in Serializer.to_representation"""
+        data = [dict(zip(names, row)) for row in rows]
+        for name, convert in converters.items():
+            for item in data:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+        return data
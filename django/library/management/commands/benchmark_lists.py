@@ -0,0 +1,124 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from library import listing
+from library.caching import bump_catalog_version
+from library.models import Book, Loan
+from library.views import BookViewSet, LoanViewSet
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+User = get_user_model()
+
+# Titles that exercise the encoders: accents, CJK, quotes and U+2028
+TITLES = ("Benchmark Book", "Zażółć gęślą jaźń", "吾輩は猫である", 'The "Quoted" Book', "Line\u2028Separator")
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed books and loans, then time the book and loan list endpoints "
+        "rendered through the serializers and through the values_list() + "
+        "orjson path, and check both return identical bytes. All changes are "
+        "rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Number of books and of loans to seed.")
+        parser.add_argument("--page-size", type=int, default=500, help="Items per listed page.")
+        parser.add_argument("--repeat", type=int, default=10, help="Timed requests per path; the best is reported.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data.")
+
+    def handle(self, *args, **options):
+        if options["rows"] < 1 or options["page_size"] < 1 or options["repeat"] < 1:
+            raise CommandError("--rows, --page-size and --repeat must be positive.")
+        random.seed(options["seed"])
+        page_size = options["page_size"]
+        encoder = "orjson" if listing.orjson is not None else "stdlib json"
+        # Requests are built in-process: allow the request factory's host, and pages of --page-size
+        overrides = override_settings(
+            ALLOWED_HOSTS=["testserver"], PAGE_SIZE_LIMITS={"book": page_size, "loan": page_size},
+        )
+        with transaction.atomic(), overrides:
+            librarian = self.seed(options["rows"])
+            results = {}
+            endpoints = (("GET /api/books/", BookViewSet, "book"), ("GET /api/loans/", LoanViewSet, "loan"))
+            for label, viewset, basename in endpoints:
+                view = viewset.as_view({"get": "list"}, basename=basename)
+                slow, slow_body = self.measure(view, librarian, page_size, options["repeat"], fast=False)
+                fast, fast_body = self.measure(view, librarian, page_size, options["repeat"], fast=True)
+                results[label] = (slow, fast, slow_body == fast_body)
+            transaction.set_rollback(True)
+
+        mismatched = []
+        for label, (slow, fast, identical) in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label} ({page_size} items per page)"))
+            self.stdout.write(self.style.MIGRATE_LABEL(f"  serializers: {slow * 1000:.3f} ms"))
+            self.stdout.write(self.style.MIGRATE_LABEL(f"  values_list + {encoder}: {fast * 1000:.3f} ms"))
+            speedup = slow / fast if fast else float("inf")
+            self.stdout.write(self.style.SUCCESS(f"  speedup: {speedup:.1f}x"))
+            if not identical:
+                mismatched.append(label)
+        if mismatched:
+            raise CommandError(f"Responses differ between the two paths: {', '.join(mismatched)}")
+        self.stdout.write(self.style.SUCCESS("\nBoth paths returned identical bytes."))
+
+    def measure(self, view, user, page_size, repeat, fast):
+        """Return (best wall time, response body) for one list endpoint"""
+        factory = APIRequestFactory()
+        timings = []
+        with override_settings(FAST_LISTS=fast):
+            for _ in range(repeat):
+                # A fresh catalog version, so the book list is not served from the cache
+                bump_catalog_version()
+                request = factory.get("/", {"page_size": page_size}, HTTP_ACCEPT="application/json")
+                force_authenticate(request, user=user)
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise CommandError(f"List request failed with status {response.status_code}.")
+        return min(timings), response.content
+
+    def seed(self, rows):
+        """Bulk-insert books and a mix of open, overdue and returned loans"""
+        today = timezone.now().date()
+        librarian = User.objects.create_user(username=f"bench_librarian_{time.time_ns()}", role="librarian")
+        readers = User.objects.bulk_create(
+            User(username=f"bench_lister_{i}_ü", role="reader") for i in range(max(rows // 20, 1))
+        )
+        books = []
+        for i in range(rows):
+            ratings = [random.randint(1, 5) for _ in range(random.randint(0, 5))]
+            books.append(Book(
+                title=f"{random.choice(TITLES)} {i}",
+                author=f"Author {i % 500}",
+                category=f"Category {i % 20}",
+                added_by=librarian,
+                rating_sum=sum(ratings),
+                rating_count=len(ratings),
+                rating_avg=sum(ratings) / len(ratings) if ratings else 0,
+            ))
+        Book.objects.bulk_create(books, batch_size=1000)
+        loans = []
+        for _ in range(rows):
+            returned = random.random() < 0.6
+            due_date = today + timedelta(days=random.randint(-60, 30))
+            late_days = random.randint(0, 10) if returned else 0
+            loans.append(Loan(
+                book=random.choice(books),
+                user=random.choice(readers),
+                due_date=due_date,
+                status="RETURNED" if returned else "ACTIVE",
+                returned_at=due_date + timedelta(days=late_days) if returned else None,
+                fine=Decimal(late_days) * Loan.FINE_PER_DAY,
+            ))
+        Loan.objects.bulk_create(loans, batch_size=1000)
+        self.stdout.write(f"Seeded {rows} books and {rows} loans.")
+        return librarian
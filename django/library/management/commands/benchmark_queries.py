@@ -0,0 +1,157 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from library.models import Book, Loan, Reservation, Review
+
+User = get_user_model()
+
+# Indexes that back the hot filters, as declared in the models' Meta
+HOT_INDEXES = {
+    Book: ["book_available_idx"],
+    Loan: ["loan_status_due_idx", "loan_user_status_due_idx"],
+    Reservation: ["reservation_user_status_idx"],
+    Review: ["review_book_created_idx"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed N rows and print EXPLAIN plans and timings for the hot filters "
+        "without and with their indexes. All changes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Number of loans/books to seed.")
+        parser.add_argument("--users", type=int, default=200, help="Number of readers to seed.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query; the best is reported.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible data.")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        with transaction.atomic():
+            reader = self.seed(options["rows"], options["users"])
+            self.analyze()
+            after = self.measure(reader, options["repeat"])
+            self.drop_indexes()
+            self.analyze()
+            before = self.measure(reader, options["repeat"])
+            transaction.set_rollback(True)
+
+        for label in after:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}"))
+            for phase, results in (("without indexes", before), ("with indexes", after)):
+                plan, best = results[label]
+                self.stdout.write(self.style.MIGRATE_LABEL(f"  {phase}: {best * 1000:.3f} ms"))
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+            speedup = before[label][1] / after[label][1] if after[label][1] else float("inf")
+            self.stdout.write(self.style.SUCCESS(f"  speedup: {speedup:.1f}x"))
+
+    def hot_queries(self, reader):
+        """The production filters, as used by views and commands"""
+        today = timezone.now().date()
+        book = Review.objects.order_by("id").values_list("book_id", flat=True).first()
+        return {
+            "Overdue loans (sweep_overdue, notify_overdue)": lambda: (
+                Loan.objects.filter(status="ACTIVE", due_date__lt=today)
+            ),
+            "Active loans of a reader (LoanViewSet ?status=ACTIVE)": lambda: (
+                Loan.objects.filter(user=reader, status="ACTIVE").order_by("-loan_date", "-id")[:50]
+            ),
+            "Reviews of a book (ReviewViewSet ?book=)": lambda: (
+                Review.objects.filter(book_id=book).order_by("-created_at", "-id")[:50]
+            ),
+            "Active reservations of a user (my_reservations, dashboard)": lambda: (
+                Reservation.objects.filter(user=reader, status="ACTIVE")
+            ),
+            "Available books (is_available=True, list order)": lambda: (
+                Book.objects.filter(is_available=True).order_by("id")[:50]
+            ),
+        }
+
+    def measure(self, reader, repeat):
+        """Return {label: (explain plan, best wall time)} for each hot query"""
+        results = {}
+        for label, build in self.hot_queries(reader).items():
+            plan = build().explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append(time.perf_counter() - started)
+            results[label] = (plan, min(timings))
+        return results
+
+    def seed(self, rows, users):
+        """Bulk-insert a realistic mix of books, loans, reservations and reviews"""
+        now = timezone.now()
+        today = now.date()
+        readers = User.objects.bulk_create(
+            User(username=f"bench_reader_{i}", role="reader") for i in range(users)
+        )
+        books = Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Benchmark Book {i}",
+                    author=f"Author {i % 500}",
+                    category=f"Category {i % 20}",
+                    added_by=readers[0],
+                    is_available=random.random() < 0.7,
+                )
+                for i in range(rows)
+            ),
+            batch_size=1000,
+        )
+        # Mostly returned history, a slice of active loans, some of them overdue
+        statuses = random.choices(["RETURNED", "ACTIVE"], weights=[92, 8], k=rows)
+        Loan.objects.bulk_create(
+            (
+                Loan(
+                    book=random.choice(books),
+                    user=random.choice(readers),
+                    due_date=today + timedelta(days=random.randint(-60, 30)),
+                    status=loan_status,
+                    returned_at=today if loan_status == "RETURNED" else None,
+                )
+                for loan_status in statuses
+            ),
+            batch_size=1000,
+        )
+        Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    book=random.choice(books),
+                    user=random.choice(readers),
+                    expires_at=now + timedelta(days=3),
+                    status=random.choice(["ACTIVE", "EXPIRED", "EXPIRED", "CANCELLED"]),
+                )
+                for _ in range(rows)
+            ),
+            batch_size=1000,
+        )
+        Review.objects.bulk_create(
+            (
+                Review(book=random.choice(books), user=random.choice(readers), rating=random.randint(1, 5))
+                for _ in range(rows)
+            ),
+            batch_size=1000,
+        )
+        self.stdout.write(f"Seeded {rows} books, loans, reservations and reviews for {users} readers.")
+        return readers[0]
+
+    def analyze(self):
+        """Refresh planner statistics so plans reflect the seeded data"""
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def drop_indexes(self):
+        """Drop the hot-filter indexes inside the benchmark transaction"""
+        with connection.cursor() as cursor:
+            for names in HOT_INDEXES.values():
+                for name in names:
+                    cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from library.circulation import expire_holds, purge_holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Expire reservations past their deadline, passing held copies to the "
+        "next patrons in line, then delete closed reservations older than the "
+        "retention period. Safe to run every few minutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Reservations updated per statement.")
+        parser.add_argument(
+            "--retention-days", type=int, default=settings.RESERVATION_RETENTION_DAYS,
+            help="Delete closed reservations created more than this many days ago (0 keeps them).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size, retention_days = options["batch_size"], options["retention_days"]
+        if batch_size < 1 or retention_days < 0:
+            raise CommandError("--batch-size must be positive and --retention-days not negative.")
+        started = time.perf_counter()
+        waiting, held = expire_holds(batch_size=batch_size)
+        purged = 0
+        if retention_days:
+            purged = purge_holds(timezone.now() - timedelta(days=retention_days), batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {waiting} queued and {held} held reservations, purged {purged} in {elapsed:.2f}s"
+        ))
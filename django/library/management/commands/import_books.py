@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from library.models import Book
+from library import search, stats
+from library.caching import bump_catalog_version
+
+User = get_user_model()
+
+FORMATS = ("csv", "json", "ndjson")
+
+
+def read_csv(stream):
+    """Yield one dict per CSV row, keyed by the header line"""
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    """Yield one dict per non-empty line"""
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_json_array(stream, chunk_size=64 * 1024):
+    """Yield the objects of a top-level JSON array without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in iter(lambda: stream.read(chunk_size), ""):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if not started:
+                if position >= len(buffer):
+                    break
+                if buffer[position] != "[":
+                    raise CommandError("JSON input must be an array of objects.")
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # incomplete object, wait for more input
+            yield item
+        buffer = buffer[position:]
+    if buffer.strip():
+        raise CommandError("Unexpected end of JSON input.")
+
+
+READERS = {"csv": read_csv, "json": read_json_array, "ndjson": read_ndjson}
+
+
+class Command(BaseCommand):
+    help = (
+        "Import books from a CSV, JSON or NDJSON feed (title, author, optional "
+        "category and copies). Rows are deduplicated against the catalog by "
+        "title and author and inserted in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Feed file to import, or '-' for stdin.")
+        parser.add_argument("--format", choices=FORMATS, help="Feed format; guessed from the extension by default.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Books inserted per transaction.")
+        parser.add_argument("--added-by", help="Username recorded as the books' creator (default: first librarian).")
+        parser.add_argument("--default-category", default="Uncategorized", help="Category for rows without one.")
+
+    def handle(self, *args, **options):
+        feed_format = options["format"] or self.guess_format(options["path"])
+        added_by = self.get_added_by(options["added_by"])
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        counts = {"imported": 0, "duplicates": 0, "invalid": 0}
+        seen = set()
+        started = time.perf_counter()
+
+        stream = sys.stdin if options["path"] == "-" else open(options["path"], newline="", encoding="utf-8")
+        try:
+            batch = []
+            for record in READERS[feed_format](stream):
+                book = self.build_book(record, added_by, options["default_category"])
+                if book is None:
+                    counts["invalid"] += 1
+                    continue
+                key = (book.title, book.author)
+                if key in seen:
+                    counts["duplicates"] += 1
+                    continue
+                seen.add(key)
+                batch.append(book)
+                if len(batch) >= batch_size:
+                    self.flush(batch, counts)
+                    batch = []
+            self.flush(batch, counts)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        rate = counts["imported"] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['imported']} books ({counts['duplicates']} duplicates, "
+            f"{counts['invalid']} invalid) in {elapsed:.2f}s - {rate:.0f} rows/sec"
+        ))
+
+    def guess_format(self, path):
+        """Infer the feed format from the file extension"""
+        extension = os.path.splitext(path)[1].lower().lstrip(".")
+        if extension == "jsonl":
+            extension = "ndjson"
+        if extension not in FORMATS:
+            raise CommandError("Cannot guess the feed format; pass --format.")
+        return extension
+
+    def get_added_by(self, username):
+        """Resolve the user recorded as creator of imported books"""
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist.")
+        user = User.objects.filter(role="librarian").order_by("id").first()
+        if user is None:
+            raise CommandError("No librarian found; pass --added-by.")
+        return user
+
+    def build_book(self, record, added_by, default_category):
+        """Map a feed record to an unsaved Book, or None if it is unusable"""
+        if not isinstance(record, dict):
+            return None
+        # Non-string values (numbers, lists, objects in JSON feeds) count as missing
+        title, author, category = (
+            value.strip() if isinstance(value, str) else ""
+            for value in (record.get("title"), record.get("author"), record.get("category"))
+        )
+        category = category or default_category
+        if not title or not author:
+            return None
+        try:
+            copies = int(record.get("copies") or 1)
+        except (TypeError, ValueError):
+            return None
+        if copies < 1:
+            return None
+        return Book(
+            title=title[:255],
+            author=author[:255],
+            category=category[:100],
+            total_copies=copies,
+            available_copies=copies,
+            added_by=added_by,
+        )
+
+    def flush(self, batch, counts):
+        """Insert one batch, skipping books already in the catalog"""
+        if not batch:
+            return
+        existing = set(
+            Book.objects.filter(title__in={book.title for book in batch}).values_list("title", "author")
+        )
+        new_books = [book for book in batch if (book.title, book.author) not in existing]
+        counts["duplicates"] += len(batch) - len(new_books)
+        with transaction.atomic():
+            created = Book.objects.bulk_create(new_books)
+            # bulk_create bypasses the post_save signals that maintain the
+            # search index and the materialized counters
+            search.index_books(created)
+            stats.adjust(
+                books_total=len(created),
+                books_available=sum(book.is_available for book in created),
+                copies_total=sum(book.total_copies for book in created),
+                copies_available=sum(book.available_copies for book in created),
+            )
+            bump_catalog_version()
+        counts["imported"] += len(created)
@@ -1,28 +1,120 @@
-from django.core.management.base import BaseCommand
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
-from django.core.mail import send_mail
-from library.models import Loan
+from library.models import Loan, NotificationLog
+
+
+def send_batch(messages):
+    """Deliver one batch over a single mail connection; runs in a worker thread"""
+    with get_connection() as connection:
+        return connection.send_messages([message for _, message in messages]) or 0
+
 
 class Command(BaseCommand):
-    help = "Send email notifications for overdue loans."
+    help = (
+        "Send email notifications for overdue loans. Each loan is emailed at "
+        "most once per interval; messages are sent in batches, one mail "
+        "connection per batch, optionally from several worker threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval-hours", type=int, default=settings.OVERDUE_NOTIFICATION_INTERVAL_HOURS,
+            help="Skip loans notified within this many hours.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages sent per mail connection.")
+        parser.add_argument("--workers", type=int, default=1, help="Batches sent in parallel.")
+        parser.add_argument("--dry-run", action="store_true", help="Build the messages but send and record nothing.")
+
+    def handle(self, *args, **options):
+        batch_size, workers = options["batch_size"], options["workers"]
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be positive.")
+        dry_run = options["dry_run"]
 
-    def handle(self, *args, **kwargs):
+        counts = {"sent": 0, "skipped": 0, "failed": 0}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Batches in flight; ledger writes stay on this thread (and its
+            # database connection), oldest batch first
+            pending = deque()
+            batch = []
+            for loan in self.due_loans(options["interval_hours"]):
+                if not loan.user.email:
+                    counts["skipped"] += 1
+                    self.stdout.write(self.style.WARNING(f"No email for user {loan.user.username}"))
+                    continue
+                batch.append((loan, self.build_message(loan)))
+                if len(batch) >= batch_size:
+                    pending.append(self.dispatch(pool, batch, dry_run))
+                    batch = []
+                    if len(pending) > workers:
+                        self.record(*pending.popleft(), counts, dry_run)
+            if batch:
+                pending.append(self.dispatch(pool, batch, dry_run))
+            while pending:
+                self.record(*pending.popleft(), counts, dry_run)
+
+        elapsed = time.perf_counter() - started
+        rate = counts["sent"] / elapsed if elapsed else 0
+        verb = "Would send" if dry_run else "Sent"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts['sent']} notifications ({counts['skipped']} without email, "
+            f"{counts['failed']} failed) in {elapsed:.2f}s - {rate:.0f} msgs/sec"
+        ))
+
+    def due_loans(self, interval_hours):
+        """Overdue loans not yet notified within the interval, with user and book joined in"""
         today = timezone.now().date()
-        overdue_loans = Loan.objects.filter(status="ACTIVE", due_date__lt=today)
-        for loan in overdue_loans:
-            if not loan.user.email:
-                self.stdout.write(self.style.WARNING(f"No email for user {loan.user.username}"))
-                continue
-
-            subject = f"Overdue Book Notification: {loan.book.title}"
-            message = (
-                f"Dear {loan.user.username},\n\n"
-                f"Your loan for the book '{loan.book.title}' was due on {loan.due_date} and is now overdue.\n"
-                "Please return the book as soon as possible.\n\n"
-                "Thank you!"
-            )
-            try:
-                send_mail(subject, message, None, [loan.user.email])
-                self.stdout.write(self.style.SUCCESS(f"Notification sent to {loan.user.username}"))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Failed to send email to {loan.user.username}: {e}"))
+        recently_notified = NotificationLog.objects.filter(
+            loan=OuterRef("pk"),
+            kind="OVERDUE",
+            sent_at__gte=timezone.now() - timedelta(hours=interval_hours),
+        )
+        return (
+            Loan.objects.filter(Q(status="OVERDUE") | Q(status="ACTIVE", due_date__lt=today))
+            .filter(~Exists(recently_notified))
+            .select_related("user", "book")
+            .order_by("id")
+            .iterator(chunk_size=2000)
+        )
+
+    def build_message(self, loan):
+        """Render the overdue reminder for one loan"""
+        subject = f"Overdue Book Notification: {loan.book.title}"
+        body = (
+            f"Dear {loan.user.username},\n\n"
+            f"Your loan for the book '{loan.book.title}' was due on {loan.due_date} and is now overdue.\n"
+            "Please return the book as soon as possible.\n\n"
+            "Thank you!"
+        )
+        return EmailMessage(subject, body, None, [loan.user.email])
+
+    def dispatch(self, pool, batch, dry_run):
+        """Hand a batch to the worker pool (or nowhere, in a dry run)"""
+        return batch, None if dry_run else pool.submit(send_batch, batch)
+
+    def record(self, batch, future, counts, dry_run):
+        """Count a finished batch and write its ledger entries"""
+        if dry_run:
+            counts["sent"] += len(batch)
+            return
+        try:
+            future.result()
+        except Exception as e:
+            counts["failed"] += len(batch)
+            self.stdout.write(self.style.ERROR(f"Failed to send a batch of {len(batch)} emails: {e}"))
+            return
+        now = timezone.now()
+        NotificationLog.objects.bulk_create(
+            NotificationLog(loan=loan, kind="OVERDUE", recipient=message.to[0], sent_at=now)
+            for loan, message in batch
+        )
+        counts["sent"] += len(batch)
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, F
+from django.utils import timezone
+from library import stats
+from library.circulation import BookUnavailable, checkout, return_loan
+from library.models import Book, Loan
+
+User = get_user_model()
+
+# Attempts per checkout when the database reports lock contention (SQLite)
+LOCK_RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer the checkout and return paths from several threads against a "
+        "small pool of books, verify no copy was lent twice, no transaction "
+        "deadlocked and the materialized counters match the tables, and report "
+        "checkouts/sec. Runs against the configured database (run it on "
+        "PostgreSQL to exercise row locks); seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent borrowers.")
+        parser.add_argument("--books", type=int, default=50, help="Books competed for.")
+        parser.add_argument("--copies", type=int, default=1, help="Copies of each book.")
+        parser.add_argument("--attempts", type=int, default=500, help="Checkout and return attempts in total.")
+        parser.add_argument(
+            "--return-rate", type=float, default=0.3,
+            help="Share of attempts that return one of the borrower's open loans instead.",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed for book picks.")
+
+    def handle(self, *args, **options):
+        threads, attempts = options["threads"], options["attempts"]
+        if threads < 1 or options["books"] < 1 or options["copies"] < 1 or attempts < 1:
+            raise CommandError("--threads, --books, --copies and --attempts must be positive.")
+        if not 0 <= options["return_rate"] <= 1:
+            raise CommandError("--return-rate must be between 0 and 1.")
+        readers, books = self.seed(threads, options["books"], options["copies"])
+        try:
+            counts = {"checkouts": 0, "returns": 0, "unavailable": 0, "lock_retries": 0, "deadlocks": 0}
+            lock = threading.Lock()
+            barrier = threading.Barrier(threads)
+            rng = random.Random(options["seed"])
+            # None stands for "return a loan"
+            plans = [
+                [
+                    None if rng.random() < options["return_rate"] else rng.choice(books)
+                    for _ in range(attempts // threads)
+                ]
+                for _ in range(threads)
+            ]
+
+            def borrow(reader, plan):
+                local = dict.fromkeys(counts, 0)
+                open_loans = []
+                barrier.wait()
+                try:
+                    for book in plan:
+                        if book is None:
+                            if open_loans:
+                                loan_id = open_loans.pop().pk
+                                # Reloaded per try: a rolled-back try leaves the instance marked returned
+                                self.attempt(lambda: return_loan(Loan.objects.get(pk=loan_id)), "returns", local)
+                        else:
+                            self.attempt(lambda: open_loans.append(checkout(book, reader, self.due_date())),
+                                         "checkouts", local)
+                finally:
+                    connection.close()
+                with lock:
+                    for name, value in local.items():
+                        counts[name] += value
+
+            workers = [
+                threading.Thread(target=borrow, args=(reader, plan)) for reader, plan in zip(readers, plans)
+            ]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+
+            loans = Loan.objects.filter(book__in=books)
+            open_loans = loans.exclude(status="RETURNED")
+            double_loans = (
+                open_loans.values("book").annotate(total=Count("id"))
+                .filter(total__gt=F("book__total_copies")).count()
+            )
+            lost = counts["checkouts"] - loans.count()
+            drifted = self.drifted_counters()
+            rate = counts["checkouts"] / elapsed if elapsed else 0
+            self.stdout.write(
+                f"{counts['checkouts']} checkouts, {counts['returns']} returns, "
+                f"{counts['unavailable']} rejected as unavailable, {counts['lock_retries']} lock retries, "
+                f"{counts['deadlocks']} deadlocks in {elapsed:.2f}s - {rate:.0f} checkouts/sec"
+            )
+        finally:
+            self.cleanup(readers, books)
+
+        if double_loans or lost or counts["deadlocks"] or drifted:
+            raise CommandError(
+                f"{double_loans} books lent beyond their copies, {lost} checkouts without a loan row, "
+                f"{counts['deadlocks']} deadlocks, counters off (counted, actual): {drifted or 'none'}."
+            )
+        self.stdout.write(self.style.SUCCESS("No copy was lent twice, no deadlock, counters consistent."))
+
+    def due_date(self):
+        """Due date of the stress loans"""
+        return timezone.now().date() + timezone.timedelta(days=14)
+
+    def attempt(self, operation, counter, counts):
+        """Run one checkout or return, retried while the database is locked"""
+        for _ in range(LOCK_RETRIES):
+            try:
+                operation()
+                counts[counter] += 1
+            except BookUnavailable:
+                counts["unavailable"] += 1
+            except OperationalError as e:
+                # PostgreSQL reports deadlocks as OperationalError too; those are bugs, not contention
+                if "deadlock" in str(e).lower():
+                    counts["deadlocks"] += 1
+                    return
+                counts["lock_retries"] += 1
+                time.sleep(random.uniform(0, 0.005))
+                continue
+            return
+
+    def drifted_counters(self):
+        """Counters whose materialized value differs from the source tables: {name: (counted, actual)}"""
+        counted, actual = stats.read_counters(), stats.aggregate_counters()
+        return {name: (counted[name], actual[name]) for name in actual if counted[name] != actual[name]}
+
+    def seed(self, readers, books, copies):
+        """Create one reader per thread and the contested books"""
+        suffix = time.time_ns()
+        created_readers = [
+            User.objects.create_user(username=f"stress_reader_{suffix}_{i}", role="reader") for i in range(readers)
+        ]
+        created_books = [
+            Book.objects.create(
+                title=f"Stress Book {i}", author="Stress Author", category="Stress",
+                total_copies=copies, available_copies=copies, added_by=created_readers[0],
+            )
+            for i in range(books)
+        ]
+        return created_readers, created_books
+
+    def cleanup(self, readers, books):
+        """Delete everything the run created (per object, so counters stay correct)"""
+        for loan in Loan.objects.filter(book__in=books):
+            loan.delete()
+        # Reload: the shared instances' copy counts went stale during the run
+        for book in Book.objects.filter(pk__in=[book.pk for book in books]):
+            book.delete()
+        for reader in readers:
+            reader.delete()
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from library.circulation import sweep_overdue
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark active loans past their due date as OVERDUE and update the "
+        "accrued fines of overdue loans. Safe to run every minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Loans updated per statement.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        started = time.perf_counter()
+        marked, accrued = sweep_overdue(batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {marked} loans overdue and updated fines on {accrued} in {elapsed:.2f}s"
+        ))
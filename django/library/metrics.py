@@ -0,0 +1,387 @@
+"""
+In-process metrics shared by all workers on a node
+
+Counters, gauges and fixed-bucket histograms are updated in memory by each
+process and folded into one SQLite file (METRICS_LOCATION) at most every
+METRICS_FLUSH_INTERVAL seconds, the same scheme SQLiteCache uses for its
+hit/miss counters; the writes happen on a flusher thread, never on the
+request thread that made the update. Counter and histogram rows are summed across workers
+with an upsert; gauge rows are kept per process and only those written
+recently are reported, so a dead worker's gauges age out.
+
+render() flushes the calling process and returns every metric in the
+Prometheus text exposition format, including cache statistics and the
+materialized library counters read at scrape time.
+
+Usage:
+    REQUESTS = metrics.counter("library_requests_total", "Requests served", ("method",))
+    REQUESTS.inc(method="GET")
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metric_samples (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+CREATE TABLE IF NOT EXISTS metric_gauges (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    worker TEXT NOT NULL,
+    value REAL NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (name, labels, worker)
+);
+"""
+
+# Latency buckets in seconds, 5 ms to 10 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labelnames, labels):
+    """Canonical JSON for a label set, checked against the metric's label names"""
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return json.dumps([[name, str(labels[name])] for name in labelnames])
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    """Prometheus label block for [(name, value)] pairs"""
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """Base for registered metrics: a name, help text and label names"""
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(Metric):
+    """Monotonic count, summed across workers"""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self.registry.add(self.name, _label_key(self.labelnames, labels), amount)
+
+
+class Gauge(Metric):
+    """Current value per process, reported as the sum over live workers"""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        self.registry.set_gauge(self.name, _label_key(self.labelnames, labels), value)
+
+    def inc(self, amount=1, **labels):
+        self.registry.set_gauge(self.name, _label_key(self.labelnames, labels), amount, relative=True)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, with their sum and count"""
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        # Bucket counts are stored per bucket and made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        bucket = str(self.buckets[index]) if index < len(self.buckets) else "+Inf"
+        self.registry.add_many([
+            (f"{self.name}_bucket:{bucket}", key, 1),
+            (f"{self.name}_sum", key, value),
+            (f"{self.name}_count", key, 1),
+        ])
+
+
+class Registry:
+    """
+    Process-local metric buffer backed by a shared SQLite file
+
+    Parameters:
+    - path: database file; defaults to settings.METRICS_LOCATION
+    - flush_interval: seconds between writes; defaults to settings.METRICS_FLUSH_INTERVAL
+    """
+
+    def __init__(self, path=None, flush_interval=None):
+        self._path = path
+        self._flush_interval = flush_interval
+        self.metrics = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._gauges = {}
+        self._last_flush = time.monotonic()
+        self._local = threading.local()
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self._flush_due = threading.Event()
+
+    @property
+    def path(self):
+        return str(self._path or settings.METRICS_LOCATION)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.METRICS_FLUSH_INTERVAL
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork or a path change"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.key != (os.getpid(), self.path):
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.key = (os.getpid(), self.path)
+        return connection
+
+    # Registration
+
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def collector(self, function):
+        """
+        Register a scrape-time collector
+
+        function() returns (name, kind, help, [(labels dict, value)]) tuples.
+        """
+        self.collectors.append(function)
+        return function
+
+    # Updates
+
+    def add(self, name, labels, amount):
+        self.add_many([(name, labels, amount)])
+
+    def add_many(self, samples):
+        with self._lock:
+            for name, labels, amount in samples:
+                key = (name, labels)
+                self._pending[key] = self._pending.get(key, 0) + amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self._flush_in_background()
+
+    def set_gauge(self, name, labels, value, relative=False):
+        with self._lock:
+            key = (name, labels)
+            self._gauges[key] = self._gauges.get(key, 0) + value if relative else value
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self._flush_in_background()
+
+    def _flush_in_background(self):
+        """
+        Wake the flusher thread, starting it on first use (and after a fork)
+
+        Updates run on request threads, which must never wait on the metrics
+        file: the flusher takes the SQLite write lock, and its busy timeout,
+        on its own thread.
+        """
+        if self._flusher is None or not self._flusher.is_alive():
+            with self._flusher_lock:
+                if self._flusher is None or not self._flusher.is_alive():
+                    self._flusher = threading.Thread(target=self._run_flusher, name="metrics-flusher", daemon=True)
+                    self._flusher.start()
+        self._flush_due.set()
+
+    def _run_flusher(self):
+        """Flush whenever an update finds a flush due; a busy or broken file only delays it"""
+        while True:
+            self._flush_due.wait()
+            self._flush_due.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+    def flush(self):
+        """Fold this process's pending samples and gauges into the shared file"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            gauges = dict(self._gauges)
+            self._last_flush = time.monotonic()
+        if not pending and not gauges:
+            return
+        # One gauge row per process (and registry), replaced on every flush
+        now, worker = time.time(), f"{os.getpid()}:{id(self)}"
+        connection = None
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+                [(name, labels, value) for (name, labels), value in pending.items()],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO metric_gauges (name, labels, worker, value, updated) VALUES (?, ?, ?, ?, ?)",
+                [(name, labels, worker, value, now) for (name, labels), value in gauges.items()],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection is not None and connection.in_transaction:
+                connection.execute("ROLLBACK")
+            # Keep the samples for the next flush
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + value
+            raise
+
+    # Exposition
+
+    def read(self):
+        """Return ({(name, labels): value} shared samples, {(name, labels): value} live gauges)"""
+        self.flush()
+        connection = self._connection()
+        samples = {(name, labels): value for name, labels, value in connection.execute(
+            "SELECT name, labels, value FROM metric_samples"
+        )}
+        gauges = {}
+        fresh = time.time() - max(self.flush_interval * 5, 60)
+        for name, labels, value in connection.execute(
+            "SELECT name, labels, value FROM metric_gauges WHERE updated >= ?", (fresh,)
+        ):
+            gauges[(name, labels)] = gauges.get((name, labels), 0) + value
+        return samples, gauges
+
+    def render(self):
+        """All metrics in the Prometheus text format (version 0.0.4)"""
+        samples, gauges = self.read()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "counter":
+                lines.extend(self._series(metric.name, samples, metric.name))
+            elif metric.kind == "gauge":
+                lines.extend(self._series(metric.name, gauges, metric.name))
+            else:
+                lines.extend(self._histogram(metric, samples))
+        for collect in self.collectors:
+            for name, kind, documentation, series in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in series:
+                    lines.append(f"{name}{_format_labels(list(labels.items()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _series(self, stored_name, values, exposed_name):
+        return [
+            f"{exposed_name}{_format_labels(json.loads(labels))} {_number(value)}"
+            for (name, labels), value in sorted(values.items())
+            if name == stored_name
+        ]
+
+    def _histogram(self, metric, samples):
+        lines = []
+        label_sets = sorted({labels for name, labels in samples if name == f"{metric.name}_count"})
+        for labels in label_sets:
+            pairs = json.loads(labels)
+            cumulative = 0
+            for bucket in [*map(str, metric.buckets), "+Inf"]:
+                cumulative += samples.get((f"{metric.name}_bucket:{bucket}", labels), 0)
+                lines.append(f"{metric.name}_bucket{_format_labels(pairs + [['le', bucket]])} {_number(cumulative)}")
+            lines.append(f"{metric.name}_sum{_format_labels(pairs)} {_number(samples[(f'{metric.name}_sum', labels)])}")
+            lines.append(f"{metric.name}_count{_format_labels(pairs)} {_number(samples[(f'{metric.name}_count', labels)])}")
+        return lines
+
+
+def _number(value):
+    """Integral floats without a trailing .0, as Prometheus clients print them"""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+collector = registry.collector
+
+REQUESTS = counter("library_http_requests_total", "HTTP requests served", ("method", "route", "status"))
+REQUEST_LATENCY = histogram(
+    "library_http_request_duration_seconds", "Wall time to serve a request", ("method", "route")
+)
+REQUEST_DB_TIME = histogram(
+    "library_http_request_db_seconds", "Time spent in database queries per request", ("method", "route")
+)
+REQUESTS_IN_FLIGHT = gauge("library_http_requests_in_flight", "Requests being served")
+GOOGLE_BOOKS_LATENCY = histogram(
+    "library_google_books_request_duration_seconds", "Latency of the Google Books API proxy", ("outcome",)
+)
+
+
+@collector
+def cache_metrics():
+    """Shared hit/miss totals of the default cache, when it keeps them"""
+    from django.core.cache import cache
+
+    get_stats = getattr(cache, "get_stats", None)
+    if get_stats is None:
+        return []
+    stats = get_stats()
+    return [
+        ("library_cache_hits_total", "counter", "Cache lookups that found an entry", [({}, stats["hits"])]),
+        ("library_cache_misses_total", "counter", "Cache lookups that found nothing", [({}, stats["misses"])]),
+        ("library_cache_entries", "gauge", "Entries in the cache", [({}, stats["entries"])]),
+        ("library_cache_size_bytes", "gauge", "Bytes of cached values", [({}, stats["size"])]),
+    ]
+
+
+@collector
+def library_counters():
+    """Materialized library counters (stats.py), one indexed query"""
+    from . import stats
+
+    return [
+        ("library_objects", "gauge", "Books, copies, loans and reservations by state",
+         [({"counter": name}, value) for name, value in sorted(stats.read_counters().items())]),
+    ]
@@ -1,12 +1,205 @@
+import logging
+import random
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import metrics, profiling
+from .instrumentation import QueryRecorder
+from .request_log import logger
+
+query_logger = logging.getLogger("library.queries")
+profile_logger = logging.getLogger("library.profiling")
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Counts queries and database time per request (see instrumentation.py)
+
+    Features:
+    - Server-Timing header with database and total time, readable in the
+      browser's network panel
+    - Logs a warning on "library.queries" when one query shape runs
+      N_PLUS_ONE_THRESHOLD or more times in a request
+    - The recorder is left on request.query_recorder for later middleware
+    - Disabled entirely with QUERY_INSTRUMENTATION=False
+    """
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = request.query_recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        response["Server-Timing"] = (
+            f'db;desc="{recorder.count} queries";dur={recorder.duration * 1000:.2f}, total;dur={elapsed_ms:.2f}'
+        )
+        for shape, count in recorder.repeated(settings.N_PLUS_ONE_THRESHOLD):
+            match = request.resolver_match
+            query_logger.warning(
+                "Query shape repeated %d times in %s %s", count, request.method, request.path,
+                extra={"fields": {
+                    "route": match.route if match else None,
+                    "count": count,
+                    "shape": shape,
+                }},
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency and database time per route (see metrics.py)
+
+    Routes are labelled by URL pattern, not path, so label sets stay
+    bounded; database time comes from QueryInstrumentationMiddleware when
+    it runs first.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.route if match else "unmatched"
+        metrics.REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, method=request.method, route=route)
+        recorder = getattr(request, "query_recorder", None)
+        if recorder is not None:
+            metrics.REQUEST_DB_TIME.observe(recorder.duration, method=request.method, route=route)
+        return response
+
+
 class RequestLogMiddleware:
     """
-    Middleware that logs every incoming request.
+    Logs requests as structured JSON lines (see request_log.py)
+
+    Each record carries method, route, status, user id, wall latency and
+    time spent in the database. A REQUEST_LOG_SAMPLE_RATE fraction of
+    requests is logged; requests slower than REQUEST_LOG_SLOW_MS and
+    server errors are always logged.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        print(f"🔎 Request: {request.method} {request.get_full_path()}")
-        response = self.get_response(request)
-        print(f"🔎 Response status: {response.status_code}")
+        # Reuse QueryInstrumentationMiddleware's recorder when it runs
+        timer = getattr(request, "query_recorder", None)
+        wrapper = nullcontext()
+        if timer is None:
+            timer = QueryRecorder()
+            wrapper = connection.execute_wrapper(timer)
+        started = time.perf_counter()
+        with wrapper:
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        slow = elapsed_ms >= settings.REQUEST_LOG_SLOW_MS
+        if slow or response.status_code >= 500 or random.random() < settings.REQUEST_LOG_SAMPLE_RATE:
+            self.log(request, response, elapsed_ms, timer, slow)
         return response
+
+    def log(self, request, response, elapsed_ms, timer, slow):
+        """Emit the structured record for one request"""
+        match = request.resolver_match
+        user = getattr(request, "user", None)
+        logger.log(
+            logging.WARNING if slow or response.status_code >= 500 else logging.INFO,
+            "%s %s %s", request.method, request.path, response.status_code,
+            extra={"fields": {
+                "method": request.method,
+                "route": match.route if match else None,
+                "path": request.path,
+                "status": response.status_code,
+                "user_id": user.pk if user is not None and user.is_authenticated else None,
+                "duration_ms": round(elapsed_ms, 2),
+                "db_ms": round(timer.duration * 1000, 2),
+                "db_queries": timer.count,
+                "slow": slow,
+            }},
+        )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand (see profiling.py)
+
+    Features:
+    - "X-Profile: cpu" runs the request under cProfile, "X-Profile: memory"
+      under cProfile and tracemalloc
+    - Only honoured for admins, authenticated by session or JWT; anyone
+      else gets the request served normally
+    - The stored profile's id is returned in the X-Profile-Id header
+    - Requests without the header are passed straight through
+    - Disabled entirely with PROFILING=False
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get(profiling.HEADER)
+        if mode is None:
+            return self.get_response(request)
+        return self.profile(request, mode.strip().lower())
+
+    def profile(self, request, mode):
+        """Serve the request under the profiler, if an admin asked for a known mode"""
+        user = self.authenticate(request)
+        if mode not in profiling.MODES or user is None or user.role != "admin":
+            return self.get_response(request)
+        try:
+            response, profiler, snapshot, stats = profiling.profile_call(
+                self.get_response, request, memory=mode == "memory",
+            )
+        except profiling.ProfilerBusy:
+            response = self.get_response(request)
+            response["X-Profile-Skipped"] = "busy"
+            return response
+
+        match = request.resolver_match
+        recorder = getattr(request, "query_recorder", None)
+        info = {
+            "mode": mode,
+            "method": request.method,
+            "path": request.path,
+            "route": match.route if match else None,
+            "status": response.status_code,
+            "user_id": user.pk,
+            "db_queries": recorder.count if recorder is not None else None,
+            **stats,
+        }
+        try:
+            response["X-Profile-Id"] = profiling.save_profile(profiler, snapshot, info)
+        except OSError:
+            profile_logger.exception("Could not store the profile of %s %s", request.method, request.path)
+        return response
+
+    def authenticate(self, request):
+        """The session user, or the JWT bearer; None when neither is valid"""
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        return result[0] if result else None
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Create the vendor-specific full-text index for books"""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX library_book_search_idx ON library_book USING GIN ("
+            "to_tsvector('simple'::regconfig, "
+            "coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(category, '')))"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE library_book_fts USING fts5(title, author, category)"
+        )
+        schema_editor.execute(
+            "INSERT INTO library_book_fts (rowid, title, author, category) "
+            "SELECT id, title, author, category FROM library_book"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    """Remove the vendor-specific full-text index for books"""
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS library_book_search_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS library_book_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_remove_review_user_book_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:21
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    """Seed the counters from the existing tables"""
+    Book = apps.get_model('library', 'Book')
+    Loan = apps.get_model('library', 'Loan')
+    Reservation = apps.get_model('library', 'Reservation')
+    LibraryCounter = apps.get_model('library', 'LibraryCounter')
+
+    values = Book.objects.aggregate(
+        books_total=Count('id'),
+        books_available=Count('id', filter=Q(is_available=True)),
+    )
+    values.update(Loan.objects.aggregate(**{
+        f'loans_{status.lower()}': Count('id', filter=Q(status=status))
+        for status in ('ACTIVE', 'RETURNED', 'OVERDUE')
+    }))
+    values.update(Reservation.objects.aggregate(**{
+        f'reservations_{status.lower()}': Count('id', filter=Q(status=status))
+        for status in ('ACTIVE', 'EXPIRED', 'CANCELLED')
+    }))
+    LibraryCounter.objects.bulk_create(
+        LibraryCounter(name=name, value=value) for name, value in values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibraryCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
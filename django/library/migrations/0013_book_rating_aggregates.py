@@ -0,0 +1,48 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:23
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast
+
+
+def backfill_ratings(apps, schema_editor):
+    """Compute the rating aggregates for books that already have reviews"""
+    Book = apps.get_model('library', 'Book')
+    Review = apps.get_model('library', 'Review')
+    reviews = Review.objects.filter(book=OuterRef('pk')).order_by().values('book')
+    reviewed = Book.objects.filter(pk__in=Review.objects.values('book'))
+    reviewed.update(
+        rating_sum=Subquery(reviews.annotate(total=Sum('rating')).values('total')),
+        rating_count=Subquery(reviews.annotate(total=Count('id')).values('total')),
+    )
+    reviewed.update(rating_avg=Cast(F('rating_sum'), FloatField()) / F('rating_count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_library_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('rating_count__gt', 0)), fields=['-rating_avg', '-rating_count'], name='book_top_rated_idx'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from datetime import datetime
+import re
+
+HISTORY_LINE = re.compile(r"^(?P<text>.*) on (?P<timestamp>\d{4}-\d{2}-\d{2} [\d:.+-]+)$")
+ACTIONS = {"Loan created": "LOAN_CREATED", "Reservation created": "RESERVATION_CREATED"}
+
+
+def copy_history_to_events(apps, schema_editor):
+    """Split each profile's activity_history blob into ActivityEvent rows"""
+    Profile = apps.get_model('library', 'Profile')
+    ActivityEvent = apps.get_model('library', 'ActivityEvent')
+    now = django.utils.timezone.now()
+    events = []
+    profiles = Profile.objects.exclude(activity_history__isnull=True).exclude(activity_history='')
+    for profile in profiles.iterator():
+        for line in profile.activity_history.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            text, created_at = line, now
+            match = HISTORY_LINE.match(line)
+            if match:
+                try:
+                    created_at = datetime.fromisoformat(match['timestamp'])
+                    text = match['text']
+                except ValueError:
+                    pass
+            action = next((code for prefix, code in ACTIONS.items() if text.startswith(prefix)), 'LEGACY')
+            events.append(ActivityEvent(
+                user_id=profile.user_id, action=action, description=text[:512], created_at=created_at,
+            ))
+        if len(events) >= 1000:
+            ActivityEvent.objects.bulk_create(events)
+            events = []
+    ActivityEvent.objects.bulk_create(events)
+
+
+def copy_events_to_history(apps, schema_editor):
+    """Rebuild the activity_history blobs from ActivityEvent rows"""
+    Profile = apps.get_model('library', 'Profile')
+    ActivityEvent = apps.get_model('library', 'ActivityEvent')
+    history = {}
+    for event in ActivityEvent.objects.order_by('user_id', 'created_at', 'id').iterator():
+        history.setdefault(event.user_id, []).append(f"{event.description} on {event.created_at}\n")
+    for user_id, lines in history.items():
+        Profile.objects.filter(user_id=user_id).update(activity_history=''.join(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('LOAN_CREATED', 'Loan created'), ('RESERVATION_CREATED', 'Reservation created'), ('LEGACY', 'Imported history entry')], max_length=30)),
+                ('description', models.CharField(max_length=512)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('book', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='library.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='activity_user_created_idx')],
+            },
+        ),
+        migrations.RunPython(copy_history_to_events, copy_events_to_history),
+        migrations.RemoveField(
+            model_name='profile',
+            name='activity_history',
+        ),
+    ]
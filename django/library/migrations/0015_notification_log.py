@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_activity_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('OVERDUE', 'Overdue reminder')], max_length=20)),
+                ('recipient', models.EmailField(max_length=254)),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='library.loan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['loan', 'kind', 'sent_at'], name='notification_loan_sent_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:39
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_copies(apps, schema_editor):
+    """Every existing book is one copy, on the shelf unless lent out"""
+    Book = apps.get_model('library', 'Book')
+    LibraryCounter = apps.get_model('library', 'LibraryCounter')
+
+    Book.objects.filter(is_available=False).update(available_copies=0)
+    values = Book.objects.aggregate(
+        copies_total=Sum('total_copies', default=0),
+        copies_available=Sum('available_copies', default=0),
+    )
+    for name, value in values.items():
+        LibraryCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+
+def remove_copy_counters(apps, schema_editor):
+    LibraryCounter = apps.get_model('library', 'LibraryCounter')
+    LibraryCounter.objects.filter(name__in=('copies_total', 'copies_available')).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_notification_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(backfill_copies, remove_copy_counters),
+    ]
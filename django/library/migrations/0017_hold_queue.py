@@ -0,0 +1,78 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:44
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def queue_legacy_reservations(apps, schema_editor):
+    """
+    Turn legacy ACTIVE reservations into holds
+
+    A legacy reservation did not set a copy aside. Where a copy is on the
+    shelf it is now held for the patron; otherwise the reservation joins the
+    book's queue in creation order.
+    """
+    Book = apps.get_model('library', 'Book')
+    Reservation = apps.get_model('library', 'Reservation')
+    LibraryCounter = apps.get_model('library', 'LibraryCounter')
+
+    positions = {}
+    for reservation in Reservation.objects.filter(status='ACTIVE').order_by('book_id', 'created_at', 'id'):
+        held = Book.objects.filter(pk=reservation.book_id, is_available=True, available_copies__gt=0).update(
+            available_copies=F('available_copies') - 1
+        )
+        if held:
+            Book.objects.filter(pk=reservation.book_id, available_copies=0).update(is_available=False)
+        else:
+            positions[reservation.book_id] = positions.get(reservation.book_id, 0) + 1
+            Reservation.objects.filter(pk=reservation.pk).update(
+                status='WAITING', position=positions[reservation.book_id]
+            )
+
+    values = Book.objects.aggregate(
+        books_available=Count('id', filter=Q(is_available=True)),
+        copies_available=Sum('available_copies', default=0),
+    )
+    values.update(Reservation.objects.aggregate(
+        reservations_active=Count('id', filter=Q(status='ACTIVE')),
+        reservations_waiting=Count('id', filter=Q(status='WAITING')),
+    ))
+    for name, value in values.items():
+        LibraryCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+
+def unqueue_reservations(apps, schema_editor):
+    """Map the new statuses back onto the old choices (held copies stay off the shelf)"""
+    Reservation = apps.get_model('library', 'Reservation')
+    Reservation.objects.filter(status='WAITING').update(status='ACTIVE')
+    Reservation.objects.filter(status='FULFILLED').update(status='EXPIRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_book_copies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='position',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='activityevent',
+            name='action',
+            field=models.CharField(choices=[('LOAN_CREATED', 'Loan created'), ('RESERVATION_CREATED', 'Reservation created'), ('HOLD_READY', 'Reserved copy ready for pickup'), ('LEGACY', 'Imported history entry')], max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='status',
+            field=models.CharField(choices=[('WAITING', 'Waiting'), ('ACTIVE', 'Active'), ('FULFILLED', 'Fulfilled'), ('EXPIRED', 'Expired'), ('CANCELLED', 'Cancelled')], default='ACTIVE', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['book', 'status', 'position'], name='reservation_queue_idx'),
+        ),
+        migrations.RunPython(queue_legacy_reservations, unqueue_reservations),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_hold_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expires_at'], name='reservation_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0018_reservation_expiry_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('loan_date', models.DateTimeField(db_index=True)),
+                ('due_date', models.DateField()),
+                ('returned_at', models.DateField()),
+                ('fine', models.DecimalField(decimal_places=2, default=0.0, max_digits=6)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['status', 'returned_at'], name='loan_status_returned_idx'),
+        ),
+        migrations.AddField(
+            model_name='loanarchive',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_loans', to='library.book'),
+        ),
+        migrations.AddField(
+            model_name='loanarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='loanarchive',
+            index=models.Index(fields=['user', 'loan_date'], name='loanarchive_user_date_idx'),
+        ),
+    ]
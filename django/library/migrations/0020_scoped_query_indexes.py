@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0019_loan_archive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['user', 'status', 'due_date'], name='loan_user_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created_at'], name='review_book_created_idx'),
+        ),
+    ]
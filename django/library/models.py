@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.contrib.auth.models import User, AbstractUser
 from django.utils import timezone 
@@ -41,7 +43,12 @@ class Book(models.Model):
         category (CharField): Classification category (max 100 chars)
         added_by (ForeignKey): User who added the book
         created_at (DateTimeField): Date/time of record creation
-        is_available (BooleanField): Availability status
+        is_available (BooleanField): Whether at least one copy can be lent
+        total_copies (PositiveIntegerField): Copies the library owns
+        available_copies (PositiveIntegerField): Copies on the shelf (not on loan)
+        rating_sum (IntegerField): Sum of all review ratings (denormalized)
+        rating_count (IntegerField): Number of reviews (denormalized)
+        rating_avg (FloatField): rating_sum / rating_count, 0 without reviews
     """
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
@@ -49,6 +56,24 @@ class Book(models.Model):
     added_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     is_available = models.BooleanField(default=True)
+    # Maintained with atomic F() updates by circulation.py, never by save()
+    total_copies = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    available_copies = models.PositiveIntegerField(default=1)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    rating_count = models.IntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Partial index: the available catalog, in list (id) order
+            models.Index(fields=["id"], condition=models.Q(is_available=True), name="book_available_idx"),
+            # Top-rated books among those with at least one review
+            models.Index(
+                fields=["-rating_avg", "-rating_count"],
+                condition=models.Q(rating_count__gt=0),
+                name="book_top_rated_idx",
+            ),
+        ]
 
     def __str__(self):
         """String representation combining title and author"""
@@ -73,68 +98,149 @@ class Loan(models.Model):
         ("RETURNED", "Returned"),
         ("OVERDUE", "Overdue"),
     ]
+    # Fine accrued per day past due_date (see also circulation.sweep_overdue)
+    FINE_PER_DAY = Decimal("1.00")
 
     book = models.ForeignKey(Book, on_delete=models.PROTECT) 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    loan_date = models.DateTimeField(auto_now_add=True)
+    loan_date = models.DateTimeField(auto_now_add=True, db_index=True)
     due_date = models.DateField()
     returned_at = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="ACTIVE")
     fine = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
 
-    def mark_as_returned(self):
-        """Update loan status to returned and calculate potential fines"""
+    class Meta:
+        indexes = [
+            # Loans by status, and overdue sweeps: status IN ('ACTIVE', 'OVERDUE') AND due_date < today
+            models.Index(fields=["status", "due_date"], name="loan_status_due_idx"),
+            # Archival candidates: status = 'RETURNED' AND returned_at < cutoff
+            models.Index(fields=["status", "returned_at"], name="loan_status_returned_idx"),
+            # A reader's loans, optionally by status: user = %s [AND status = %s]
+            models.Index(fields=["user", "status", "due_date"], name="loan_user_status_due_idx"),
+        ]
+
+    def fine_for(self, returned_at):
+        """Fine owed if the loan is returned on the given date"""
+        days_overdue = max((returned_at - self.due_date).days, 0)
+        return days_overdue * self.FINE_PER_DAY
+
+    def close(self, returned_at):
+        """Set the returned state in memory, without saving"""
         self.status = "RETURNED"
-        self.returned_at = timezone.now().date()
-        if self.returned_at > self.due_date:
-            days_overdue = (self.returned_at - self.due_date).days
-            self.fine = days_overdue * 1.00 
-        else:
-            self.fine = 0.00
-        self.book.is_available = True
-        self.book.save()
-        self.save()
+        self.returned_at = returned_at
+        self.fine = self.fine_for(returned_at)
+
+    def mark_as_returned(self):
+        """
+        Update loan status to returned, calculate potential fines and restock the copy
+
+        Raises circulation.AlreadyReturned if the loan was already returned.
+        """
+        from .circulation import return_loan
+        return_loan(self)
 
     def __str__(self):
         return f"{self.book.title} - {self.user.username} ({self.status})"
 
 
+class LoanArchive(models.Model):
+    """
+    Cold storage for returned loans (see archive.py)
+
+    Rows keep the id they had as a Loan, so references to a loan stay valid
+    after it is archived. Archived loans are always RETURNED.
+
+    Attributes:
+        id (BigIntegerField): Id of the original loan
+        book (ForeignKey): Borrowed book reference
+        user (ForeignKey): User who borrowed the book
+        loan_date (DateTimeField): Date/time of borrowing
+        due_date (DateField): Expected return date
+        returned_at (DateField): Actual return date
+        fine (DecimalField): Fine charged on return
+        archived_at (DateTimeField): When the loan was moved here
+    """
+    id = models.BigIntegerField(primary_key=True)
+    book = models.ForeignKey(Book, on_delete=models.PROTECT, related_name="archived_loans")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_loans")
+    loan_date = models.DateTimeField(db_index=True)
+    due_date = models.DateField()
+    returned_at = models.DateField()
+    fine = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # A user's loan history, newest first
+            models.Index(fields=["user", "loan_date"], name="loanarchive_user_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archived loan {self.id}: {self.book_id} to {self.user_id}"
+
+
 class Reservation(models.Model):
     """
     Manages book reservation lifecycle
+
+    Reservations form a FIFO hold queue per book: WAITING holds are ordered
+    by position, and an ACTIVE hold has a copy set aside for pickup until
+    expires_at (see circulation.py).
     
     Attributes:
         book (ForeignKey): Reserved book reference
         user (ForeignKey): User making reservation
         created_at (DateTimeField): Reservation timestamp
-        expires_at (DateTimeField): Reservation expiration time
+        expires_at (DateTimeField): Pickup deadline (ACTIVE) or end of the wait (WAITING)
         status (CharField): Current reservation state
+        position (BigIntegerField): Place in the book's hold queue
     """
     STATUS_CHOICES = [
+        ("WAITING", "Waiting"),
         ("ACTIVE", "Active"),
+        ("FULFILLED", "Fulfilled"),
         ("EXPIRED", "Expired"),
         ("CANCELLED", "Cancelled"),
     ]
 
     book = models.ForeignKey("Book", on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     expires_at = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="ACTIVE")
+    position = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's active reservations (my_reservations, dashboard)
+            models.Index(fields=["user", "status"], name="reservation_user_status_idx"),
+            # Head of a book's hold queue: book = %s AND status = 'WAITING' ORDER BY position
+            models.Index(fields=["book", "status", "position"], name="reservation_queue_idx"),
+            # Holds past their deadline: status = %s AND expires_at <= now
+            models.Index(fields=["status", "expires_at"], name="reservation_expiry_idx"),
+        ]
 
     def is_expired(self):
         """Check if reservation has passed expiration time"""
         return self.expires_at < timezone.now()
 
     def expire_reservation(self):
-        """Automatically mark reservation as expired"""
-        self.status = "EXPIRED"
-        self.save()
+        """
+        Automatically mark reservation as expired, passing on any held copy
+
+        Raises circulation.HoldClosed if the reservation is no longer open.
+        """
+        from .circulation import close_hold
+        close_hold(self, "EXPIRED")
 
     def cancel_reservation(self):
-        """Manually cancel active reservation"""
-        self.status = "CANCELLED"
-        self.save()
+        """
+        Manually cancel reservation, passing on any held copy
+
+        Raises circulation.HoldClosed if the reservation is no longer open.
+        """
+        from .circulation import close_hold
+        close_hold(self, "CANCELLED")
 
     def __str__(self):
         return f"Reservation: {self.book.title} by {self.user.username} ({self.status})"
@@ -154,7 +260,13 @@ class Review(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Reviews of a book, newest first: book = %s ORDER BY created_at DESC
+            models.Index(fields=["book", "created_at"], name="review_book_created_idx"),
+        ]
 
     def __str__(self):
         return f"Review of {self.book.title} by {self.user.username} ({self.rating})"
@@ -188,13 +300,95 @@ class Profile(models.Model):
         user (OneToOneField): Associated user account
         phone_number (CharField): Contact number
         address (TextField): Physical address
-        activity_history (TextField): User action log
     """
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
-    activity_history = models.TextField(blank=True, null=True)
 
     def __str__(self):
         return f"Profile of {self.user.username}"
-    
\ No newline at end of file
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log of user actions (replaces Profile.activity_history)
+
+    Rows are only ever inserted, never updated, and are read newest first
+    per user through the (user, created_at) index.
+
+    Attributes:
+        user (ForeignKey): User who performed the action
+        action (CharField): Kind of action
+        book (ForeignKey): Book involved, if any (nullable)
+        description (CharField): Human-readable summary
+        created_at (DateTimeField): When the action happened
+    """
+    ACTION_CHOICES = [
+        ("LOAN_CREATED", "Loan created"),
+        ("RESERVATION_CREATED", "Reservation created"),
+        ("HOLD_READY", "Reserved copy ready for pickup"),
+        ("LEGACY", "Imported history entry"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="activity_events")
+    action = models.CharField(max_length=30, choices=ACTION_CHOICES)
+    book = models.ForeignKey(Book, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    description = models.CharField(max_length=512)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="activity_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.description} ({self.created_at})"
+
+
+class LibraryCounter(models.Model):
+    """
+    Materialized headline statistic, maintained incrementally on writes
+
+    One row per counter (e.g. books_available, loans_active), so concurrent
+    writers touching different counters do not contend for the same row.
+
+    Attributes:
+        name (CharField): Counter identifier
+        value (BigIntegerField): Current count
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class NotificationLog(models.Model):
+    """
+    Ledger of notifications sent about a loan
+
+    notify_overdue consults it so each loan is emailed at most once per
+    notification interval, however often the command runs.
+
+    Attributes:
+        loan (ForeignKey): Loan the notification was about
+        kind (CharField): Kind of notification
+        recipient (EmailField): Address the message was sent to
+        sent_at (DateTimeField): When the message was handed to the mail backend
+    """
+    KIND_CHOICES = [
+        ("OVERDUE", "Overdue reminder"),
+    ]
+
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name="notifications")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recipient = models.EmailField()
+    sent_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["loan", "kind", "sent_at"], name="notification_loan_sent_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for loan {self.loan_id} ({self.sent_at})"
@@ -0,0 +1,80 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination used by every list endpoint
+
+    Pages are fetched with a WHERE clause on an indexed column instead of
+    OFFSET, so deep pages cost the same as the first one. Views choose the
+    key with a `cursor_ordering` attribute; a unique tie-breaker (usually
+    id) keeps the order stable.
+
+    Query parameters:
+    - cursor: opaque position returned in next/previous links
+    - page_size: only honoured for endpoints listed in PAGE_SIZE_LIMITS,
+      and capped at the configured value
+    """
+    ordering = ("-id",)
+    page_size_query_param = "page_size"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        """Use the view's cursor_ordering when it defines one"""
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+    def get_max_page_size(self):
+        """Return the admin-configured page size cap for this endpoint, if any"""
+        basename = getattr(self.view, "basename", None)
+        return getattr(settings, "PAGE_SIZE_LIMITS", {}).get(basename)
+
+    def get_page_size(self, request):
+        """Honour ?page_size= up to the endpoint's cap; fixed size otherwise"""
+        max_page_size = self.get_max_page_size()
+        if max_page_size is None:
+            return self.page_size
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return min(self.page_size, max_page_size)
+        if requested <= 0:
+            return min(self.page_size, max_page_size)
+        return min(requested, max_page_size)
+
+
+class BookSearchPagination(PageNumberPagination):
+    """
+    Page-number pagination for ranked full-text search results
+
+    Query parameters:
+    - page: 1-based page number
+    - page_size: results per page (max 100)
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class LoanHistoryPagination(PageNumberPagination):
+    """
+    Page-number pagination for the combined live and archived loan history
+
+    The history is a UNION of two tables, which keyset pagination cannot
+    filter, so pages are numbered.
+
+    Query parameters:
+    - page: 1-based page number
+    - page_size: results per page (max 200)
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
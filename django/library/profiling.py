@@ -0,0 +1,161 @@
+"""
+On-demand profiling of single requests
+
+An admin sends a request with the X-Profile header ("cpu", or "memory" to
+also trace allocations) and that one request is run under cProfile, and
+under tracemalloc when asked. The results are written to PROFILE_DIR:
+
+    <id>.prof        cProfile stats, for pstats or snakeviz
+    <id>.tracemalloc tracemalloc snapshot (memory profiles only),
+                     for tracemalloc.Snapshot.load()
+    <id>.json        what was profiled: route, status, timings, top
+                     allocation sites
+
+Only the newest PROFILE_KEEP profiles are kept. Profiles are listed and
+downloaded at /api/profiling/ (admins only).
+
+Requests without the header take one dict lookup in ProfilingMiddleware
+and nothing else.
+"""
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+
+HEADER = "HTTP_X_PROFILE"
+MODES = ("cpu", "memory")
+# Frames kept per traced allocation
+TRACEMALLOC_FRAMES = 10
+# Allocation sites summarized in the metadata file
+TOP_ALLOCATIONS = 20
+# Profile ids are generated here; anything else is rejected on download
+PROFILE_ID = re.compile(r"^\d{8}T\d{12}-[0-9a-f]{8}$")
+EXTENSIONS = (".prof", ".tracemalloc", ".json")
+
+# One profiled request at a time per process: only one profiler can be
+# active, and a second tracemalloc session would skew both snapshots
+_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another request is being profiled in this process"""
+
+
+def profile_call(func, *args, memory=False):
+    """
+    Run func(*args) under cProfile (and tracemalloc when memory=True)
+
+    Returns (result, profiler, snapshot, stats), where snapshot is None
+    unless memory was traced and stats holds wall time and, for memory
+    profiles, peak traced memory. Raises ProfilerBusy when another call is
+    being profiled.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy
+    try:
+        # Leave a tracemalloc session someone else started alone
+        trace = memory and not tracemalloc.is_tracing()
+        if trace:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            result = profiler.runcall(func, *args)
+        finally:
+            stats = {"duration_ms": round((time.perf_counter() - started) * 1000, 2)}
+            snapshot = None
+            if trace:
+                snapshot = tracemalloc.take_snapshot()
+                stats["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracemalloc.stop()
+        return result, profiler, snapshot, stats
+    finally:
+        _lock.release()
+
+
+def save_profile(profiler, snapshot, info):
+    """
+    Write a profile to PROFILE_DIR and prune old ones
+
+    Parameters:
+    - profiler: finished cProfile.Profile
+    - snapshot: tracemalloc.Snapshot or None
+    - info: JSON-serializable description of the request
+
+    Returns the profile id.
+    """
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    # Sortable by creation time, to the microsecond
+    now = time.time()
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+    profile_id = f"{stamp}{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+    base = os.path.join(directory, profile_id)
+
+    profiler.dump_stats(base + ".prof")
+    files = [profile_id + ".prof"]
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        snapshot.dump(base + ".tracemalloc")
+        files.append(profile_id + ".tracemalloc")
+        info["top_allocations"] = [
+            {"location": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+        ]
+
+    metadata = {"id": profile_id, "created": now, "files": files, **info}
+    # Metadata last: a profile is listed only once its data files exist
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(metadata, f)
+    os.replace(base + ".json.tmp", base + ".json")
+    prune(directory, settings.PROFILE_KEEP)
+    return profile_id
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first"""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith(".json") or not PROFILE_ID.match(name[:-5]):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            # Pruned or half-written by another worker
+            continue
+    return profiles
+
+
+def profile_path(profile_id, extension):
+    """Path of one stored profile file, or None if the id or extension is not ours"""
+    if not PROFILE_ID.match(profile_id) or extension not in EXTENSIONS:
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id + extension)
+    return path if os.path.isfile(path) else None
+
+
+def prune(directory, keep):
+    """Delete all but the newest `keep` profiles"""
+    ids = sorted(
+        {name.split(".", 1)[0] for name in os.listdir(directory) if PROFILE_ID.match(name.split(".", 1)[0])},
+        reverse=True,
+    )
+    for profile_id in ids[keep:]:
+        for extension in EXTENSIONS:
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
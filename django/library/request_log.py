@@ -0,0 +1,79 @@
+"""
+Structured, non-blocking request logging
+
+RequestLogMiddleware emits one record per sampled request on the
+"library.requests" logger. The handler configured for it in LOGGING,
+QueueStreamHandler, only puts the record on an in-memory queue; a
+background listener thread formats it as a JSON line and writes it to the
+stream, so request threads never wait on the stream lock or on I/O.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger("library.requests")
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line, merging its "fields" dict"""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    Hand records to a listener thread that writes JSON lines to a stream
+
+    The listener thread is started by the first record, so configuring
+    logging (in every management command, shell and test run) starts no
+    thread until something is actually logged.
+
+    Parameters:
+    - stream: file object written by the listener (default: stdout)
+    - maxsize: queue capacity; when full, records are dropped rather
+      than blocking the request
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, target, respect_handler_level=False)
+        self.started = False
+        self.stopped = False
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread, not the request thread
+        return record
+
+    def close(self):
+        """Flush queued records and stop the listener thread (once)"""
+        with self.lock:
+            if self.started and not self.stopped:
+                self.stopped = True
+                self.listener.stop()
+        super().close()
+
+    def enqueue(self, record):
+        # Handler.handle() holds self.lock around emit(), so one thread starts the listener
+        if not self.started:
+            self.started = True
+            self.listener.start()
+            atexit.register(self.close)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
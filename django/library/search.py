@@ -0,0 +1,124 @@
+"""
+Full-text search over the book catalog
+
+Uses the native full-text engine of the active database:
+- PostgreSQL: GIN expression index over to_tsvector(title, author, category)
+- SQLite: FTS5 virtual table kept in sync by the Book signals
+- Other backends: falls back to case-insensitive substring matching
+
+Every term of the query is matched as a prefix, so "tolk hob" finds
+"The Hobbit by J.R.R. Tolkien". Results are annotated with search_rank,
+higher meaning more relevant.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Book
+
+FTS_TABLE = "library_book_fts"
+
+# Must stay equivalent to the indexed expression in migration 0009, otherwise
+# PostgreSQL will not use the GIN index.
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(library_book.title, '') || ' ' || "
+    "coalesce(library_book.author, '') || ' ' || "
+    "coalesce(library_book.category, ''))"
+)
+
+
+def search_terms(query):
+    """Split free text into word tokens safe for any query syntax"""
+    return re.findall(r"\w+", query or "")
+
+
+def search_books(queryset, query):
+    """
+    Filter and rank a Book queryset by a free-text query
+
+    Returns the queryset annotated with search_rank and ordered by
+    relevance (ties broken by id, so pagination stays stable).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        matches = RawSQL(
+            f"{POSTGRES_DOCUMENT} @@ to_tsquery('simple'::regconfig, %s)",
+            (tsquery,), output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({POSTGRES_DOCUMENT}, to_tsquery('simple'::regconfig, %s))",
+            (tsquery,), output_field=FloatField(),
+        )
+    elif vendor == "sqlite":
+        match = " ".join('"{}"*'.format(term) for term in terms)
+        matches = RawSQL(
+            f"library_book.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+            (match,), output_field=BooleanField(),
+        )
+        # FTS5 rank is bm25, where lower is better; negate it to match Postgres
+        rank = RawSQL(
+            f"(SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = library_book.id)",
+            (match,), output_field=FloatField(),
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) | Q(author__icontains=term) | Q(category__icontains=term)
+            )
+        return queryset.filter(condition).annotate(
+            search_rank=RawSQL("0", (), output_field=FloatField())
+        ).order_by("id")
+
+    return queryset.filter(matches).annotate(search_rank=rank).order_by("-search_rank", "id")
+
+
+def index_book(book, using="default"):
+    """Insert or refresh a single book in the SQLite FTS index"""
+    index_books([book], using=using)
+
+
+def index_books(books, using="default"):
+    """Insert or refresh many books in the SQLite FTS index in one batch"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    rows = [(book.pk, book.title, book.author, book.category) for book in books]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_book(book_id, using="default"):
+    """Remove a deleted book from the SQLite FTS index"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+
+
+def rebuild_index(using="default"):
+    """Repopulate the SQLite FTS index from the book table"""
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, author, category) "
+            f"SELECT id, title, author, category FROM {Book._meta.db_table}"
+        )
@@ -1,18 +1,50 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
-from .models import Book, Loan, Reservation, Review, CustomUser, Profile
+from .models import ActivityEvent, Book, Loan, Reservation, Review, CustomUser, Profile
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from . import circulation
 
 
 class BookSerializer(serializers.ModelSerializer):
     """Serializes Book model data for API operations"""
     added_by = serializers.StringRelatedField(read_only=True)
+    average_rating = serializers.FloatField(source="rating_avg", read_only=True)
 
     class Meta:
         """Metadata defining exposed fields and read-only properties"""
         model = Book
-        fields = ["id", "title", "author", "category", "is_available", "added_by", "created_at"]
-        read_only_fields = ["id", "added_by", "created_at"]
+        fields = ["id", "title", "author", "category", "is_available", "total_copies", "available_copies",
+                  "added_by", "created_at", "average_rating", "rating_count"]
+        # is_available and available_copies are derived by circulation, never written directly
+        read_only_fields = ["id", "added_by", "created_at", "is_available", "available_copies",
+                            "average_rating", "rating_count"]
+
+    def create(self, validated_data):
+        """New books start with every copy on the shelf"""
+        validated_data["available_copies"] = validated_data.get("total_copies", 1)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """
+        Save plain fields only, so concurrent checkouts' counter updates are
+        not overwritten; stock changes go through circulation.set_total_copies
+        """
+        total_copies = validated_data.pop("total_copies", None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            if validated_data:
+                instance.save(update_fields=list(validated_data))
+            if total_copies is not None and total_copies != instance.total_copies:
+                try:
+                    circulation.set_total_copies(instance, total_copies)
+                except circulation.CopiesOnLoan as on_loan:
+                    raise serializers.ValidationError(
+                        {"total_copies": f"{on_loan.args[0]} copies are on loan; keep at least that many."}
+                    )
+        return instance
 
 User = get_user_model()
 
@@ -53,12 +85,53 @@ class LoanSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "loan_date", "returned_at", "status", "user", "fine"]
 
     def validate(self, data):
-        """Ensures book availability before creating loan"""
+        """Ensures a copy is on the shelf, or held for the borrower, before creating loan"""
         book = data.get("book")
-        if book and not book.is_available:
-            raise serializers.ValidationError("Book is currently unavailable.")
+        if book and (not book.is_available or book.available_copies < 1):
+            held = Reservation.objects.filter(
+                book=book, user=data["user"], status="ACTIVE", expires_at__gt=timezone.now()
+            ).exists()
+            if not held:
+                raise serializers.ValidationError("Book is currently unavailable.")
         return data
 
+    def create(self, validated_data):
+        """Claim the book and create the loan atomically (see circulation.checkout)"""
+        try:
+            return circulation.checkout(**validated_data)
+        except circulation.BookUnavailable:
+            raise serializers.ValidationError("Book is currently unavailable.")
+
+
+class LoanHistorySerializer(serializers.Serializer):
+    """Read-only loan rows from archive.loan_history(), live or archived"""
+    id = serializers.IntegerField()
+    book = serializers.IntegerField()
+    book_title = serializers.CharField()
+    user_username = serializers.CharField()
+    loan_date = serializers.DateTimeField()
+    due_date = serializers.DateField(format="%Y-%m-%d")
+    returned_at = serializers.DateField(allow_null=True)
+    status = serializers.CharField()
+    fine = serializers.DecimalField(max_digits=6, decimal_places=2)
+    archived = serializers.BooleanField()
+
+
+class BulkCheckoutSerializer(serializers.Serializer):
+    """Validates a circulation desk checkout: one borrower, many books"""
+    books = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=circulation.BULK_LIMIT
+    )
+    due_date = serializers.DateField(input_formats=["%Y-%m-%d"])
+    user = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all(), required=False)
+
+
+class BulkReturnSerializer(serializers.Serializer):
+    """Validates a circulation desk return scan"""
+    loans = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=circulation.BULK_LIMIT
+    )
+
 
 class ReservationSerializer(serializers.ModelSerializer):
     """Handles book reservation operations"""
@@ -68,15 +141,15 @@ class ReservationSerializer(serializers.ModelSerializer):
     class Meta:
         """Reservation data structure configuration"""
         model = Reservation
-        fields = ["id", "book", "book_title", "user", "user_username", "created_at", "expires_at", "status"]
-        read_only_fields = ["id", "created_at", "expires_at", "status", "user"]
-    
-    def validate(self, data):
-        """Validates book availability for reservation"""
-        book = data.get("book")
-        if book and not book.is_available:
-            raise serializers.ValidationError("Book is currently unavailable.")
-        return data
+        fields = ["id", "book", "book_title", "user", "user_username", "created_at", "expires_at", "status", "position"]
+        read_only_fields = ["id", "created_at", "expires_at", "status", "user", "position"]
+
+    def create(self, validated_data):
+        """Hold a copy, or join the book's queue (see circulation.place_hold)"""
+        try:
+            return circulation.place_hold(**validated_data)
+        except circulation.AlreadyReserved:
+            raise serializers.ValidationError("You already have a reservation for this book.")
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -97,8 +170,8 @@ class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         """Profile field configuration"""
         model = Profile
-        fields = ["id", "user", "user_username", "phone_number", "address", "activity_history"]
-        read_only_fields = ["id", "user", "user_username", "activity_history"]
+        fields = ["id", "user", "user_username", "phone_number", "address"]
+        read_only_fields = ["id", "user", "user_username"]
 
     def update(self, instance, validated_data):
         """Ensures users can only update their own profile"""
@@ -107,6 +180,15 @@ class ProfileSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You can only edit your own profile.")
         return super().update(instance, validated_data)
 
+class ActivityEventSerializer(serializers.ModelSerializer):
+    """Serializes entries of the append-only activity log"""
+
+    class Meta:
+        """Activity event exposure configuration"""
+        model = ActivityEvent
+        fields = ["id", "action", "book", "description", "created_at"]
+        read_only_fields = fields
+
 User = get_user_model()
 
 
@@ -1,8 +1,21 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import Book, Profile
+from .models import Book, Loan, Reservation, Review, Profile
+from . import search, stats
+from .caching import bump_catalog_version, invalidate_dashboard
 from django.conf import settings
 
+@receiver(post_init, sender=Book)
+def remember_book_availability(sender, instance, **kwargs):
+    """
+    Remembers the availability a Book was loaded with
+
+    Lets book_saved tell whether a save changed is_available without an
+    extra query. Deferred fields are left unknown (None).
+    """
+    instance._counted_available = instance.__dict__.get("is_available")
+
+
 @receiver(post_save, sender=Book)
 def book_saved(sender, instance, created, **kwargs):
     """
@@ -14,7 +27,22 @@ def book_saved(sender, instance, created, **kwargs):
     
     Actions:
     - Prints creation/update notification to console
+    - Refreshes the book's entry in the full-text search index
+    - Bumps the catalog version, invalidating cached book listings
+    - Updates the materialized book counters
     """
+    bump_catalog_version()
+    search.index_book(instance, using=kwargs.get("using", "default"))
+    if created:
+        stats.adjust(
+            books_total=1,
+            books_available=int(instance.is_available),
+            copies_total=instance.total_copies,
+            copies_available=instance.available_copies,
+        )
+    elif instance._counted_available is not None and instance._counted_available != instance.is_available:
+        stats.adjust(books_available=1 if instance.is_available else -1)
+    instance._counted_available = instance.is_available
     if created:
         print(f"📗 New book added: {instance}")
     else:
@@ -30,10 +58,127 @@ def book_deleted(sender, instance, **kwargs):
     
     Actions:
     - Prints deletion notification to console
+    - Removes the book from the full-text search index
+    - Bumps the catalog version, invalidating cached book listings
+    - Updates the materialized book counters
     """
+    bump_catalog_version()
+    stats.adjust(
+        books_total=-1,
+        books_available=-int(instance.is_available),
+        copies_total=-instance.total_copies,
+        copies_available=-instance.available_copies,
+    )
+    search.unindex_book(instance.pk, using=kwargs.get("using", "default"))
     print(f"📕 Book deleted: {instance}")
 
 
+@receiver(post_init, sender=Loan)
+@receiver(post_init, sender=Reservation)
+def remember_status(sender, instance, **kwargs):
+    """
+    Remembers the status a Loan or Reservation was loaded with
+
+    Lets the save receivers move the item between status counters without
+    an extra query. Deferred fields are left unknown (None).
+    """
+    instance._counted_status = instance.__dict__.get("status")
+
+
+def status_counter(sender, status):
+    """Materialized counter name for a Loan or Reservation status"""
+    if sender is Loan:
+        return stats.loan_counter(status)
+    return stats.reservation_counter(status)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_save, sender=Reservation)
+def status_saved(sender, instance, created, **kwargs):
+    """
+    Handles post-save events for Loan and Reservation models
+
+    Actions:
+    - Counts new items under their status
+    - Moves updated items between status counters when the status changed
+    - Invalidates the owner's cached dashboard
+    """
+    invalidate_dashboard(instance.user_id)
+    if created:
+        stats.adjust(**{status_counter(sender, instance.status): 1})
+    elif instance._counted_status is not None:
+        stats.move(
+            status_counter(sender, instance._counted_status),
+            status_counter(sender, instance.status),
+        )
+    instance._counted_status = instance.status
+
+
+@receiver(post_delete, sender=Loan)
+@receiver(post_delete, sender=Reservation)
+def status_deleted(sender, instance, **kwargs):
+    """
+    Handles post-deletion events for Loan and Reservation models
+
+    Actions:
+    - Removes the item from its status counter
+    - Invalidates the owner's cached dashboard
+    """
+    invalidate_dashboard(instance.user_id)
+    stats.adjust(**{status_counter(sender, instance.status): -1})
+
+
+@receiver(post_init, sender=Review)
+def remember_rating(sender, instance, **kwargs):
+    """
+    Remembers the book and rating a Review was loaded with
+
+    Lets review_saved undo the previous rating without an extra query.
+    """
+    instance._counted_book_id = instance.__dict__.get("book_id")
+    instance._counted_rating = instance.__dict__.get("rating")
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    """
+    Handles post-save events for Review model
+
+    Actions:
+    - Adds the rating to the book's denormalized rating aggregates
+    - On edits, replaces the previous rating (and book) it was counted under
+    - Bumps the catalog version, since book listings expose the ratings
+    - Invalidates the author's cached dashboard
+    """
+    invalidate_dashboard(instance.user_id)
+    if created:
+        stats.adjust_rating(instance.book_id, instance.rating, 1)
+    elif instance._counted_book_id is not None and instance._counted_rating is not None:
+        if instance._counted_book_id == instance.book_id:
+            stats.adjust_rating(instance.book_id, instance.rating - instance._counted_rating, 0)
+        else:
+            stats.adjust_rating(instance._counted_book_id, -instance._counted_rating, -1)
+            stats.adjust_rating(instance.book_id, instance.rating, 1)
+    instance._counted_book_id = instance.book_id
+    instance._counted_rating = instance.rating
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """
+    Handles post-deletion events for Review model
+
+    Actions:
+    - Removes the rating from the book's denormalized rating aggregates
+    - Bumps the catalog version, since book listings expose the ratings
+    - Invalidates the author's cached dashboard
+    """
+    invalidate_dashboard(instance.user_id)
+    stats.adjust_rating(instance.book_id, -instance.rating, -1)
+    bump_catalog_version()
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
     """
@@ -54,4 +199,14 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
             instance.profile.save()
         except Exception:
             pass
-        
\ No newline at end of file
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    """
+    Handles post-save events for Profile model
+
+    Actions:
+    - Invalidates the owner's cached dashboard
+    """
+    invalidate_dashboard(instance.user_id)
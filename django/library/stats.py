@@ -0,0 +1,197 @@
+"""
+Materialized library statistics
+
+Headline counters (books total/available, copies total/available, loans
+and reservations by status) live in LibraryCounter rows and are adjusted incrementally by the
+model signals, so reading them is a single indexed query regardless of
+history size. recompute() rebuilds them from the source tables with
+conditional aggregation and is the repair path for any drift.
+
+Per-book rating aggregates (Book.rating_sum/count/avg) follow the same
+pattern: adjust_rating() applies a delta in one UPDATE, and
+recompute_ratings() rebuilds them in bulk.
+
+Writers that bypass signals (bulk_create, queryset.update) must call
+adjust() or adjust_rating() themselves.
+
+The counters are a handful of rows every circulation transaction writes,
+so each transaction must touch them briefly and in the same order, or
+concurrent checkouts and returns deadlock on them. Circulation runs in
+stats.atomic(): adjust() calls inside it (including those made by the
+signals) are only summed, and applied together at the end of the block,
+as the transaction's last statements, in sorted counter order.
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Book, Loan, LoanArchive, LibraryCounter, Reservation, Review
+
+COUNTERS = (
+    "books_total",
+    "books_available",
+    "copies_total",
+    "copies_available",
+    "loans_active",
+    "loans_returned",
+    "loans_overdue",
+    "reservations_waiting",
+    "reservations_active",
+    "reservations_fulfilled",
+    "reservations_expired",
+    "reservations_cancelled",
+)
+
+
+def loan_counter(status):
+    """Counter name for a Loan status"""
+    return f"loans_{status.lower()}"
+
+
+def reservation_counter(status):
+    """Counter name for a Reservation status"""
+    return f"reservations_{status.lower()}"
+
+
+# Deltas collected by an open batched() block; per thread, like database connections
+_pending = threading.local()
+
+
+def adjust(**deltas):
+    """
+    Atomically add deltas to counters, e.g. adjust(books_total=1)
+
+    Inside batched() (and stats.atomic()) the deltas are collected and
+    applied when the block ends.
+    """
+    pending = getattr(_pending, "deltas", None)
+    if pending is not None:
+        pending.update(deltas)
+        return
+    apply(deltas)
+
+
+def apply(deltas):
+    """Write deltas to the counter rows, in sorted name order so writers lock them alike"""
+    for name in sorted(deltas):
+        delta = deltas[name]
+        if not delta:
+            continue
+        updated = LibraryCounter.objects.filter(name=name).update(value=F("value") + delta)
+        if not updated:
+            LibraryCounter.objects.get_or_create(name=name)
+            LibraryCounter.objects.filter(name=name).update(value=F("value") + delta)
+
+
+@contextmanager
+def batched():
+    """
+    Collect the adjust() calls made in the block and apply them once at its end
+
+    Nested blocks hand their deltas to the outermost one. If the block
+    raises, its deltas are dropped along with the transaction it runs in.
+    """
+    if getattr(_pending, "deltas", None) is not None:
+        yield
+        return
+    _pending.deltas = Counter()
+    try:
+        yield
+        deltas = _pending.deltas
+    finally:
+        _pending.deltas = None
+    apply(deltas)
+
+
+@contextmanager
+def atomic():
+    """transaction.atomic() whose counter adjustments are applied last, together and in sorted order"""
+    with transaction.atomic(), batched():
+        yield
+
+
+def move(old_counter, new_counter):
+    """Move one item between two counters, e.g. on a status change"""
+    if old_counter != new_counter:
+        adjust(**{old_counter: -1, new_counter: 1})
+
+
+def read_counters():
+    """Return every counter in one query; missing counters read as 0"""
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(LibraryCounter.objects.values_list("name", "value"))
+    return values
+
+
+def aggregate_counters():
+    """Compute every counter from the source tables (four queries)"""
+    values = Book.objects.aggregate(
+        books_total=Count("id"),
+        books_available=Count("id", filter=Q(is_available=True)),
+        copies_total=Sum("total_copies", default=0),
+        copies_available=Sum("available_copies", default=0),
+    )
+    values.update(Loan.objects.aggregate(**{
+        loan_counter(status): Count("id", filter=Q(status=status))
+        for status, _ in Loan.STATUS_CHOICES
+    }))
+    # Archived loans are returned loans moved out of the hot table
+    values[loan_counter("RETURNED")] += LoanArchive.objects.count()
+    values.update(Reservation.objects.aggregate(**{
+        reservation_counter(status): Count("id", filter=Q(status=status))
+        for status, _ in Reservation.STATUS_CHOICES
+    }))
+    return values
+
+
+def recompute():
+    """Rebuild the materialized counters from scratch and return them"""
+    with transaction.atomic():
+        # Hold the counter rows so concurrent adjust() calls wait for the rebuild
+        list(LibraryCounter.objects.select_for_update().filter(name__in=COUNTERS).order_by("name"))
+        values = aggregate_counters()
+        for name, value in values.items():
+            LibraryCounter.objects.update_or_create(name=name, defaults={"value": value})
+    return values
+
+
+def adjust_rating(book_id, rating_delta, count_delta):
+    """Atomically apply a review change to a book's rating aggregates"""
+    new_sum = F("rating_sum") + rating_delta
+    new_count = F("rating_count") + count_delta
+    Book.objects.filter(pk=book_id).update(
+        rating_sum=new_sum,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(rating_count__gt=-count_delta, then=Cast(new_sum, FloatField()) / new_count),
+            default=Value(0.0),
+        ),
+    )
+
+
+def recompute_ratings(batch_size=10000):
+    """Rebuild every book's rating aggregates from Review, one id range at a time"""
+    reviews = Review.objects.filter(book=OuterRef("pk")).order_by().values("book")
+    rating_sum = Subquery(reviews.annotate(total=Sum("rating")).values("total"))
+    rating_count = Subquery(reviews.annotate(total=Count("id")).values("total"))
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Book.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return updated
+        with transaction.atomic():
+            batch = Book.objects.filter(pk__gte=ids[0], pk__lte=ids[-1])
+            batch.update(rating_sum=Coalesce(rating_sum, 0), rating_count=Coalesce(rating_count, 0))
+            batch.update(rating_avg=Case(
+                When(rating_count__gt=0, then=Cast(F("rating_sum"), FloatField()) / F("rating_count")),
+                default=Value(0.0),
+            ))
+        updated += len(ids)
+        last_id = ids[-1]
@@ -0,0 +1,34 @@
+"""
+Test helpers shared by the library test suite
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .instrumentation import QueryRecorder
+
+
+class QueryBudgetMixin:
+    """
+    Adds assertQueryBudget() to a TestCase
+
+    Usage:
+        with self.assertQueryBudget(3):
+            self.client.get("/api/loans/")
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, max_repeats=3):
+        """
+        Fail if the block runs more than budget queries, or any query shape
+        more than max_repeats times (an N+1 pattern)
+        """
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            yield recorder
+        statements = "\n".join(f"{count}x {shape}" for shape, count in recorder.shapes().most_common())
+        self.assertLessEqual(
+            recorder.count, budget, f"{recorder.count} queries executed, budget is {budget}:\n{statements}"
+        )
+        repeated = recorder.repeated(max_repeats + 1)
+        self.assertFalse(repeated, f"Repeated query shapes (N+1?):\n{statements}")
@@ -1,12 +1,44 @@
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
-from .models import Book, Loan, Reservation, Review, Profile
+from rest_framework.renderers import JSONRenderer
+from .models import ActivityEvent, Book, Loan, LoanArchive, NotificationLog, Reservation, Review, Profile
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from unittest import skipUnless
+from unittest.mock import patch
+from .cache_backends import SQLiteCache
+from .instrumentation import QueryRecorder
+from .listing import FastJSONRenderer
+from .request_log import QueueStreamHandler
+from .testing import QueryBudgetMixin
+from . import activity, analytics, metrics, stats
+from . import circulation
+from .circulation import sweep_overdue
+from decimal import Decimal
+import shutil
+import sqlite3
+import time
+from django.core.management import call_command
+from io import StringIO
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from library_management_project.settings import page_size_limits
+from django.core import mail
+import json
+import requests
+import logging
+import os
+import pstats
+import tempfile
+import tracemalloc
 
 CustomUser = get_user_model()
 
@@ -46,6 +78,16 @@ class BookAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["title"], "Updated Title")
 
+    def test_availability_is_not_writable(self):
+        """Verify is_available can only change through circulation"""
+        url = f"/api/books/{self.book.id}/"
+        response = self.client.patch(url, {"is_available": False, "title": "Still Available"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["is_available"])
+        self.book.refresh_from_db()
+        self.assertTrue(self.book.is_available)
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
     def test_delete_book(self):
         """Test book deletion workflow"""
         url = f"/api/books/{self.book.id}/"
@@ -73,6 +115,284 @@ class BookAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+class BookSearchTestCase(APITestCase):
+    """Tests ranked full-text search on the book list endpoint"""
+
+    def setUp(self):
+        """Create a small catalog to search"""
+        self.user = CustomUser.objects.create_user(username="searchuser", password="testpass", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        self.hobbit = Book.objects.create(title="The Hobbit", author="J.R.R. Tolkien", category="Fantasy", added_by=self.user)
+        self.rings = Book.objects.create(title="The Lord of the Rings", author="J.R.R. Tolkien", category="Fantasy", added_by=self.user)
+        self.dune = Book.objects.create(title="Dune", author="Frank Herbert", category="Science Fiction", added_by=self.user)
+
+    def test_search_matches_prefixes(self):
+        """Verify every query term is matched as a prefix of any field"""
+        response = self.client.get("/api/books/", {"q": "tolk hob"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], self.hobbit.id)
+
+    def test_search_is_paginated(self):
+        """Verify search results are split into pages"""
+        response = self.client.get("/api/books/", {"q": "tolkien", "page_size": 1})
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Verify signals keep the search index in sync with the catalog"""
+        self.client.patch(f"/api/books/{self.dune.id}/", {"title": "Children of Dune"})
+        response = self.client.get("/api/books/", {"q": "children"})
+        self.assertEqual([book["id"] for book in response.data["results"]], [self.dune.id])
+
+        self.client.delete(f"/api/books/{self.dune.id}/")
+        response = self.client.get("/api/books/", {"q": "herbert"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_category_filter_applies_to_list_and_search(self):
+        """Verify ?category= narrows both plain listings and search results"""
+        response = self.client.get("/api/books/", {"category": "Science Fiction"})
+        self.assertEqual([book["id"] for book in response.data["results"]], [self.dune.id])
+
+        response = self.client.get("/api/books/", {"q": "the", "category": "Fantasy"})
+        self.assertEqual(response.data["count"], 2)
+        response = self.client.get("/api/books/", {"q": "the", "category": "Science Fiction"})
+        self.assertEqual(response.data["count"], 0)
+
+
+class CatalogCacheTestCase(APITestCase):
+    """Tests versioned caching of book listings"""
+
+    def setUp(self):
+        """Start from an empty cache with one book"""
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="cacheuser", password="testpass", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title="Cached Book", author="Author", category="Fiction", added_by=self.user)
+
+    def test_book_list_is_served_from_cache(self):
+        """Verify a repeated listing does not touch the database"""
+        self.client.get("/api/books/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/books/")
+        self.assertEqual(response.data["results"][0]["title"], "Cached Book")
+
+    def test_book_write_invalidates_api_cache(self):
+        """Verify list and detail responses reflect a write immediately"""
+        self.client.get("/api/books/")
+        self.client.get(f"/api/books/{self.book.id}/")
+        self.client.patch(f"/api/books/{self.book.id}/", {"title": "Renamed Book"})
+
+        response = self.client.get("/api/books/")
+        self.assertEqual(response.data["results"][0]["title"], "Renamed Book")
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        self.assertEqual(response.data["title"], "Renamed Book")
+
+    def test_new_book_invalidates_template_listing(self):
+        """Verify the HTML book list shows a new book immediately"""
+        self.client.get("/api/list/")
+        Book.objects.create(title="Fresh Arrival", author="Author", category="Fiction", added_by=self.user)
+        response = self.client.get("/api/list/")
+        self.assertContains(response, "Fresh Arrival")
+
+
+class SQLiteCacheBackendTestCase(SimpleTestCase):
+    """Tests the shared SQLite cache backend"""
+
+    def make_cache(self, **options):
+        """Open a cache on a temporary file, as another worker process would"""
+        return SQLiteCache(self.path, {"OPTIONS": options})
+
+    def setUp(self):
+        """Create a fresh cache file for each test"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "cache.sqlite3")
+
+    def test_suite_does_not_use_the_configured_cache_file(self):
+        """Verify the tests run against their own cache, never the developer's"""
+        self.assertEqual(os.path.dirname(cache._path), tempfile.gettempdir())
+
+    def test_values_are_shared_between_instances(self):
+        """Verify a write in one worker is visible to, and incrementable by, another"""
+        first, second = self.make_cache(), self.make_cache()
+        first.set("counter", 1, timeout=None)
+        self.assertEqual(second.incr("counter"), 2)
+        self.assertEqual(first.get("counter"), 2)
+        second.delete("counter")
+        self.assertIsNone(first.get("counter"))
+
+    def test_expired_entries_are_misses(self):
+        """Verify timeouts are honoured and add() can replace expired keys"""
+        backend = self.make_cache()
+        backend.set("stale", "old", timeout=-1)
+        self.assertIsNone(backend.get("stale"))
+        self.assertTrue(backend.add("stale", "new"))
+        self.assertFalse(backend.add("stale", "newer"))
+        self.assertEqual(backend.get("stale"), "new")
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        """Verify the byte cap evicts the entries read least recently"""
+        backend = self.make_cache(MAX_SIZE=3000, CULL_FREQUENCY=4)
+        payload = "x" * 900
+        for key in ("a", "b", "c"):
+            backend.set(key, payload, timeout=None)
+            time.sleep(0.01)
+        with patch("library.cache_backends.TOUCH_RESOLUTION", 0):
+            backend.get("a")
+        backend.set("d", payload, timeout=None)
+
+        self.assertLessEqual(backend.get_stats()["size"], 3000)
+        self.assertIsNotNone(backend.get("a"))
+        self.assertIsNotNone(backend.get("d"))
+        self.assertIsNone(backend.get("b"))
+
+    def test_hit_and_miss_counters(self):
+        """Verify hits and misses are counted across instances"""
+        first, second = self.make_cache(), self.make_cache()
+        first.set("key", "value")
+        first.get("key")
+        second.get("key")
+        second.get("missing")
+        stats = second.get_stats()
+        first_stats = first.get_stats()
+        self.assertEqual(first_stats["hits"], 2)
+        self.assertEqual(first_stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+
+class KeysetPaginationTestCase(APITestCase):
+    """Tests cursor pagination and per-endpoint page size caps"""
+
+    def setUp(self):
+        """Create enough books and loans to span several pages"""
+        self.user = CustomUser.objects.create_user(username="pageuser", password="testpass", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        self.books = [
+            Book.objects.create(title=f"Book {i}", author="Author", category="Fiction", added_by=self.user)
+            for i in range(5)
+        ]
+
+    @override_settings(PAGE_SIZE_LIMITS={"book": 2})
+    def test_cursor_walks_every_book_once(self):
+        """Verify following next links returns each book once, in id order"""
+        url, seen = "/api/books/?page_size=2", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(book["id"] for book in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, [book.id for book in self.books])
+
+    @override_settings(PAGE_SIZE_LIMITS={"book": 3})
+    def test_page_size_is_capped(self):
+        """Verify ?page_size= cannot exceed the configured cap"""
+        response = self.client.get("/api/books/", {"page_size": 100})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    @override_settings(PAGE_SIZE_LIMITS={})
+    def test_page_size_ignored_without_cap(self):
+        """Verify endpoints without a cap ignore ?page_size="""
+        for book in self.books[:3]:
+            Loan.objects.create(book=book, user=self.user, due_date="2030-01-01")
+        response = self.client.get("/api/loans/", {"page_size": 1})
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_malformed_page_size_limits_are_rejected(self):
+        """Verify a bad PAGE_SIZE_LIMITS entry fails with a clear configuration error"""
+        self.assertEqual(page_size_limits(" book:200, loan : 100 "), {"book": 200, "loan": 100})
+        for value in ("book", "book:", ":200", "book:lots", "book:0", "book:200:1"):
+            with self.assertRaisesMessage(ImproperlyConfigured, "PAGE_SIZE_LIMITS entry"):
+                page_size_limits(value)
+
+
+class FastListTestCase(APITestCase):
+    """Tests the values_list() list path and orjson renderer against the serializers"""
+
+    def setUp(self):
+        """Create books and loans with awkward text, ratings, fines and open loans"""
+        cache.clear()
+        self.librarian = CustomUser.objects.create_user(username="bibliothécaire", password="testpass", role="librarian")
+        self.reader = CustomUser.objects.create_user(username="czytelnik_żółw", password="testpass")
+        titles = ["Zażółć gęślą jaźń", "吾輩は猫である", 'The "Quoted" \\ Book', "Line\u2028Break\u2029", "Tab\tand\nnewline"]
+        self.books = [
+            Book.objects.create(title=title, author="Autor", category="Poezja", added_by=self.librarian, total_copies=3)
+            for title in titles
+        ]
+        for rating, user in ((5, self.librarian), (4, self.reader)):
+            Review.objects.create(book=self.books[0], user=user, rating=rating)
+        today = timezone.now().date()
+        for i, book in enumerate(self.books):
+            Loan.objects.create(book=book, user=self.reader, due_date=today + timezone.timedelta(days=i - 2))
+        returned = Loan.objects.create(book=self.books[1], user=self.librarian, due_date=today - timezone.timedelta(days=3))
+        returned.mark_as_returned()
+
+    def assertSameBytes(self, user, url):
+        """Verify url returns identical bytes with and without the fast path"""
+        self.client.force_authenticate(user=user)
+        responses = []
+        for fast in (False, True):
+            cache.clear()
+            with self.settings(FAST_LISTS=fast):
+                responses.append(self.client.get(url))
+        self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[0]["Content-Type"], responses[1]["Content-Type"])
+        self.assertEqual(responses[0].content, responses[1].content)
+        return responses[1]
+
+    def test_book_list_matches_serializer(self):
+        """Verify the book list, including ratings and added_by, is byte-identical"""
+        response = self.assertSameBytes(self.reader, "/api/books/")
+        self.assertIn(b"\\u2028", response.content)
+        self.assertEqual(response.data["results"][0]["added_by"], "bibliothécaire (librarian)")
+        self.assertEqual(response.data["results"][0]["average_rating"], 4.5)
+        self.assertEqual(self.assertSameBytes(self.reader, "/api/books/?q=Autor").data["count"], 5)
+
+    def test_loan_list_matches_serializer(self):
+        """Verify loan lists, filtered and per role, are byte-identical"""
+        response = self.assertSameBytes(self.librarian, "/api/loans/")
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertSameBytes(self.librarian, "/api/loans/?status=RETURNED")
+        self.assertSameBytes(self.reader, f"/api/loans/?book={self.books[2].id}")
+
+    @override_settings(PAGE_SIZE_LIMITS={"loan": 2})
+    def test_cursor_pages_match_serializer(self):
+        """Verify every page, and the cursor links between them, are byte-identical"""
+        url, pages = "/api/loans/?page_size=2", 0
+        while url:
+            url = self.assertSameBytes(self.librarian, url).data["next"]
+            pages += 1
+        self.assertEqual(pages, 3)
+
+    def test_browsable_api_still_renders(self):
+        """Verify the browsable API is still offered for list endpoints"""
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get("/api/loans/", HTTP_ACCEPT="text/html")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+
+    def test_renderer_matches_json_renderer(self):
+        """Verify FastJSONRenderer produces JSONRenderer's bytes, with and without orjson"""
+        data = {
+            "text": "żółw \u2028 \u2029 \"q\" \\ \x01 \t",
+            "when": timezone.now(),
+            "day": timezone.now().date(),
+            "amount": Decimal("2.50"),
+            "numbers": [0, -1, 2 ** 63 - 1, 0.1, 4.5, 3.3333333333333335, True, None],
+            "nested": {"empty": [], "tuple": (1, 2)},
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with patch("library.listing.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        big = {"big": 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(big), JSONRenderer().render(big))
+        indented = "application/json; indent=2"
+        self.assertEqual(FastJSONRenderer().render(data, indented), JSONRenderer().render(data, indented))
+
+
 class LoanAPITestCase(APITestCase):
     """Tests book loan lifecycle including creation and return"""
     
@@ -123,6 +443,624 @@ class LoanAPITestCase(APITestCase):
         response = self.client.post(f"/api/loans/{loan_id}/return_book/")
         self.assertGreater(float(response.data["fine"]), 0.00)
 
+    def test_stale_checkout_is_rejected(self):
+        """Verify a checkout based on a stale availability read cannot double-lend"""
+        stale = Book.objects.get(pk=self.book.pk)
+        circulation.checkout(self.book, self.user, "2030-01-01")
+        with self.assertRaises(circulation.BookUnavailable):
+            circulation.checkout(stale, self.user, "2030-01-01")
+        self.assertEqual(Loan.objects.filter(book=self.book).count(), 1)
+        self.assertEqual(stats.read_counters()["books_available"], 0)
+
+
+class BookCopiesTestCase(APITestCase):
+    """Tests copy-level inventory and its atomic counters"""
+
+    def setUp(self):
+        """Create a librarian who adds a title with three copies"""
+        cache.clear()
+        self.librarian = CustomUser.objects.create_user(username="stocker", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.post(
+            "/api/books/", {"title": "Popular", "author": "Author", "category": "Fiction", "total_copies": 3},
+            format="json",
+        )
+        self.book_id = response.data["id"]
+
+    def borrow(self):
+        """Borrow one copy of the title"""
+        return self.client.post("/api/loans/", {"book": self.book_id, "due_date": "2030-01-01"}, format="json")
+
+    def test_copies_are_lent_until_none_remain(self):
+        """Verify each copy can be lent once and returns restock the shelf"""
+        book = self.client.get(f"/api/books/{self.book_id}/").data
+        self.assertEqual((book["total_copies"], book["available_copies"]), (3, 3))
+        loans = [self.borrow() for _ in range(3)]
+        self.assertTrue(all(loan.status_code == status.HTTP_201_CREATED for loan in loans))
+        self.assertEqual(self.borrow().status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Book.objects.get(pk=self.book_id).is_available)
+
+        self.client.post(f"/api/loans/{loans[0].data['id']}/return_book/")
+        book = Book.objects.get(pk=self.book_id)
+        self.assertEqual((book.available_copies, book.is_available), (1, True))
+        copies = self.client.get("/api/statistics/").data["books_statistics"]["copies"]
+        self.assertEqual(copies, {"total": 3, "available": 1, "on_loan": 2})
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_stock_changes_keep_copies_on_loan(self):
+        """Verify total_copies can grow or shrink, but not below the copies on loan"""
+        self.borrow()
+        self.borrow()
+        url = f"/api/books/{self.book_id}/"
+        response = self.client.patch(url, {"total_copies": 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {"total_copies": 5, "category": "Classic"})
+        self.assertEqual((response.data["available_copies"], response.data["category"]), (3, "Classic"))
+        response = self.client.patch(url, {"total_copies": 2})
+        self.assertEqual((response.data["available_copies"], response.data["is_available"]), (0, False))
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+
+class BulkCirculationTestCase(APITestCase):
+    """Tests circulation desk bulk checkout and return"""
+
+    def setUp(self):
+        """Create a librarian, a reader and a shelf of books"""
+        cache.clear()
+        self.librarian = CustomUser.objects.create_user(username="desk", password="Pass1234", role="librarian")
+        self.reader = CustomUser.objects.create_user(username="patron", password="Pass1234", role="reader")
+        self.books = [
+            Book.objects.create(title=f"Desk Book {i}", author="Author", category="Fiction", added_by=self.librarian)
+            for i in range(12)
+        ]
+        self.client.force_authenticate(user=self.librarian)
+
+    def checkout(self, book_ids, **extra):
+        """POST a bulk checkout for the reader"""
+        data = {"books": book_ids, "due_date": "2030-01-01", "user": self.reader.id, **extra}
+        return self.client.post("/api/loans/bulk_checkout/", data, format="json")
+
+    def test_bulk_checkout_reports_per_item_results(self):
+        """Verify available books are lent and the rest reported"""
+        Book.objects.filter(pk=self.books[1].pk).update(is_available=False)
+        response = self.checkout([self.books[0].id, self.books[1].id, 999999])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertIn("loan", results[0])
+        self.assertEqual(results[1]["error"], "Book is currently unavailable.")
+        self.assertEqual(results[2]["error"], "Book not found.")
+        self.assertEqual(Loan.objects.get(pk=results[0]["loan"]).user, self.reader)
+        self.assertEqual(ActivityEvent.objects.filter(user=self.reader, action="LOAN_CREATED").count(), 1)
+
+    def test_bulk_operations_use_fixed_query_count(self):
+        """Verify statement count does not grow with the number of items"""
+        with CaptureQueriesContext(connection) as small:
+            self.checkout([book.id for book in self.books[:2]])
+        with CaptureQueriesContext(connection) as large:
+            self.checkout([book.id for book in self.books[2:]])
+        self.assertEqual(len(small), len(large))
+
+        loan_ids = list(Loan.objects.values_list("id", flat=True))
+        with CaptureQueriesContext(connection) as small:
+            self.client.post("/api/loans/bulk_return/", {"loans": loan_ids[:2]}, format="json")
+        with CaptureQueriesContext(connection) as large:
+            self.client.post("/api/loans/bulk_return/", {"loans": loan_ids[2:]}, format="json")
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_bulk_return_charges_fines_once(self):
+        """Verify fines per loan and already-returned loans are reported"""
+        results = self.checkout([self.books[0].id, self.books[1].id]).data["results"]
+        late, on_time = (result["loan"] for result in results)
+        Loan.objects.filter(pk=late).update(due_date=timezone.now().date() - timezone.timedelta(days=4))
+        response = self.client.post("/api/loans/bulk_return/", {"loans": [late, on_time]}, format="json")
+        self.assertEqual([r["fine"] for r in response.data["results"]], ["4.00", "0.00"])
+        self.assertTrue(Book.objects.get(pk=self.books[0].pk).is_available)
+
+        response = self.client.post("/api/loans/bulk_return/", {"loans": [late]}, format="json")
+        self.assertEqual(response.data["results"][0]["error"], "Book already returned!")
+
+    def test_readers_are_limited_to_their_own_loans(self):
+        """Verify readers cannot lend to or return for other users"""
+        loan_id = self.checkout([self.books[0].id]).data["results"][0]["loan"]
+        other = CustomUser.objects.create_user(username="bystander", password="Pass1234", role="reader")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.checkout([self.books[1].id]).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post("/api/loans/bulk_return/", {"loans": [loan_id]}, format="json")
+        self.assertEqual(response.data["results"][0]["error"], "Loan not found.")
+
+
+class ConcurrentCheckoutTestCase(TransactionTestCase):
+    """Stress-tests checkout from several threads against committed data"""
+
+    def test_no_book_is_lent_twice(self):
+        """Verify concurrent borrowers never obtain the same book"""
+        out = StringIO()
+        call_command("stress_checkout", threads=4, books=5, copies=2, attempts=40, return_rate=0, stdout=out)
+        self.assertIn("10 checkouts, 0 returns, 30 rejected as unavailable", out.getvalue())
+        self.assertIn("No copy was lent twice", out.getvalue())
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_mixed_checkouts_and_returns_keep_counters_exact(self):
+        """Verify concurrent checkouts and returns neither deadlock nor drift the counters"""
+        out = StringIO()
+        call_command("stress_checkout", threads=4, books=3, copies=2, attempts=80, return_rate=0.4, stdout=out)
+        self.assertIn("0 deadlocks", out.getvalue())
+        self.assertIn("counters consistent", out.getvalue())
+        self.assertRegex(out.getvalue(), r"[1-9]\d* returns")
+        self.assertFalse(Book.objects.exists())
+
+
+class ScopedListingTestCase(APITestCase):
+    """Tests role-scoped loan and review listings and their filters"""
+
+    def setUp(self):
+        """Two readers with loans and reviews, and a librarian"""
+        self.librarian = CustomUser.objects.create_user(username="scope_lib", password="Pass1234", role="librarian")
+        self.readers = [
+            CustomUser.objects.create_user(username=f"scope_reader{i}", password="Pass1234") for i in range(2)
+        ]
+        self.books = [
+            Book.objects.create(title=f"Scoped Book {i}", author="Author", category="Fiction", added_by=self.librarian)
+            for i in range(4)
+        ]
+        due = timezone.now().date() + timezone.timedelta(days=14)
+        self.loans = {
+            reader: [circulation.checkout(book, reader, due) for book in self.books[2 * i:2 * i + 2]]
+            for i, reader in enumerate(self.readers)
+        }
+        circulation.return_loan(self.loans[self.readers[0]][0])
+        for reader in self.readers:
+            Review.objects.create(book=self.books[0], user=reader, rating=4)
+
+    def ids(self, response):
+        """Ids of the rows on a listing page"""
+        return {row["id"] for row in response.data["results"]}
+
+    def test_readers_see_only_their_loans(self):
+        """Verify loans are scoped to the reader, and others' loans are not found"""
+        reader, other = self.readers
+        self.client.force_authenticate(user=reader)
+        response = self.client.get("/api/loans/")
+        self.assertEqual(self.ids(response), {loan.id for loan in self.loans[reader]})
+        response = self.client.get(f"/api/loans/?user={other.id}")
+        self.assertEqual(self.ids(response), {loan.id for loan in self.loans[reader]})
+        response = self.client.get("/api/loans/?status=ACTIVE")
+        self.assertEqual(self.ids(response), {self.loans[reader][1].id})
+
+        response = self.client.post(f"/api/loans/{self.loans[other][0].id}/return_book/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_librarians_filter_every_loan(self):
+        """Verify librarians see all loans and can filter by user, status and book"""
+        reader, other = self.readers
+        self.client.force_authenticate(user=self.librarian)
+        self.assertEqual(len(self.client.get("/api/loans/").data["results"]), 4)
+        response = self.client.get(f"/api/loans/?user={other.id}&status=ACTIVE")
+        self.assertEqual(self.ids(response), {loan.id for loan in self.loans[other]})
+        response = self.client.get(f"/api/loans/?book={self.books[3].id}")
+        self.assertEqual(self.ids(response), {self.loans[other][1].id})
+
+        self.assertEqual(self.client.get("/api/loans/?status=LOST").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get("/api/loans/?book=abc").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_review_scoping(self):
+        """Verify readers list their own reviews, or everyone's for one book"""
+        reader, other = self.readers
+        self.client.force_authenticate(user=reader)
+        response = self.client.get("/api/reviews/")
+        self.assertEqual(self.ids(response), set(Review.objects.filter(user=reader).values_list("id", flat=True)))
+        response = self.client.get(f"/api/reviews/?book={self.books[0].id}")
+        self.assertEqual(len(response.data["results"]), 2)
+
+        others = Review.objects.get(user=other)
+        response = self.client.patch(f"/api/reviews/{others.id}/?book={self.books[0].id}", {"rating": 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_listing_query_count_is_constant(self):
+        """Verify the loan listing does not issue per-row queries"""
+        self.client.force_authenticate(user=self.librarian)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(f"/api/loans/?user={self.readers[0].id}")
+        with CaptureQueriesContext(connection) as many:
+            self.client.get("/api/loans/")
+        self.assertEqual(len(few), len(many))
+
+    @skipUnless(connection.vendor == "sqlite", "index names in EXPLAIN output are SQLite-specific")
+    def test_filters_use_composite_indexes(self):
+        """Verify EXPLAIN picks the composite indexes for the scoped filters"""
+        plan = Loan.objects.filter(user=self.readers[0], status="ACTIVE").explain()
+        self.assertIn("loan_user_status_due_idx", plan)
+        plan = Review.objects.filter(book=self.books[0]).order_by("-created_at").explain()
+        self.assertIn("review_book_created_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class LoanArchiveTestCase(APITestCase):
+    """Tests moving old returned loans to the archive and reading them back"""
+
+    def setUp(self):
+        """Lend three books, return two of them long ago"""
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(username="historian", password="Pass1234")
+        self.librarian = CustomUser.objects.create_user(username="archivist", password="Pass1234", role="librarian")
+        self.books = [
+            Book.objects.create(title=f"Old Book {i}", author="Author", category="History", added_by=self.librarian)
+            for i in range(3)
+        ]
+        today = timezone.now().date()
+        self.loans = [circulation.checkout(book, self.reader, today + timezone.timedelta(days=14))
+                      for book in self.books]
+        for loan in self.loans[:2]:
+            circulation.return_loan(loan, today=today - timezone.timedelta(days=400))
+
+    def test_archive_moves_old_returned_loans(self):
+        """Verify only old returned loans leave the hot table, counters unchanged"""
+        report = analytics.circulation_report()
+        out = StringIO()
+        call_command("archive_loans", "--days", "180", "--batch-size", "1", stdout=out)
+        self.assertIn("Archived 2 loans", out.getvalue())
+        self.assertEqual(list(Loan.objects.values_list("id", flat=True)), [self.loans[2].id])
+        self.assertEqual(
+            set(LoanArchive.objects.values_list("id", flat=True)), {self.loans[0].id, self.loans[1].id}
+        )
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+        self.assertEqual(analytics.circulation_report()["loans"], report["loans"])
+
+    def test_history_and_statistics_include_archive(self):
+        """Verify history and rankings read archived loans transparently"""
+        call_command("archive_loans", "--days", "180", stdout=StringIO())
+
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.get("/api/loans/history/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        rows = {row["id"]: row for row in response.data["results"]}
+        self.assertFalse(rows[self.loans[2].id]["archived"])
+        self.assertTrue(rows[self.loans[0].id]["archived"])
+        self.assertEqual(rows[self.loans[0].id]["status"], "RETURNED")
+        self.assertEqual(rows[self.loans[0].id]["book_title"], "Old Book 0")
+
+        # Readers only ever see their own history
+        response = self.client.get(f"/api/loans/history/?user={self.librarian.id}")
+        self.assertEqual(response.data["count"], 3)
+
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get(f"/api/loans/history/?book={self.books[0].id}")
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get("/api/statistics/")
+        borrowed = {row["book__id"]: row["loan_count"] for row in response.data["most_borrowed_books"]}
+        self.assertEqual(borrowed, {book.id: 1 for book in self.books})
+        self.assertEqual(response.data["most_active_users"][0]["loan_count"], 3)
+
+
+class RequestLogTestCase(APITestCase):
+    """Tests structured request logging, sampling and the queued JSON writer"""
+
+    def setUp(self):
+        """Authenticate a reader"""
+        self.user = CustomUser.objects.create_user(username="logged", password="Pass1234")
+        self.client.force_authenticate(user=self.user)
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=1.0)
+    def test_request_record_fields(self):
+        """Verify a request is logged with route, status, user and timings"""
+        with self.assertLogs("library.requests", level="INFO") as logs:
+            self.client.get("/api/loans/")
+        fields = logs.records[0].fields
+        self.assertEqual(fields["method"], "GET")
+        self.assertEqual(fields["route"], "api/loans/$")
+        self.assertEqual(fields["status"], 200)
+        self.assertEqual(fields["user_id"], self.user.id)
+        self.assertGreater(fields["db_queries"], 0)
+        self.assertGreaterEqual(fields["duration_ms"], fields["db_ms"])
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0.0)
+    def test_sampling_keeps_slow_requests(self):
+        """Verify unsampled requests are skipped unless slow"""
+        with self.assertNoLogs("library.requests"):
+            self.client.get("/api/loans/")
+        with override_settings(REQUEST_LOG_SLOW_MS=0):
+            with self.assertLogs("library.requests", level="WARNING") as logs:
+                self.client.get("/api/loans/")
+        self.assertTrue(logs.records[0].fields["slow"])
+
+    def test_queue_handler_writes_json_lines(self):
+        """Verify records are written as JSON by the listener thread"""
+        stream = StringIO()
+        handler = QueueStreamHandler(stream=stream)
+        self.assertFalse(handler.started, "the listener starts with the first record")
+        record = logging.LogRecord("library.requests", logging.INFO, __file__, 1, "GET / 200", None, None)
+        record.fields = {"status": 200, "route": "api/"}
+        handler.handle(record)
+        handler.close()
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry["message"], "GET / 200")
+        self.assertEqual(entry["status"], 200)
+        self.assertEqual(entry["route"], "api/")
+
+
+class QueryInstrumentationTestCase(APITestCase):
+    """Tests per-request query counting, Server-Timing and N+1 detection"""
+
+    def setUp(self):
+        """Authenticate a reader with a few books in the catalog"""
+        self.user = CustomUser.objects.create_user(username="measured", password="Pass1234")
+        self.client.force_authenticate(user=self.user)
+        self.books = [
+            Book.objects.create(title=f"Counted Book {i}", author="Author", category="Fiction", added_by=self.user)
+            for i in range(6)
+        ]
+
+    def test_server_timing_header(self):
+        """Verify responses report database and total time"""
+        response = self.client.get("/api/loans/")
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;desc="\d+ queries";dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_repeated_query_shapes_are_detected(self):
+        """Verify per-row lookups collapse into one shape, batches of any size too"""
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for book in self.books:
+                Book.objects.get(pk=book.pk)
+            list(Book.objects.filter(pk__in=[1, 2]))
+            list(Book.objects.filter(pk__in=[1, 2, 3]))
+        repeated = dict(recorder.repeated(2))
+        self.assertEqual(sorted(repeated.values()), [2, 6])
+        self.assertEqual(recorder.count, 8)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=1)
+    def test_repeated_shapes_are_logged(self):
+        """Verify the middleware warns about shapes reaching the threshold"""
+        with self.assertLogs("library.queries", level="WARNING") as logs:
+            self.client.get("/api/loans/")
+        self.assertEqual(logs.records[0].fields["route"], "api/loans/$")
+        self.assertIn("library_loan", logs.records[0].fields["shape"])
+
+
+class EndpointQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """Holds the main endpoints to fixed query budgets, whatever the row count"""
+
+    def setUp(self):
+        """A librarian and a reader with loans, holds and reviews on several books"""
+        cache.clear()
+        self.librarian = CustomUser.objects.create_user(username="budget_lib", password="Pass1234", role="librarian")
+        self.reader = CustomUser.objects.create_user(username="budget_reader", password="Pass1234")
+        self.books = [
+            Book.objects.create(title=f"Budget Book {i}", author="Author", category=f"Cat {i % 3}",
+                                added_by=self.librarian)
+            for i in range(8)
+        ]
+        due = timezone.now().date() + timezone.timedelta(days=14)
+        for book in self.books[:5]:
+            circulation.checkout(book, self.reader, due)
+        for book in self.books[:3]:
+            circulation.place_hold(book, self.librarian)
+            Review.objects.create(book=book, user=self.reader, rating=5)
+
+    def test_reader_endpoints(self):
+        """Verify reader-facing listings stay within budget"""
+        self.client.force_authenticate(user=self.reader)
+        budgets = {
+            "/api/books/": 1,
+            "/api/loans/": 1,
+            "/api/loans/history/": 2,
+            "/api/reviews/": 1,
+            f"/api/reviews/?book={self.books[0].id}": 1,
+            "/api/reservations/my_reservations/": 1,
+            "/api/dashboard/": 5,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url), self.assertQueryBudget(budget):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_librarian_endpoints(self):
+        """Verify staff listings and statistics stay within budget"""
+        self.client.force_authenticate(user=self.librarian)
+        budgets = {
+            "/api/loans/": 1,
+            "/api/reservations/": 1,
+            "/api/statistics/": 11,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url), self.assertQueryBudget(budget):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+
+class MetricsRegistryTestCase(SimpleTestCase):
+    """Tests metric aggregation across workers and the text exposition"""
+
+    def setUp(self):
+        """Point two registries (two 'workers') at one temporary file"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "metrics.sqlite3")
+        self.workers = [metrics.Registry(path=self.path, flush_interval=60) for _ in range(2)]
+
+    def test_suite_does_not_use_the_configured_metrics_file(self):
+        """Verify the tests record metrics in their own file, never the developer's"""
+        self.assertEqual(os.path.dirname(metrics.registry.path), tempfile.gettempdir())
+
+    def test_counters_and_histograms_sum_across_workers(self):
+        """Verify every worker's samples are folded into one series"""
+        for registry, latency in zip(self.workers, (0.02, 3.0)):
+            registry.counter("jobs_total", "Jobs", ("kind",)).inc(kind="sweep")
+            registry.histogram("job_seconds", "Job time", buckets=(0.1, 1.0)).observe(latency)
+            registry.flush()
+        text = self.workers[0].render()
+        self.assertIn('jobs_total{kind="sweep"} 2', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 1', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn("job_seconds_count 2", text)
+        self.assertIn("job_seconds_sum 3.02", text)
+        self.assertIn("# TYPE job_seconds histogram", text)
+
+    def test_gauges_add_up_live_workers(self):
+        """Verify gauges report the sum of each worker's current value"""
+        for registry, value in zip(self.workers, (3, 4)):
+            registry.gauge("queue_depth", "Queued jobs").set(value)
+            registry.flush()
+        self.workers[1].gauge("queue_depth", "Queued jobs").dec()
+        self.assertIn("queue_depth 6", self.workers[1].render())
+
+    def test_labels_are_checked_and_escaped(self):
+        """Verify label sets must match and values are escaped"""
+        registry = self.workers[0]
+        requests_total = registry.counter("calls_total", "Calls", ("route",))
+        with self.assertRaises(ValueError):
+            requests_total.inc(path="/")
+        requests_total.inc(route='say "hi"')
+        self.assertIn('calls_total{route="say \\"hi\\""} 1', registry.render())
+
+    def test_updates_never_wait_for_a_busy_file(self):
+        """Verify a due flush runs on the flusher thread, not on the updating one"""
+        registry = metrics.Registry(path=self.path, flush_interval=0)
+        blocker = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(blocker.close)
+        blocker.executescript(metrics.SCHEMA)
+        blocker.execute("BEGIN IMMEDIATE")
+        started = time.perf_counter()
+        registry.counter("busy_total", "Updates while the file is locked").inc()
+        self.assertLess(time.perf_counter() - started, 1)
+
+        blocker.execute("ROLLBACK")
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            rows = blocker.execute("SELECT value FROM metric_samples WHERE name = 'busy_total'").fetchall()
+            if rows:
+                break
+            time.sleep(0.05)
+        self.assertEqual(rows, [(1.0,)])
+
+
+class MetricsEndpointTestCase(APITestCase):
+    """Tests request metrics and the admin-only /api/metrics/ endpoint"""
+
+    def setUp(self):
+        """Use a temporary metrics file for the default registry"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(METRICS_LOCATION=os.path.join(directory, "metrics.sqlite3"))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = CustomUser.objects.create_user(username="metrics_admin", password="Pass1234", role="admin")
+        self.reader = CustomUser.objects.create_user(username="metrics_reader", password="Pass1234")
+
+    def test_admin_scrapes_request_metrics(self):
+        """Verify requests are counted and timed per route"""
+        self.client.force_authenticate(user=self.admin)
+        self.client.get("/api/loans/")
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        self.assertIn('library_http_requests_total{method="GET",route="api/loans/$",status="200"}', text)
+        self.assertIn('library_http_request_duration_seconds_bucket{method="GET",route="api/loans/$",le="+Inf"}', text)
+        self.assertIn('library_http_request_db_seconds_count{method="GET",route="api/loans/$"}', text)
+        self.assertIn("library_cache_hits_total", text)
+        self.assertIn('library_objects{counter="loans_active"}', text)
+
+    def test_google_books_latency_is_recorded(self):
+        """Verify proxy calls are timed by outcome"""
+        with patch("library.views.requests.get", side_effect=requests.RequestException("offline")):
+            self.client.get("/api/google-books/", {"q": "django"})
+        self.client.force_authenticate(user=self.admin)
+        text = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('library_google_books_request_duration_seconds_count{outcome="error"} 1', text)
+
+    def test_metrics_are_admin_only(self):
+        """Verify readers cannot scrape metrics"""
+        self.client.force_authenticate(user=self.reader)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProfilingTestCase(APITestCase):
+    """Tests on-demand request profiling and the admin /api/profiling/ endpoints"""
+
+    def setUp(self):
+        """Use a temporary profile directory; authenticate with real JWTs, as the middleware does"""
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings_override = override_settings(PROFILE_DIR=self.directory, PROFILE_KEEP=50)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = CustomUser.objects.create_user(
+            username="profile_admin", password="Pass1234", role="admin", is_active=True,
+        )
+        self.reader = CustomUser.objects.create_user(username="profile_reader", password="Pass1234", is_active=True)
+
+    def login(self, user):
+        """Send a bearer token for the user on every request"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+    def test_admin_request_is_profiled(self):
+        """Verify an admin's cpu profile is stored, listed and downloadable"""
+        self.login(self.admin)
+        response = self.client.get("/api/books/", HTTP_X_PROFILE="cpu")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response["X-Profile-Id"]
+        stats = pstats.Stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        self.assertGreater(stats.total_calls, 0)
+
+        listing = self.client.get("/api/profiling/")
+        self.assertEqual(listing.status_code, status.HTTP_200_OK)
+        self.assertEqual(listing.data[0]["id"], profile_id)
+        self.assertEqual(listing.data[0]["route"], "api/books/$")
+        self.assertEqual(listing.data[0]["files"], [f"{profile_id}.prof"])
+
+        download = self.client.get(f"/api/profiling/{profile_id}.prof/")
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        self.assertTrue(b"".join(download.streaming_content))
+
+    def test_memory_profile_stores_snapshot(self):
+        """Verify a memory profile stores a loadable tracemalloc snapshot and top allocations"""
+        self.login(self.admin)
+        profile_id = self.client.get("/api/books/", HTTP_X_PROFILE="memory")["X-Profile-Id"]
+        snapshot = tracemalloc.Snapshot.load(os.path.join(self.directory, f"{profile_id}.tracemalloc"))
+        self.assertTrue(snapshot.traces)
+        self.assertFalse(tracemalloc.is_tracing())
+        entry = self.client.get("/api/profiling/").data[0]
+        self.assertTrue(entry["top_allocations"])
+        self.assertIn("peak_kb", entry)
+
+    def test_header_ignored_for_non_admins(self):
+        """Verify readers and anonymous clients are served without being profiled"""
+        self.login(self.reader)
+        response = self.client.get("/api/books/", HTTP_X_PROFILE="cpu")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-Profile-Id", response)
+        self.client.credentials()
+        self.assertNotIn("X-Profile-Id", self.client.get("/api/books/", HTTP_X_PROFILE="cpu"))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_requests_without_header_skip_profiler(self):
+        """Verify the profiler is never entered without the header"""
+        self.login(self.admin)
+        with patch("library.profiling.profile_call") as profile_call:
+            self.client.get("/api/books/")
+        profile_call.assert_not_called()
+
+    def test_old_profiles_are_pruned(self):
+        """Verify only the newest PROFILE_KEEP profiles are kept"""
+        self.login(self.admin)
+        with self.settings(PROFILE_KEEP=2):
+            ids = [self.client.get("/api/books/", HTTP_X_PROFILE="cpu")["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual([entry["id"] for entry in self.client.get("/api/profiling/").data], ids[:0:-1])
+
+    def test_profiling_endpoints_are_admin_only(self):
+        """Verify readers are refused and unknown file names are not served"""
+        self.login(self.reader)
+        self.assertEqual(self.client.get("/api/profiling/").status_code, status.HTTP_403_FORBIDDEN)
+        self.login(self.admin)
+        self.assertEqual(self.client.get("/api/profiling/settings.py/").status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get("/api/profiling/20260101T000000000000-abcdef12.txt/").status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
 
 class ReservationAPITestCase(APITestCase):
     """Tests reservation management including creation and cancellation"""
@@ -159,9 +1097,15 @@ class ReservationAPITestCase(APITestCase):
         loan_data = {"book": self.book.id, "due_date": "2025-12-31"}
         self.client.post("/api/loans/", loan_data, format="json")
         
-        # Try to reserve
+        # Reserving joins the book's hold queue
         data = {"book": self.book.id}
         response = self.client.post("/api/reservations/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], "WAITING")
+        self.assertEqual(response.data["position"], 1)
+
+        # But only once per patron
+        response = self.client.post("/api/reservations/", data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_auto_expire_reservation(self):
@@ -174,6 +1118,219 @@ class ReservationAPITestCase(APITestCase):
         self.assertTrue(reservation.is_expired())
 
 
+class HoldQueueTestCase(APITestCase):
+    """Tests the per-book FIFO hold queue and allocation on return"""
+
+    def setUp(self):
+        """Lend the only copy of a book, so reservations queue up"""
+        cache.clear()
+        self.borrower = CustomUser.objects.create_user(username="borrower", password="Pass1234")
+        self.book = Book.objects.create(title="Popular Book", author="Author", category="Fiction",
+                                        added_by=self.borrower)
+        self.loan = circulation.checkout(self.book, self.borrower, timezone.now().date() + timezone.timedelta(days=14))
+
+    def queue(self, count):
+        """Add count patrons to the book's queue, in order"""
+        patrons = []
+        for i in range(count):
+            patron = CustomUser.objects.create_user(username=f"waiter{i}", password="Pass1234")
+            circulation.place_hold(self.book, patron)
+            patrons.append(patron)
+        return patrons
+
+    def test_return_allocates_copy_to_next_in_line(self):
+        """Verify the returned copy is held for the first waiter, not shelved"""
+        first, second = self.queue(2)
+        self.loan.mark_as_returned()
+
+        self.book.refresh_from_db()
+        self.assertFalse(self.book.is_available)
+        self.assertEqual(self.book.available_copies, 0)
+        hold = Reservation.objects.get(user=first)
+        self.assertEqual(hold.status, "ACTIVE")
+        self.assertGreater(hold.expires_at, timezone.now() + timezone.timedelta(days=2))
+        self.assertEqual(Reservation.objects.get(user=second).status, "WAITING")
+        self.assertTrue(ActivityEvent.objects.filter(user=first, action="HOLD_READY").exists())
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_hold_promoted_concurrently_is_not_served_twice(self):
+        """Verify a head promoted by another writer gets no second copy or notice"""
+        holder, = self.queue(1)
+        select_for_update = Reservation.objects.select_for_update
+
+        def promoted_meanwhile(*args, **kwargs):
+            # Another return promotes the head between the queue read and the lock
+            Reservation.objects.filter(user=holder).update(status="ACTIVE")
+            stats.adjust(reservations_waiting=-1, reservations_active=1)
+            return select_for_update(*args, **kwargs)
+
+        with patch.object(Reservation.objects, "select_for_update", side_effect=promoted_meanwhile):
+            self.loan.mark_as_returned()
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertFalse(ActivityEvent.objects.filter(user=holder, action="HOLD_READY").exists())
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_concurrent_holds_get_distinct_positions(self):
+        """Verify placing a hold locks the book row before reading the queue tail"""
+        patron = CustomUser.objects.create_user(username="waiter", password="Pass1234")
+        with CaptureQueriesContext(connection) as queries:
+            circulation.place_hold(self.book, patron)
+        sql = [query["sql"] for query in queries.captured_queries if "SAVEPOINT" not in query["sql"]]
+        self.assertIn('FROM "library_book"', sql[0])
+        self.assertEqual(Reservation.objects.get(user=patron).position, 1)
+
+    def test_stale_loan_is_returned_once(self):
+        """Verify two stale copies of one loan return its copy only once"""
+        first, second = self.queue(2)
+        stale = Loan.objects.get(pk=self.loan.pk)
+        self.loan.mark_as_returned()
+        with self.assertRaises(circulation.AlreadyReturned):
+            stale.mark_as_returned()
+
+        self.assertEqual(Reservation.objects.get(user=first).status, "ACTIVE")
+        self.assertEqual(Reservation.objects.get(user=second).status, "WAITING")
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post(f"/api/loans/{self.loan.pk}/return_book/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_loan_swept_overdue_after_loading_is_counted_as_overdue(self):
+        """Verify a return moves the counter of the status the loan has under lock"""
+        Loan.objects.filter(pk=self.loan.pk).update(due_date=timezone.now().date() - timezone.timedelta(days=1))
+        stale = Loan.objects.get(pk=self.loan.pk)
+        sweep_overdue()
+        stale.mark_as_returned()
+
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).status, "RETURNED")
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_stale_hold_cancel_keeps_a_collected_copy_lent(self):
+        """Verify cancelling a hold picked up since it was loaded is refused"""
+        holder, = self.queue(1)
+        self.loan.mark_as_returned()
+        stale = Reservation.objects.get(user=holder)
+        circulation.checkout(self.book, holder, timezone.now().date() + timezone.timedelta(days=14))
+
+        with self.assertRaises(circulation.HoldClosed):
+            stale.cancel_reservation()
+        self.assertEqual(Reservation.objects.get(user=holder).status, "FULFILLED")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+        self.client.force_authenticate(user=holder)
+        response = self.client.post(f"/api/reservations/{stale.pk}/cancel_reservation/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_waiters_are_skipped(self):
+        """Verify waiters past their deadline are expired on the way"""
+        stale, fresh = self.queue(2)
+        Reservation.objects.filter(user=stale).update(expires_at=timezone.now() - timezone.timedelta(minutes=1))
+        self.loan.mark_as_returned()
+
+        self.assertEqual(Reservation.objects.get(user=stale).status, "EXPIRED")
+        self.assertEqual(Reservation.objects.get(user=fresh).status, "ACTIVE")
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_holder_borrows_held_copy(self):
+        """Verify the holder can borrow the copy set aside and others cannot"""
+        holder, = self.queue(1)
+        self.loan.mark_as_returned()
+
+        self.client.force_authenticate(user=self.borrower)
+        response = self.client.post("/api/loans/", {"book": self.book.id, "due_date": "2030-01-01"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=holder)
+        response = self.client.post("/api/loans/", {"book": self.book.id, "due_date": "2030-01-01"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.get(user=holder).status, "FULFILLED")
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_cancelled_hold_passes_copy_on(self):
+        """Verify cancelling a held copy hands it to the next waiter"""
+        holder, waiter = self.queue(2)
+        self.loan.mark_as_returned()
+
+        self.client.force_authenticate(user=holder)
+        hold = Reservation.objects.get(user=holder)
+        response = self.client.post(f"/api/reservations/{hold.id}/cancel_reservation/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Reservation.objects.get(user=waiter).status, "ACTIVE")
+
+        Reservation.objects.get(user=waiter).cancel_reservation()
+        self.book.refresh_from_db()
+        self.assertTrue(self.book.is_available)
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_return_query_count_ignores_queue_length(self):
+        """Verify a return runs the same number of queries for 1 or 10 waiters"""
+        self.queue(1)
+        with CaptureQueriesContext(connection) as short:
+            self.loan.mark_as_returned()
+
+        other = Book.objects.create(title="Other Book", author="Author", category="Fiction", added_by=self.borrower)
+        loan = circulation.checkout(other, self.borrower, timezone.now().date() + timezone.timedelta(days=14))
+        for i in range(10):
+            patron = CustomUser.objects.create_user(username=f"queued{i}", password="Pass1234")
+            circulation.place_hold(other, patron)
+        with CaptureQueriesContext(connection) as long:
+            loan.mark_as_returned()
+        self.assertEqual(len(short), len(long))
+
+
+class ReservationExpiryTestCase(APITestCase):
+    """Tests the bulk expiry pass and retention purge of reservations"""
+
+    def setUp(self):
+        """Lend the only copy of a book and queue three patrons for it"""
+        self.borrower = CustomUser.objects.create_user(username="borrower", password="Pass1234")
+        self.book = Book.objects.create(title="Held Book", author="Author", category="Fiction",
+                                        added_by=self.borrower)
+        self.loan = circulation.checkout(self.book, self.borrower, timezone.now().date() + timezone.timedelta(days=14))
+        self.patrons = [
+            CustomUser.objects.create_user(username=f"patron{i}", password="Pass1234") for i in range(3)
+        ]
+        for patron in self.patrons:
+            circulation.place_hold(self.book, patron)
+
+    def test_expired_held_copy_goes_to_next_in_line(self):
+        """Verify a held copy past pickup is expired and passed on"""
+        first, second, third = self.patrons
+        self.loan.mark_as_returned()
+        Reservation.objects.filter(user__in=[first, third]).update(
+            expires_at=timezone.now() - timezone.timedelta(minutes=1)
+        )
+
+        waiting, held = circulation.expire_holds(batch_size=1)
+        self.assertEqual((waiting, held), (1, 1))
+        statuses = dict(Reservation.objects.values_list("user__username", "status"))
+        self.assertEqual(statuses, {"patron0": "EXPIRED", "patron1": "ACTIVE", "patron2": "EXPIRED"})
+        self.assertEqual(circulation.expire_holds(), (0, 0))
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_purge_deletes_old_closed_reservations(self):
+        """Verify the command purges closed reservations past retention only"""
+        first, second, third = self.patrons
+        Reservation.objects.get(user=first).cancel_reservation()
+        Reservation.objects.get(user=second).cancel_reservation()
+        Reservation.objects.filter(user=first).update(created_at=timezone.now() - timezone.timedelta(days=400))
+
+        out = StringIO()
+        call_command("expire_reservations", "--retention-days", "365", stdout=out)
+        self.assertIn("Expired 0 queued and 0 held reservations, purged 1", out.getvalue())
+        self.assertEqual(
+            set(Reservation.objects.values_list("user__username", flat=True)), {"patron1", "patron2"}
+        )
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+
 class ReviewAPITestCase(APITestCase):
     """Tests review submission and validation"""
     
@@ -206,6 +1363,54 @@ class ReviewAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
   
+class BookRatingAggregatesTestCase(APITestCase):
+    """Tests the denormalized rating aggregates on Book"""
+
+    def setUp(self):
+        """Create two readers and a book to review"""
+        self.user = CustomUser.objects.create_user(username="rater", password="testpass", role="reader")
+        self.other = CustomUser.objects.create_user(username="rater2", password="testpass", role="reader")
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title="Rated Book", author="Author", category="Fiction", added_by=self.user)
+
+    def assertRating(self, average, count):
+        """Check the aggregates stored on the book"""
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.rating_avg, self.book.rating_count), (average, count))
+
+    def test_aggregates_follow_review_writes(self):
+        """Verify create, update and delete keep sum, count and average exact"""
+        first = Review.objects.create(book=self.book, user=self.user, rating=5)
+        second = Review.objects.create(book=self.book, user=self.other, rating=2)
+        self.assertRating(3.5, 2)
+
+        second.rating = 4
+        second.save()
+        self.assertRating(4.5, 2)
+
+        first.delete()
+        second.delete()
+        self.assertRating(0.0, 0)
+
+    def test_serializer_and_statistics_expose_ratings(self):
+        """Verify ratings appear on book responses and in top rated books"""
+        self.client.post("/api/reviews/", {"book": self.book.id, "rating": 4}, format="json")
+        response = self.client.get(f"/api/books/{self.book.id}/")
+        self.assertEqual((response.data["average_rating"], response.data["rating_count"]), (4.0, 1))
+
+        cache.clear()
+        top_rated = self.client.get("/api/statistics/").data["top_rated_books"]
+        self.assertEqual(top_rated[0]["book__id"], self.book.id)
+        self.assertEqual(top_rated[0]["avg_rating"], 4.0)
+
+    def test_recompute_ratings_repairs_aggregates(self):
+        """Verify the repair command rebuilds aggregates from reviews"""
+        Review.objects.create(book=self.book, user=self.user, rating=3)
+        Book.objects.filter(id=self.book.id).update(rating_sum=0, rating_count=0, rating_avg=0)
+        call_command("recompute_ratings", batch_size=1, stdout=StringIO())
+        self.assertRating(3.0, 1)
+
+
 class AccountActivationTestCase(APITestCase):
     """Tests user account activation workflow with token validation"""
     
@@ -243,6 +1448,7 @@ class UserDashboardTestCase(APITestCase):
         # Ensure profile is created
         from .models import Profile
         Profile.objects.get_or_create(user=self.user)
+        cache.clear()
 
     def test_dashboard_empty(self):
         """Verify dashboard structure with no active records"""
@@ -255,12 +1461,97 @@ class UserDashboardTestCase(APITestCase):
         self.assertEqual(data["active_reservations"], [])
         self.assertEqual(data["reviews"], [])
 
+    def test_dashboard_query_count_and_cache(self):
+        """Verify one query per section when cold and none when cached"""
+        book = Book.objects.create(title="Dash Book", author="Author", category="Fiction", added_by=self.user)
+        other = Book.objects.create(title="Dash Book 2", author="Author", category="Fiction", added_by=self.user)
+        Loan.objects.create(book=book, user=self.user, due_date="2030-01-01")
+        Loan.objects.create(book=other, user=self.user, due_date="2030-01-01")
+        Reservation.objects.create(book=book, user=self.user, expires_at=timezone.now() + timezone.timedelta(days=3))
+        Review.objects.create(book=book, user=self.user, rating=5, comment="Great")
+        self.client.force_authenticate(user=CustomUser.objects.get(pk=self.user.pk))
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/dashboard/")
+        self.assertEqual(len(response.data["active_loans"]), 2)
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/dashboard/")
+        self.assertEqual(cached.data, response.data)
+
+    def test_dashboard_invalidated_by_writes(self):
+        """Verify a new loan or activity event shows up on the next request"""
+        self.client.get("/api/dashboard/")
+        book = Book.objects.create(title="Fresh Book", author="Author", category="Fiction", added_by=self.user)
+        Loan.objects.create(book=book, user=self.user, due_date="2030-01-01")
+        response = self.client.get("/api/dashboard/")
+        self.assertEqual(response.data["active_loans"][0]["book_title"], "Fresh Book")
+        activity.record(self.user, "LEGACY", "Just now")
+        response = self.client.get("/api/dashboard/")
+        self.assertEqual(response.data["recent_activity"][0]["description"], "Just now")
+
+
+class ActivityLogTestCase(APITestCase):
+    """Tests the append-only activity log"""
+
+    def setUp(self):
+        """Create a reader, another user and a book"""
+        self.user = CustomUser.objects.create_user(username="activeuser", password="Pass1234", role="reader")
+        self.other = CustomUser.objects.create_user(username="otheractive", password="Pass1234", role="reader")
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title="Logged Book", author="Author", category="Fiction", added_by=self.user)
+        cache.clear()
+
+    def test_loans_and_reservations_append_events(self):
+        """Verify loan and reservation creation each append one event"""
+        self.client.post("/api/reservations/", {"book": self.book.id})
+        self.client.post("/api/loans/", {"book": self.book.id, "due_date": "2030-01-01"}, format="json")
+        actions = list(ActivityEvent.objects.filter(user=self.user).order_by("id").values_list("action", flat=True))
+        self.assertEqual(actions, ["RESERVATION_CREATED", "LOAN_CREATED"])
+
+    def test_activity_endpoint_is_scoped_and_paginated(self):
+        """Verify users page through only their own events, newest first"""
+        for i in range(3):
+            activity.record(self.user, "LEGACY", f"Event {i}")
+        activity.record(self.other, "LEGACY", "Not yours")
+        response = self.client.get("/api/activity/")
+        descriptions = [event["description"] for event in response.data["results"]]
+        self.assertEqual(descriptions, ["Event 2", "Event 1", "Event 0"])
+
+    def test_librarians_read_other_users_logs(self):
+        """Verify ?user= works for the librarian role and is ignored for readers"""
+        activity.record(self.other, "LEGACY", "Other's event")
+        response = self.client.get("/api/activity/", {"user": self.other.id})
+        self.assertEqual(response.data["results"], [])
+
+        librarian = CustomUser.objects.create_user(username="loglibrarian", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=librarian)
+        response = self.client.get("/api/activity/", {"user": self.other.id})
+        self.assertEqual([event["description"] for event in response.data["results"]], ["Other's event"])
+        response = self.client.get("/api/activity/", {"user": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_librarians_cannot_reach_other_profiles(self):
+        """Verify profiles stay private to their owner and Django staff"""
+        librarian = CustomUser.objects.create_user(username="proflibrarian", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=librarian)
+        profile = Profile.objects.get(user=self.other)
+        response = self.client.delete(f"/api/profiles/{profile.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Profile.objects.filter(pk=profile.pk).exists())
+
+    def test_profile_no_longer_ships_history(self):
+        """Verify profile and dashboard payloads carry only recent events"""
+        activity.record(self.user, "LEGACY", "Something happened")
+        response = self.client.get("/api/dashboard/")
+        self.assertNotIn("activity_history", response.data["profile"])
+        self.assertEqual(response.data["recent_activity"][0]["description"], "Something happened")
+
 
 class StatisticsAPITestCase(APITestCase):
     """Tests statistics endpoint for library analytics"""
     
     def setUp(self):
         """Create comprehensive test data for statistics"""
+        cache.clear()
         self.user = CustomUser.objects.create_user(username="statsuser", password="Pass1234", role="librarian")
         self.client.force_authenticate(user=self.user)
         
@@ -330,6 +1621,208 @@ class StatisticsAPITestCase(APITestCase):
         self.assertEqual(len(categories), 2)  # Fiction and Science
         
 
+class MaterializedStatisticsTestCase(APITestCase):
+    """Tests the incrementally maintained statistics counters"""
+
+    def setUp(self):
+        """Create a librarian and a book, starting with an empty cache"""
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="counteruser", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        self.book = Book.objects.create(title="Counted Book", author="Author", category="Fiction", added_by=self.user)
+
+    def get_counters(self):
+        """Return the materialized counters as the endpoint reports them"""
+        data = self.client.get("/api/statistics/").data
+        return data["books_statistics"], data["loans_statistics"]["by_status"], data["reservations_statistics"]
+
+    def test_counters_follow_loan_lifecycle(self):
+        """Verify loans and returns move books and loans between counters"""
+        response = self.client.post("/api/loans/", {"book": self.book.id, "due_date": "2030-01-01"}, format="json")
+        books, loans, _ = self.get_counters()
+        self.assertEqual((books["total"], books["available"], books["borrowed"]), (1, 0, 1))
+        self.assertEqual(loans["active"], 1)
+
+        self.client.post(f"/api/loans/{response.data['id']}/return_book/")
+        books, loans, _ = self.get_counters()
+        self.assertEqual(books["available"], 1)
+        self.assertEqual((loans["active"], loans["returned"]), (0, 1))
+
+    def test_counters_follow_reservations_and_deletes(self):
+        """Verify reservation status changes and deletions are counted"""
+        reservation = Reservation.objects.create(
+            book=self.book, user=self.user, expires_at=timezone.now() + timezone.timedelta(days=3)
+        )
+        reservation.expire_reservation()
+        _, _, reservations = self.get_counters()
+        self.assertEqual((reservations["active"], reservations["expired"]), (0, 1))
+
+        self.book.delete()
+        books, _, _ = self.get_counters()
+        self.assertEqual(books["total"], 0)
+
+    def test_cached_statistics_read_counters_in_one_query(self):
+        """Verify a warm request costs a single query regardless of history size"""
+        self.client.get("/api/statistics/")
+        with self.assertNumQueries(1):
+            self.client.get("/api/statistics/")
+
+    def test_fresh_recompute_repairs_drift(self):
+        """Verify ?fresh=1 rebuilds counters from the source tables"""
+        Book.objects.filter(id=self.book.id).update(is_available=False)
+        books, _, _ = self.get_counters()
+        self.assertEqual(books["available"], 1)
+
+        response = self.client.get("/api/statistics/", {"fresh": "1"})
+        self.assertEqual(response.data["books_statistics"]["available"], 0)
+        books, _, _ = self.get_counters()
+        self.assertEqual(books["available"], 0)
+
+    def counter_writes(self, queries):
+        """Names of the counter rows updated, in statement order, and whether they came last"""
+        statements = [
+            query["sql"] for query in queries if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))
+        ]
+        writes = [i for i, sql in enumerate(statements) if sql.startswith('UPDATE "library_librarycounter"')]
+        names = [statements[i].split("WHERE")[1].split("=")[1].strip().strip("'") for i in writes]
+        return names, bool(writes) and writes == list(range(writes[0], len(statements)))
+
+    def test_circulation_writes_counters_last_in_sorted_order(self):
+        """Verify checkout and return each update every counter once, at the end, in one fixed order"""
+        reader = CustomUser.objects.create_user(username="counter_reader", password="Pass1234")
+        with CaptureQueriesContext(connection) as checkout_queries:
+            loan = circulation.checkout(self.book, reader, timezone.now().date())
+        with CaptureQueriesContext(connection) as return_queries:
+            circulation.return_loan(loan)
+        for queries in (checkout_queries, return_queries):
+            names, last = self.counter_writes(queries.captured_queries)
+            self.assertTrue(last)
+            self.assertEqual(names, sorted(set(names)))
+        self.assertEqual(stats.read_counters(), stats.aggregate_counters())
+
+    def test_batched_deltas_are_dropped_on_rollback(self):
+        """Verify a failed block leaves the counters untouched"""
+        before = stats.read_counters()
+        with self.assertRaises(RuntimeError):
+            with stats.atomic():
+                stats.adjust(books_total=5)
+                stats.adjust(books_total=-2, loans_active=1)
+                raise RuntimeError
+        self.assertEqual(stats.read_counters(), before)
+        with stats.atomic():
+            stats.adjust(books_total=5)
+            stats.adjust(books_total=-2, loans_active=1)
+        after = stats.read_counters()
+        self.assertEqual((after["books_total"], after["loans_active"]), (before["books_total"] + 3, 1))
+
+
+class OverdueSweepTestCase(APITestCase):
+    """Tests the set-based overdue sweep and fine accrual"""
+
+    def setUp(self):
+        """Create two loans past due, one current loan and one returned loan"""
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="sweepuser", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.late = []
+        for days in (3, 10):
+            book = Book.objects.create(title=f"Late {days}", author="Author", category="Fiction", added_by=self.user)
+            self.late.append(Loan.objects.create(book=book, user=self.user, due_date=self.today - timezone.timedelta(days=days)))
+        book = Book.objects.create(title="Current", author="Author", category="Fiction", added_by=self.user)
+        self.current = Loan.objects.create(book=book, user=self.user, due_date=self.today + timezone.timedelta(days=5))
+        self.returned = Loan.objects.create(
+            book=book, user=self.user, due_date=self.today - timezone.timedelta(days=20), status="RETURNED"
+        )
+
+    def test_sweep_marks_overdue_and_accrues_fines(self):
+        """Verify past-due loans flip to OVERDUE with fines, and reruns are no-ops"""
+        self.assertEqual(sweep_overdue(batch_size=1), (2, 0))
+        fines = dict(Loan.objects.filter(status="OVERDUE").values_list("id", "fine"))
+        self.assertEqual(fines, {self.late[0].id: Decimal("3.00"), self.late[1].id: Decimal("10.00")})
+        self.current.refresh_from_db()
+        self.returned.refresh_from_db()
+        self.assertEqual((self.current.status, self.returned.status), ("ACTIVE", "RETURNED"))
+
+        self.assertEqual(sweep_overdue(), (0, 0))
+        self.assertEqual(sweep_overdue(today=self.today + timezone.timedelta(days=1)), (0, 2))
+        self.late[0].refresh_from_db()
+        self.assertEqual(self.late[0].fine, Decimal("4.00"))
+
+    def test_statistics_and_dashboard_read_stored_status(self):
+        """Verify counters, fines and dashboards reflect the sweep"""
+        out = StringIO()
+        call_command("sweep_overdue", stdout=out)
+        self.assertIn("Marked 2 loans overdue", out.getvalue())
+        loans = self.client.get("/api/statistics/").data["loans_statistics"]
+        self.assertEqual((loans["by_status"]["active"], loans["overdue_count"]), (1, 2))
+        self.assertEqual(loans["outstanding_fines"], "13.00")
+        dashboard = self.client.get("/api/dashboard/").data
+        self.assertEqual(sorted(loan["status"] for loan in dashboard["active_loans"]), ["ACTIVE", "OVERDUE", "OVERDUE"])
+
+    def test_overdue_loan_can_be_returned(self):
+        """Verify returning a swept loan moves it out of the overdue counter"""
+        sweep_overdue()
+        response = self.client.post(f"/api/loans/{self.late[0].id}/return_book/")
+        self.assertEqual(response.data["fine"], "3.00")
+        self.assertEqual(stats.read_counters()["loans_overdue"], 1)
+
+
+class CirculationAnalyticsTestCase(APITestCase):
+    """Tests the vectorized circulation report"""
+
+    def setUp(self):
+        """Create returned, late, overdue and current loans across two categories"""
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="analyst", password="Pass1234", role="librarian")
+        self.client.force_authenticate(user=self.user)
+        today = timezone.now().date()
+        day = lambda offset: today + timezone.timedelta(days=offset)
+        fiction = Book.objects.create(title="Novel", author="Author", category="Fiction", added_by=self.user)
+        science = Book.objects.create(title="Physics", author="Author", category="Science", added_by=self.user)
+        # (book, loaned, due, returned): 4 days late, on time, 16 days overdue, current
+        for book, loaned, due, returned in (
+            (fiction, -20, -6, -2), (fiction, -10, 4, -5), (science, -30, -16, None), (science, -1, 13, None),
+        ):
+            loan = Loan.objects.create(book=book, user=self.user, due_date=day(due))
+            Loan.objects.filter(pk=loan.pk).update(
+                loan_date=timezone.now() + timezone.timedelta(days=loaned),
+                returned_at=day(returned) if returned is not None else None,
+                status="RETURNED" if returned is not None else "ACTIVE",
+            )
+
+    def test_circulation_report_figures(self):
+        """Verify fines, distributions and per-category durations"""
+        # Live loans, archived loans and the category map
+        with self.assertNumQueries(3):
+            report = analytics.circulation_report()
+        self.assertEqual(report["loans"], {"total": 4, "returned": 2, "open": 2, "overdue": 1, "borrowers": 1})
+        self.assertEqual(report["fines"], {"charged": "4.00", "outstanding": "16.00", "total": "20.00"})
+        self.assertEqual(report["late_returns"], {"count": 1, "rate": 0.5})
+        self.assertEqual([row["count"] for row in report["overdue_distribution"]], [0, 0, 1, 0, 0, 0])
+        self.assertEqual(report["overdue_distribution"][2]["days"], "15-30")
+        fiction, science = report["categories"]
+        self.assertEqual((fiction["category"], fiction["returned"], fiction["mean"], fiction["p50"]), ("Fiction", 2, 11.5, 11.5))
+        self.assertEqual((science["loans"], science["returned"], science["mean"]), (2, 0, None))
+        self.assertEqual(report["loan_duration"]["mean"], 11.5)
+
+    def test_empty_library(self):
+        """Verify an empty loan table yields zeros rather than errors"""
+        Loan.objects.all().delete()
+        report = analytics.circulation_report()
+        self.assertEqual(report["loans"]["total"], 0)
+        self.assertEqual(report["fines"]["total"], "0.00")
+        self.assertIsNone(report["loan_duration"]["p90"])
+
+    def test_circulation_endpoint_is_cached(self):
+        """Verify the endpoint serves the report and caches it"""
+        response = self.client.get("/api/statistics/circulation/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["loans"]["total"], 4)
+        with self.assertNumQueries(0):
+            self.client.get("/api/statistics/circulation/")
+
+
 class GoogleBooksAPITestCase(APITestCase):
     """Tests Google Books API integration"""
     
@@ -375,3 +1868,139 @@ class ProfileAPITestCase(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+
+class BenchmarkQueriesCommandTestCase(APITestCase):
+    """Tests the hot-filter query plan benchmark command"""
+
+    def test_benchmark_reports_plans_and_rolls_back(self):
+        """Verify plans are printed for each hot filter and seeded rows are discarded"""
+        out = StringIO()
+        call_command("benchmark_queries", rows=50, users=5, repeat=1, stdout=out)
+        output = out.getvalue()
+        self.assertEqual(output.count("speedup"), 5)
+        self.assertIn("loan_status_due_idx", output)
+        self.assertIn("review_book_created_idx", output)
+        self.assertEqual(Book.objects.count(), 0)
+        self.assertEqual(Loan.objects.count(), 0)
+
+
+class BenchmarkListsCommandTestCase(APITestCase):
+    """Tests the list rendering benchmark command"""
+
+    def test_benchmark_compares_paths_and_rolls_back(self):
+        """Verify both endpoints are timed, return identical bytes and seeded rows are discarded"""
+        out = StringIO()
+        call_command("benchmark_lists", rows=40, page_size=25, repeat=1, stdout=out)
+        output = out.getvalue()
+        self.assertEqual(output.count("speedup"), 2)
+        self.assertIn("Both paths returned identical bytes.", output)
+        self.assertEqual(Book.objects.count(), 0)
+        self.assertEqual(Loan.objects.count(), 0)
+
+
+class NotifyOverdueCommandTestCase(APITestCase):
+    """Tests the batched overdue notifier and its notification ledger"""
+
+    def setUp(self):
+        """Create three overdue loans, one current loan and one reader without email"""
+        self.librarian = CustomUser.objects.create_user(username="notifier", password="testpass", role="librarian")
+        past = timezone.now().date() - timezone.timedelta(days=3)
+        for i in range(3):
+            reader = CustomUser.objects.create_user(username=f"late{i}", email=f"late{i}@example.com", password="testpass")
+            book = Book.objects.create(title=f"Late Book {i}", author="Author", category="Fiction", added_by=self.librarian)
+            Loan.objects.create(book=book, user=reader, due_date=past)
+        book = Book.objects.create(title="Current Book", author="Author", category="Fiction", added_by=self.librarian)
+        Loan.objects.create(book=book, user=CustomUser.objects.get(username="late0"), due_date="2030-01-01")
+        book = Book.objects.create(title="Silent Book", author="Author", category="Fiction", added_by=self.librarian)
+        Loan.objects.create(book=book, user=CustomUser.objects.create_user(username="noemail", password="testpass"), due_date=past)
+
+    def notify(self, **options):
+        """Run notify_overdue and return its output"""
+        out = StringIO()
+        call_command("notify_overdue", stdout=out, **options)
+        return out.getvalue()
+
+    def test_each_loan_notified_once_per_interval(self):
+        """Verify overdue loans are emailed once and a rerun sends nothing"""
+        output = self.notify()
+        self.assertIn("Sent 3 notifications (1 without email, 0 failed)", output)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f"late{i}@example.com" for i in range(3)])
+        self.assertEqual(NotificationLog.objects.count(), 3)
+
+        self.assertIn("Sent 0 notifications", self.notify())
+        self.assertEqual(len(mail.outbox), 3)
+        self.notify(interval_hours=0)
+        self.assertEqual(len(mail.outbox), 6)
+
+    def test_parallel_batches_use_fixed_query_count(self):
+        """Verify one SELECT for all loans and one ledger INSERT per batch"""
+        with self.assertNumQueries(3):
+            self.notify(batch_size=2, workers=2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_dry_run_sends_and_records_nothing(self):
+        """Verify a dry run only reports what would be sent"""
+        output = self.notify(dry_run=True)
+        self.assertIn("Would send 3 notifications", output)
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(NotificationLog.objects.exists())
+
+
+class ImportBooksCommandTestCase(APITestCase):
+    """Tests bulk catalog import from publisher feeds"""
+
+    def setUp(self):
+        """Create the librarian recorded as creator and one existing book"""
+        self.librarian = CustomUser.objects.create_user(username="importer", password="testpass", role="librarian")
+        Book.objects.create(title="Dune", author="Frank Herbert", category="Science Fiction", added_by=self.librarian)
+
+    def write_feed(self, suffix, content):
+        """Write feed content to a temporary file and return its path"""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w", encoding="utf-8") as feed:
+            feed.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def run_import(self, path, **options):
+        """Run import_books and return its output"""
+        out = StringIO()
+        call_command("import_books", path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_csv_skips_duplicates_and_invalid_rows(self):
+        """Verify CSV rows are deduplicated against the catalog and the feed"""
+        path = self.write_feed(".csv", (
+            "title,author,category\n"
+            "Dune,Frank Herbert,Science Fiction\n"
+            "Emma,Jane Austen,Classic\n"
+            "Emma,Jane Austen,Classic\n"
+            ",Nobody,Fiction\n"
+        ))
+        output = self.run_import(path, batch_size=1)
+        self.assertIn("Imported 1 books (2 duplicates, 1 invalid)", output)
+        self.assertEqual(Book.objects.filter(title="Emma").count(), 1)
+
+    def test_import_json_array_and_ndjson(self):
+        """Verify both JSON layouts are imported and become searchable"""
+        books = [{"title": f"Feed Book {i}", "author": "Feed Author"} for i in range(5)]
+        self.run_import(self.write_feed(".json", json.dumps(books)), batch_size=2)
+        ndjson = "\n".join(json.dumps({"title": f"Line Book {i}", "author": "Line Author"}) for i in range(3))
+        self.run_import(self.write_feed(".ndjson", ndjson))
+
+        self.assertEqual(Book.objects.filter(author="Feed Author").count(), 5)
+        self.assertEqual(Book.objects.filter(author="Line Author", category="Uncategorized").count(), 3)
+        self.client.force_authenticate(user=self.librarian)
+        response = self.client.get("/api/books/", {"q": "feed"})
+        self.assertEqual(response.data["count"], 5)
+
+    def test_non_string_fields_are_invalid(self):
+        """Verify records with a non-string title or author are skipped and reported"""
+        records = [
+            {"title": 1984, "author": "George Orwell"},
+            {"title": "Ulysses", "author": ["James Joyce"]},
+            {"title": "Emma", "author": "Jane Austen", "category": {"name": "Classic"}},
+        ]
+        output = self.run_import(self.write_feed(".json", json.dumps(records)))
+        self.assertIn("Imported 1 books (0 duplicates, 2 invalid)", output)
+        self.assertEqual(Book.objects.get(title="Emma").category, "Uncategorized")
@@ -2,7 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (BookViewSet, UserRegistrationView, BookListView, LoanViewSet, ReservationViewSet, 
                     ReviewViewSet, GoogleBooksSearchView, UserRegistrationView, ProfileViewSet,
-                    UserViewSet, ActivateAccountView, UserDashboardView, StatisticsView)
+                    UserViewSet, ActivateAccountView, UserDashboardView, StatisticsView,
+                    CirculationStatisticsView, ActivityEventViewSet, MetricsView,
+                    ProfileListView, ProfileDownloadView)
 
 router = DefaultRouter()
 router.register(r"books", BookViewSet, basename="book")
@@ -11,15 +13,20 @@ router.register(r"reservations", ReservationViewSet)
 router.register(r"reviews", ReviewViewSet, basename="review")
 router.register(r"profiles", ProfileViewSet, basename="profile")
 router.register(r'users', UserViewSet)
+router.register(r"activity", ActivityEventViewSet, basename="activity")
 
 urlpatterns = [
     path("activate/<uidb64>/<token>/", ActivateAccountView.as_view(), name="activate"),
     path("dashboard/", UserDashboardView.as_view(), name="dashboard"),
     path("statistics/", StatisticsView.as_view(), name="statistics"),
+    path("statistics/circulation/", CirculationStatisticsView.as_view(), name="statistics-circulation"),
     path("api/", include(router.urls)),
     path("register/", UserRegistrationView.as_view(), name="user-register"),
     path("", include(router.urls)),
     path("list/", BookListView.as_view(), name="book-list"),
     path("google-books/", GoogleBooksSearchView.as_view(), name="google-books-search"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
+    path("profiling/", ProfileListView.as_view(), name="profiling"),
+    path("profiling/<str:filename>/", ProfileDownloadView.as_view(), name="profiling-download"),
 ]
 urlpatterns += router.urls
\ No newline at end of file
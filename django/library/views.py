@@ -3,12 +3,20 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.views.generic import ListView
 from rest_framework.views import APIView
-from django.views.decorators.cache import cache_page
+from rest_framework.renderers import BrowsableAPIRenderer
 from django.utils.decorators import method_decorator
-from .models import Book, Loan, Reservation, Review, Profile
+from .models import ActivityEvent, Book, Loan, LoanArchive, Reservation, Review, Profile
 from .serializers import (BookSerializer, LoanSerializer, UserRegistrationSerializer, ReservationSerializer, ReviewSerializer, 
-                          ProfileSerializer, UserSerializer)
+                          ProfileSerializer, UserSerializer, ActivityEventSerializer, BulkCheckoutSerializer,
+                          BulkReturnSerializer, LoanHistorySerializer)
 from .permissions import IsLibrarianOrReadOnly, IsAdmin, IsOwnerOrAdmin
+from .pagination import BookSearchPagination, LoanHistoryPagination
+from .caching import CatalogCacheMixin, catalog_cache_page, dashboard_cache_key
+from .listing import FastJSONRenderer, ValuesListMixin
+from . import activity, analytics, archive, circulation, metrics, profiling, search, stats
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404, HttpResponse
 from django.utils import timezone
 import requests
 from django.contrib.auth import get_user_model
@@ -17,14 +25,34 @@ from django.contrib.auth.tokens import default_token_generator
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
-from django.db.models import Count, Q, Avg
+from django.db import connection
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Concat
+import time
 from datetime import timedelta
+from decimal import Decimal
 
 
 
 User = get_user_model()
 
 
+def id_param(request, name):
+    """Integer id from the query string, None if absent; 400 if malformed"""
+    value = request.query_params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise serializers.ValidationError({name: "Must be an integer id."})
+
+
+def is_staff_role(user):
+    """Librarians and admins see every user's loans and reviews"""
+    return user.role in ("librarian", "admin")
+
+
 class UserRegistrationView(generics.CreateAPIView):
     """
     Handles user registration with email activation workflow
@@ -53,7 +81,7 @@ class UserRegistrationView(generics.CreateAPIView):
         )
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(CatalogCacheMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     CRUD operations for book management
     
@@ -61,58 +89,188 @@ class BookViewSet(viewsets.ModelViewSet):
     - Librarians: Full access
     - Others: Read-only
     - Auto-sets added_by to current user on creation
+
+    Caching:
+    - List and detail responses are cached until the catalog version changes
+
+    Performance:
+    - The list is built from values_list() rows and rendered with orjson
+      (see listing.py)
+
+    Parameters:
+    - q (optional): Full-text search over title, author and category;
+      results are ranked by relevance and paginated
+    - category (optional): Only list books in this exact category
     """
     queryset = Book.objects.all().select_related('added_by')
     serializer_class = BookSerializer
     permission_classes = [IsLibrarianOrReadOnly]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    # str(added_by), as StringRelatedField renders it (CustomUser.__str__)
+    list_columns = {"added_by": Concat("added_by__username", Value(" ("), "added_by__role", Value(")"))}
+    cursor_ordering = ("id",)
+
+    def get_search_query(self):
+        """Return the stripped ?q= search string for list requests"""
+        if self.action != "list":
+            return ""
+        return self.request.query_params.get("q", "").strip()
+
+    def get_queryset(self):
+        """Apply ?category= and ranked full-text search when ?q= is given"""
+        queryset = super().get_queryset()
+        category = self.request.query_params.get("category", "").strip()
+        if self.action == "list" and category:
+            queryset = queryset.filter(category=category)
+        query = self.get_search_query()
+        if query:
+            queryset = search.search_books(queryset, query)
+        return queryset
+
+    @property
+    def paginator(self):
+        """Paginate ranked search results by page number"""
+        if not hasattr(self, "_paginator") and self.get_search_query():
+            self._paginator = BookSearchPagination()
+        return super().paginator
 
     def perform_create(self, serializer):
         """Automatically assign current user as book creator"""
         serializer.save(added_by=self.request.user)
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     Manages book loan lifecycle
     
     Features:
-    - Updates book availability status
-    - Tracks loan history in user profile
+    - Race-free checkout: one conditional UPDATE claims the book
+    - Records loans in the user's activity log
     - Provides return_book custom action
+    - bulk_checkout / bulk_return for circulation desks
+    - history: live and archived loans in one listing
+
+    Security:
+    - Readers see only their own loans
+    - Librarians/admins see every loan
+
+    Parameters:
+    - status, book: filter the listing
+    - user (librarians/admins): loans of one user
+
+    Performance:
+    - The list is built from values_list() rows and rendered with orjson
+      (see listing.py)
     """
     queryset = Loan.objects.all().select_related("book", "user")
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    cursor_ordering = ("-loan_date", "-id")
+
+    def get_queryset(self):
+        """Scope loans to the caller unless staff, then apply the filters (loan_user_status_due_idx)"""
+        queryset = super().get_queryset()
+        user = self.request.user
+        user_id, book_id = id_param(self.request, "user"), id_param(self.request, "book")
+        if not is_staff_role(user):
+            queryset = queryset.filter(user=user)
+        elif user_id is not None:
+            queryset = queryset.filter(user_id=user_id)
+        loan_status = self.request.query_params.get("status")
+        if loan_status:
+            if loan_status not in dict(Loan.STATUS_CHOICES):
+                raise serializers.ValidationError({"status": f"Unknown loan status '{loan_status}'."})
+            queryset = queryset.filter(status=loan_status)
+        if book_id is not None:
+            queryset = queryset.filter(book_id=book_id)
+        return queryset
 
     def perform_create(self, serializer):
-        """Handle book availability and user activity tracking"""
+        """Check the book out atomically and record the activity"""
         book = serializer.validated_data["book"]
         serializer.save(user=self.request.user)
-        book.is_available = False
-        book.save()
-        profile = self.request.user.profile
-        current_history = profile.activity_history or ""
-        new_history_line = f"Loan created for '{book.title}' on {timezone.now()}\n"
-        profile.activity_history = current_history + new_history_line
-        profile.save()
+        activity.record(self.request.user, "LOAN_CREATED", f"Loan created for '{book.title}'", book=book)
 
     @action(detail=True, methods=["post"])
     def return_book(self, request, pk=None):
         """Process book returns and calculate overdue fines"""
         loan = self.get_object()
-        if loan.status == "RETURNED":
+        try:
+            # Re-checked under lock: a concurrent return may have closed the loan since it was read
+            loan.mark_as_returned()
+        except circulation.AlreadyReturned:
             return Response({"error": "Book already returned!"}, status=status.HTTP_400_BAD_REQUEST)
-        loan.mark_as_returned()
         return Response({"message": "Book returned successfully!", "fine": f"{loan.fine:.2f}"})
 
+    @action(detail=False, methods=["post"])
+    def bulk_checkout(self, request):
+        """
+        Check out a desk scan of books to one borrower
+
+        Body: {"books": [ids], "due_date": "YYYY-MM-DD", "user": id (librarians only)}
+        Returns per-book results; unavailable or unknown books are reported, not fatal.
+        """
+        serializer = BulkCheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrower = serializer.validated_data.get("user", request.user)
+        if borrower != request.user and request.user.role not in ("librarian", "admin"):
+            return Response(
+                {"error": "Only librarians can check out books for other users."}, status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            results = circulation.bulk_checkout(
+                serializer.validated_data["books"], borrower, serializer.validated_data["due_date"]
+            )
+        except circulation.BookUnavailable:
+            return Response(
+                {"error": "Some of these books were checked out concurrently; please retry."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response({"results": results})
+
+    @action(detail=False, methods=["post"])
+    def bulk_return(self, request):
+        """
+        Return a desk scan of loans
+
+        Body: {"loans": [ids]}; readers may only return their own loans.
+        Returns per-loan results with the fine charged.
+        """
+        serializer = BulkReturnSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        loans = Loan.objects.all()
+        if not is_staff_role(request.user):
+            loans = loans.filter(user=request.user)
+        results = circulation.bulk_return(serializer.validated_data["loans"], queryset=loans)
+        return Response({"results": results})
 
-@method_decorator(cache_page(60 * 15), name='dispatch')
+    @action(detail=False, methods=["get"])
+    def history(self, request):
+        """
+        Loan history including archived loans, newest first
+
+        Parameters:
+        - user (librarians/admins; readers always see their own)
+        - book
+        - page, page_size
+        """
+        user = request.user.pk
+        if is_staff_role(request.user):
+            user = id_param(request, "user")
+        loans = archive.loan_history(user=user, book=id_param(request, "book"))
+        paginator = LoanHistoryPagination()
+        page = paginator.paginate_queryset(loans, request, view=self)
+        return paginator.get_paginated_response(LoanHistorySerializer(page, many=True).data)
+
+
+@method_decorator(catalog_cache_page, name='dispatch')
 class BookListView(ListView):
     """
     Cached book listing for public access
     
     Features:
-    - 15-minute response caching
+    - Response cached until the catalog version changes
     - Traditional Django template rendering
     """
     model = Book
@@ -125,36 +283,41 @@ class ReservationViewSet(viewsets.ModelViewSet):
     Manages book reservations with expiration
     
     Features:
-    - Automatic 3-day expiration
+    - Reserving unavailable books joins a FIFO hold queue
+    - Held copies wait 3 days for pickup
     - User-specific reservation tracking
     - Cancelation endpoint
     """
     queryset = Reservation.objects.all().select_related("book", "user")
     serializer_class = ReservationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
 
     def perform_create(self, serializer):
-        expires_at = timezone.now() + timezone.timedelta(days=3)
-        reservation = serializer.save(user=self.request.user, expires_at=expires_at)
-        profile = self.request.user.profile
-        current_history = profile.activity_history or ""
-        new_history_line = f"Reservation created for '{reservation.book.title}' on {timezone.now()}\n"
-        profile.activity_history = current_history + new_history_line
-        profile.save()
+        reservation = serializer.save(user=self.request.user)
+        activity.record(
+            self.request.user, "RESERVATION_CREATED",
+            f"Reservation created for '{reservation.book.title}'", book=reservation.book,
+        )
 
     @action(detail=True, methods=["post"])
     def cancel_reservation(self, request, pk=None):
         reservation = self.get_object()
         if reservation.user != request.user:
             return Response({"error": "You can only cancel your own reservations."}, status=status.HTTP_403_FORBIDDEN)
-        reservation.cancel_reservation()
+        try:
+            # Re-checked under lock: the hold may have been picked up or expired since it was read
+            reservation.cancel_reservation()
+        except circulation.HoldClosed:
+            return Response({"error": "Reservation is no longer active."}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"message": "Reservation cancelled successfully."})
 
     @action(detail=False, methods=["get"])
     def my_reservations(self, request):
-        reservations = Reservation.objects.filter(user=request.user, status="ACTIVE")
-        serializer = self.get_serializer(reservations, many=True)
-        return Response(serializer.data)
+        reservations = Reservation.objects.filter(user=request.user, status__in=("WAITING", "ACTIVE")).select_related("book", "user")
+        page = self.paginate_queryset(reservations)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -164,9 +327,33 @@ class ReviewViewSet(viewsets.ModelViewSet):
     Permissions:
     - Authenticated users: Create/read
     - Admins only: Delete
+
+    Security:
+    - Readers list and edit their own reviews; ?book= lists everyone's
+      reviews of that book
+    - Librarians/admins see every review
+
+    Parameters:
+    - book: reviews of one book (review_book_created_idx)
+    - user (librarians/admins): reviews by one user
     """
     queryset = Review.objects.all().select_related("book", "user")
     serializer_class = ReviewSerializer
+    cursor_ordering = ("-created_at", "-id")
+
+    def get_queryset(self):
+        """Scope reviews to the caller unless staff or listing a book's reviews"""
+        queryset = super().get_queryset()
+        user = self.request.user
+        user_id, book_id = id_param(self.request, "user"), id_param(self.request, "book")
+        if book_id is not None:
+            queryset = queryset.filter(book_id=book_id)
+        if is_staff_role(user):
+            if user_id is not None:
+                queryset = queryset.filter(user_id=user_id)
+        elif book_id is None or self.action != "list":
+            queryset = queryset.filter(user=user)
+        return queryset
 
     def get_permissions(self):
         if self.action == "destroy":
@@ -202,12 +389,15 @@ class GoogleBooksSearchView(APIView):
             "q": query,
             "maxResults": 5  # max results, is editable
         }
+        started = time.perf_counter()
         try:
             response = requests.get(google_api_url, params=params)
             response.raise_for_status()
         except requests.RequestException as e:
+            metrics.GOOGLE_BOOKS_LATENCY.observe(time.perf_counter() - started, outcome="error")
             return Response({"error": "Failed to fetch data from Google Books API.", "details": str(e)},
                             status=status.HTTP_502_BAD_GATEWAY)
+        metrics.GOOGLE_BOOKS_LATENCY.observe(time.perf_counter() - started, outcome="ok")
         
         data = response.json()
         return Response(data, status=status.HTTP_200_OK)
@@ -224,6 +414,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
     queryset = Profile.objects.select_related("user").all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("id",)
 
     def get_queryset(self):
         user = self.request.user
@@ -235,6 +426,26 @@ class ProfileViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
         
 
+class ActivityEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Paginated, newest-first activity log
+
+    Security:
+    - Users see only their own events
+    - Librarians and admins may pass ?user=<id> to read another user's log
+    """
+    serializer_class = ActivityEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
+
+    def get_queryset(self):
+        user = self.request.user
+        user_id = id_param(self.request, "user")
+        if is_staff_role(user) and user_id is not None:
+            return ActivityEvent.objects.filter(user_id=user_id)
+        return ActivityEvent.objects.filter(user=user)
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     User management endpoint
@@ -245,6 +456,7 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    cursor_ordering = ("id",)
 
     def get_permissions(self):
         if self.action in ["retrieve", "update", "partial_update", "destroy"]:
@@ -302,29 +514,54 @@ class UserDashboardView(APIView):
     - Active loans
     - Current reservations
     - Review history
+    - Ten most recent activity events
+
+    Performance:
+    - Five queries in total (one per section), with related books and
+      users joined in
+    - Payload cached per user until one of their loans, reservations,
+      reviews, activity events or profile changes (bounded by
+      DASHBOARD_CACHE_TIMEOUT)
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        """Compile dashboard data from multiple models"""
+        """Serve the cached dashboard, compiling it on a miss"""
         user = request.user
+        key = dashboard_cache_key(user.id)
+        data = cache.get(key)
+        if data is None:
+            data = self.compile_dashboard(user)
+            cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+        return Response(data)
+
+    def compile_dashboard(self, user):
+        """Compile dashboard data from multiple models"""
         profile_data = ProfileSerializer(user.profile).data
         
-        active_loans = Loan.objects.filter(user=user, status="ACTIVE")
+        active_loans = (
+            Loan.objects.filter(user=user, status__in=("ACTIVE", "OVERDUE")).select_related("book", "user")
+        )
         loans_data = LoanSerializer(active_loans, many=True).data
 
-        active_reservations = Reservation.objects.filter(user=user, status="ACTIVE")
+        active_reservations = (
+            Reservation.objects.filter(user=user, status__in=("WAITING", "ACTIVE")).select_related("book", "user")
+        )
         reservations_data = ReservationSerializer(active_reservations, many=True).data
 
-        user_reviews = Review.objects.filter(user=user)
+        user_reviews = Review.objects.filter(user=user).select_related("user")
         reviews_data = ReviewSerializer(user_reviews, many=True).data
 
-        return Response({
+        recent_activity = ActivityEvent.objects.filter(user=user).order_by("-created_at", "-id")[:10]
+        activity_data = ActivityEventSerializer(recent_activity, many=True).data
+
+        return {
             "profile": profile_data,
             "active_loans": loans_data,
             "active_reservations": reservations_data,
-            "reviews": reviews_data
-        })
+            "reviews": reviews_data,
+            "recent_activity": activity_data,
+        }
 
 
 class StatisticsView(APIView):
@@ -334,70 +571,125 @@ class StatisticsView(APIView):
     Returns comprehensive statistics including:
     - Most borrowed books
     - Most active users
-    - Overdue loans count
-    - Available books count
+    - Overdue loans count and outstanding fines (as stored by sweep_overdue)
+    - Available books count, and copies on the shelf / on loan
     - Total loans by status
     - Average book ratings
+
+    Performance:
+    - Headline counters come from the materialized LibraryCounter table
+    - Rankings and time-window figures are cached for STATISTICS_CACHE_TIMEOUT
+
+    Parameters:
+    - fresh=1 (librarians/admins): recompute everything from the source tables
     """
     permission_classes = [permissions.IsAuthenticated]
+    rankings_cache_key = "library:statistics:rankings"
 
     def get(self, request):
         """Compile comprehensive library statistics"""
+        fresh = request.query_params.get("fresh") == "1" and request.user.role in ("librarian", "admin")
+        counters = stats.recompute() if fresh else stats.read_counters()
+
+        rankings = None if fresh else cache.get(self.rankings_cache_key)
+        if rankings is None:
+            rankings = self.compute_rankings()
+            cache.set(self.rankings_cache_key, rankings, settings.STATISTICS_CACHE_TIMEOUT)
+
+        return Response({
+            'most_borrowed_books': rankings['most_borrowed_books'],
+            'most_active_users': rankings['most_active_users'],
+            'books_statistics': {
+                'total': counters['books_total'],
+                'available': counters['books_available'],
+                'borrowed': counters['books_total'] - counters['books_available'],
+                'copies': {
+                    'total': counters['copies_total'],
+                    'available': counters['copies_available'],
+                    'on_loan': counters['copies_total'] - counters['copies_available'],
+                },
+            },
+            'loans_statistics': {
+                'by_status': {
+                    'active': counters['loans_active'],
+                    'returned': counters['loans_returned'],
+                    'overdue': counters['loans_overdue'],
+                },
+                'overdue_count': counters['loans_overdue'],
+                'outstanding_fines': rankings['outstanding_fines'],
+                'recent_loans_30_days': rankings['recent_loans_30_days'],
+            },
+            'reservations_statistics': {
+                'waiting': counters['reservations_waiting'],
+                'active': counters['reservations_active'],
+                'fulfilled': counters['reservations_fulfilled'],
+                'expired': counters['reservations_expired'],
+            },
+            'top_rated_books': rankings['top_rated_books'],
+            'categories_distribution': rankings['categories_distribution'],
+        })
+
+    def top_loan_counts(self, field, limit=10):
+        """
+        The `limit` values of field with the most loans, live and archived
+
+        Returns (value, loan count) pairs, most loans first. The database
+        groups one UNION ALL of both tables and returns only the top rows;
+        the ORM cannot aggregate over a union, hence the raw SQL. field is
+        always a column name from this class, never user input.
+        """
+        column = connection.ops.quote_name(field)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {column}, COUNT(*) AS loan_count FROM ("
+                f"SELECT {column} FROM {Loan._meta.db_table} "
+                f"UNION ALL SELECT {column} FROM {LoanArchive._meta.db_table}"
+                f") AS history GROUP BY {column} ORDER BY loan_count DESC, {column} LIMIT %s",
+                [limit],
+            )
+            return cursor.fetchall()
+
+    def compute_rankings(self):
+        """Compute the statistics that cannot be maintained incrementally"""
+        # Most borrowed books (top 10), over live and archived loans
+        borrowed = self.top_loan_counts('book_id')
+        books = Book.objects.in_bulk([pk for pk, _ in borrowed])
+        most_borrowed = [
+            {'book__id': pk, 'book__title': books[pk].title, 'book__author': books[pk].author, 'loan_count': count}
+            for pk, count in borrowed
+        ]
         
-        # Most borrowed books (top 10)
-        most_borrowed = (
-            Loan.objects
-            .values('book__id', 'book__title', 'book__author')
-            .annotate(loan_count=Count('id'))
-            .order_by('-loan_count')[:10]
-        )
-        
-        # Most active users (top 10)
-        most_active_users = (
-            Loan.objects
-            .values('user__id', 'user__username')
-            .annotate(loan_count=Count('id'))
-            .order_by('-loan_count')[:10]
-        )
-        
-        # Overdue loans count
-        today = timezone.now().date()
-        overdue_count = Loan.objects.filter(
-            status='ACTIVE',
-            due_date__lt=today
-        ).count()
-        
-        # Books availability statistics
-        total_books = Book.objects.count()
-        available_books = Book.objects.filter(is_available=True).count()
-        borrowed_books = total_books - available_books
-        
-        # Loans by status
-        loans_by_status = {
-            'active': Loan.objects.filter(status='ACTIVE').count(),
-            'returned': Loan.objects.filter(status='RETURNED').count(),
-            'overdue': Loan.objects.filter(status='OVERDUE').count(),
-        }
+        # Most active users (top 10), over live and archived loans
+        borrowers = self.top_loan_counts('user_id')
+        users = User.objects.in_bulk([pk for pk, _ in borrowers])
+        most_active_users = [
+            {'user__id': pk, 'user__username': users[pk].username, 'loan_count': count}
+            for pk, count in borrowers
+        ]
         
-        # Total loans in last 30 days
+        # Outstanding fines (kept current by sweep_overdue) and loans in the last 30 days, in one pass
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_loans = Loan.objects.filter(loan_date__gte=thirty_days_ago).count()
-        
-        # Average book ratings
-        books_with_ratings = (
-            Review.objects
-            .values('book__id', 'book__title')
-            .annotate(
-                avg_rating=Avg('rating'),
-                review_count=Count('id')
-            )
-            .filter(review_count__gte=1)
-            .order_by('-avg_rating')[:10]
+        loan_windows = Loan.objects.aggregate(
+            outstanding_fines=Sum('fine', filter=Q(status='OVERDUE'), default=Decimal('0')),
+            recent_loans_30_days=Count('id', filter=Q(loan_date__gte=thirty_days_ago)),
         )
+        loan_windows['recent_loans_30_days'] += LoanArchive.objects.filter(loan_date__gte=thirty_days_ago).count()
         
-        # Reservations statistics
-        active_reservations = Reservation.objects.filter(status='ACTIVE').count()
-        expired_reservations = Reservation.objects.filter(status='EXPIRED').count()
+        # Top rated books, from the denormalized aggregates (book_top_rated_idx)
+        books_with_ratings = [
+            {
+                'book__id': book['id'],
+                'book__title': book['title'],
+                'avg_rating': book['rating_avg'],
+                'review_count': book['rating_count'],
+            }
+            for book in (
+                Book.objects
+                .filter(rating_count__gt=0)
+                .order_by('-rating_avg', '-rating_count')
+                .values('id', 'title', 'rating_avg', 'rating_count')[:10]
+            )
+        ]
         
         # Categories distribution
         categories_distribution = (
@@ -407,23 +699,94 @@ class StatisticsView(APIView):
             .order_by('-count')
         )
         
-        return Response({
+        return {
             'most_borrowed_books': list(most_borrowed),
             'most_active_users': list(most_active_users),
-            'books_statistics': {
-                'total': total_books,
-                'available': available_books,
-                'borrowed': borrowed_books,
-            },
-            'loans_statistics': {
-                'by_status': loans_by_status,
-                'overdue_count': overdue_count,
-                'recent_loans_30_days': recent_loans,
-            },
-            'reservations_statistics': {
-                'active': active_reservations,
-                'expired': expired_reservations,
-            },
-            'top_rated_books': list(books_with_ratings),
+            'outstanding_fines': f"{loan_windows['outstanding_fines']:.2f}",
+            'recent_loans_30_days': loan_windows['recent_loans_30_days'],
+            'top_rated_books': books_with_ratings,
             'categories_distribution': list(categories_distribution),
-        })
\ No newline at end of file
+        }
+
+
+class CirculationStatisticsView(APIView):
+    """
+    Library-wide circulation and fine analytics
+
+    Returns:
+    - Loan totals (returned, open, overdue, distinct borrowers)
+    - Fines charged on late returns and outstanding on open loans
+    - Late return rate and days-overdue distribution of open loans
+    - Mean and percentile loan duration, overall and per category
+
+    Performance:
+    - Computed with vectorized NumPy operations over the loan columns
+      (see analytics.py) and cached for STATISTICS_CACHE_TIMEOUT
+
+    Parameters:
+    - fresh=1 (librarians/admins): bypass the cache
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    cache_key = "library:statistics:circulation"
+
+    def get(self, request):
+        """Serve the cached circulation report, computing it on a miss"""
+        fresh = request.query_params.get("fresh") == "1" and request.user.role in ("librarian", "admin")
+        report = None if fresh else cache.get(self.cache_key)
+        if report is None:
+            report = analytics.circulation_report()
+            cache.set(self.cache_key, report, settings.STATISTICS_CACHE_TIMEOUT)
+        return Response(report)
+
+
+class MetricsView(APIView):
+    """
+    Prometheus scrape endpoint for the node's metrics (see metrics.py)
+
+    Returns:
+    - Request counts, latency and database time histograms per route
+    - Google Books proxy latency
+    - Cache hits/misses and the library counters, read at scrape time
+
+    Security:
+    - Admins only
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(metrics.registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class ProfileListView(APIView):
+    """
+    Stored request profiles (see profiling.py)
+
+    Returns:
+    - One entry per profile, newest first: id, mode, route, status,
+      timings, query count, file names and, for memory profiles, the top
+      allocation sites
+
+    Security:
+    - Admins only
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(profiling.list_profiles())
+
+
+class ProfileDownloadView(APIView):
+    """
+    Download one file of a stored profile, e.g. /api/profiling/<id>.prof
+
+    Security:
+    - Admins only; only files named after a generated profile id are served
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request, filename):
+        profile_id, dot, extension = filename.partition(".")
+        path = profiling.profile_path(profile_id, dot + extension)
+        if path is None:
+            raise Http404
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=filename)
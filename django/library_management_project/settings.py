@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+import sys
+import tempfile
 
 # Try to import decouple, fall back to os.environ if not available (CI environment)
 try:
@@ -23,10 +25,14 @@ except ImportError:
         return lambda value: [item.strip() for item in value.split(',') if item.strip()]
 
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # BASE_DIR set using Path - this is the preferred way
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# True under `manage.py test`: the suite gets its own cache (see CACHES)
+TESTING = sys.argv[1:2] == ['test']
+
 # DEBUG and SECRET_KEY taken from environment variables (defaults to True for developer)
 DEBUG = config('DJANGO_DEBUG', default=True, cast=bool)
 SECRET_KEY = config('DJANGO_SECRET_KEY', default='django-insecure-2%@3^t6d2%#c2dj^jjien#3g*u1isc+&19#hk1_jrh5#a767i&')
@@ -55,11 +61,14 @@ MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'library.middleware.QueryInstrumentationMiddleware',
+    'library.middleware.MetricsMiddleware',
     'library.middleware.RequestLogMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'library.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -133,15 +142,58 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "library.pagination.KeysetPagination",
+    "PAGE_SIZE": config('API_PAGE_SIZE', default=50, cast=int),
 }
 
+# Book and loan listings are built from values_list() rows instead of
+# per-object serializers (library/listing.py); False restores the serializers
+FAST_LISTS = config('FAST_LISTS', default=True, cast=bool)
+
+# Opt-in ?page_size= caps per list endpoint, keyed by router basename,
+# e.g. PAGE_SIZE_LIMITS="book:200,loan:100". Endpoints without an entry
+# ignore ?page_size= and always return PAGE_SIZE items.
+def page_size_limits(value):
+    """Parse "basename:limit,..." into {basename: limit}, rejecting malformed entries"""
+    limits = {}
+    for item in Csv()(value):
+        basename, _, limit = (part.strip() for part in item.partition(':'))
+        if not basename or not limit.isdigit() or int(limit) < 1:
+            raise ImproperlyConfigured(
+                f"PAGE_SIZE_LIMITS entry {item!r} must be basename:limit with a positive integer limit, "
+                f"e.g. book:200."
+            )
+        limits[basename] = int(limit)
+    return limits
+
+
+PAGE_SIZE_LIMITS = config('PAGE_SIZE_LIMITS', default='', cast=page_size_limits)
+
 # CACHE CONFIGURATION
+# Node-local SQLite (WAL) cache shared by every worker process, with LRU
+# eviction once MAX_SIZE bytes or MAX_ENTRIES entries are exceeded.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+        "BACKEND": "library.cache_backends.SQLiteCache",
+        "LOCATION": config('CACHE_LOCATION', default=str(BASE_DIR / 'cache.sqlite3')),
+        "OPTIONS": {
+            "MAX_SIZE": config('CACHE_MAX_SIZE', default=64 * 1024 * 1024, cast=int),
+            "MAX_ENTRIES": config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+            "CULL_FREQUENCY": 10,
+        },
     }
 }
+if TESTING:
+    # Tests clear the cache freely: they get a cache file of their own,
+    # never the developer's
+    CACHES["default"]["LOCATION"] = os.path.join(tempfile.gettempdir(), 'library-test-cache.sqlite3')
+
+# Seconds StatisticsView caches rankings and time-window figures;
+# headline counters are always live.
+STATISTICS_CACHE_TIMEOUT = config('STATISTICS_CACHE_TIMEOUT', default=300, cast=int)
+
+# Upper bound in seconds on a cached user dashboard; writes invalidate it sooner.
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
 
 # Security - settings for production and development
 if not DEBUG:  # Production environment
@@ -167,6 +219,69 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # EMAIL_HOST_USER = 'your_email@example.com'
 # EMAIL_HOST_PASSWORD = 'your_password'
 
+# notify_overdue emails each overdue loan at most once per this many hours
+OVERDUE_NOTIFICATION_INTERVAL_HOURS = config('OVERDUE_NOTIFICATION_INTERVAL_HOURS', default=24, cast=int)
+
+# expire_reservations deletes closed reservations older than this many days (0 keeps them)
+RESERVATION_RETENTION_DAYS = config('RESERVATION_RETENTION_DAYS', default=365, cast=int)
+
+# archive_loans moves loans returned more than this many days ago to LoanArchive
+LOAN_ARCHIVE_AFTER_DAYS = config('LOAN_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+
+# Request logging (library.middleware.RequestLogMiddleware): fraction of
+# requests logged, and latency in ms above which a request is always logged.
+# Slow and failed requests are logged whatever the sample rate.
+REQUEST_LOG_SAMPLE_RATE = config('REQUEST_LOG_SAMPLE_RATE', default=0.1, cast=float)
+REQUEST_LOG_SLOW_MS = config('REQUEST_LOG_SLOW_MS', default=500, cast=float)
+
+# Per-request query counting, Server-Timing headers and N+1 warnings
+# (library.middleware.QueryInstrumentationMiddleware); a query shape run
+# N_PLUS_ONE_THRESHOLD or more times in one request is logged
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=True, cast=bool)
+N_PLUS_ONE_THRESHOLD = config('N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+
+# In-process metrics (library/metrics.py), shared by the workers on a node
+# through a SQLite file and exposed to admins at /api/metrics/
+METRICS_LOCATION = config('METRICS_LOCATION', default=str(BASE_DIR / 'metrics.sqlite3'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5.0, cast=float)
+if TESTING:
+    # Requests made by tests are counted too: keep them out of the
+    # developer's metrics file
+    METRICS_LOCATION = os.path.join(tempfile.gettempdir(), 'library-test-metrics.sqlite3')
+
+# On-demand profiling of single requests (library/profiling.py): admins send
+# "X-Profile: cpu" or "X-Profile: memory"; the newest PROFILE_KEEP profiles
+# are kept in PROFILE_DIR and listed at /api/profiling/
+PROFILING = config('PROFILING', default=True, cast=bool)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+PROFILE_KEEP = config('PROFILE_KEEP', default=50, cast=int)
+
+# Structured request records and query warnings go through a queue to a background writer
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "json": {
+            "class": "library.request_log.QueueStreamHandler",
+        },
+    },
+    "loggers": {
+        "library.requests": {
+            "handlers": ["json"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "library.queries": {
+            "handlers": ["json"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+if TESTING:
+    # Keep JSON records out of the test output; assertLogs() still sees them
+    LOGGING["handlers"]["json"] = {"class": "logging.NullHandler"}
+
 
 AUTH_USER_MODEL = "library.CustomUser"
 
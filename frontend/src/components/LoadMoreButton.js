@@ -0,0 +1,24 @@
+import React from 'react';
+import { Loader2 } from 'lucide-react';
+
+const LoadMoreButton = ({ hasMore, loading, onClick, text = 'Load more' }) => {
+  if (!hasMore) {
+    return null;
+  }
+
+  return (
+    <div className="flex justify-center py-4">
+      <button
+        type="button"
+        onClick={onClick}
+        disabled={loading}
+        className="flex items-center space-x-2 px-4 py-2 bg-gray-100 text-gray-700 rounded-md hover:bg-gray-200 transition-colors disabled:opacity-50"
+      >
+        {loading && <Loader2 className="h-4 w-4 animate-spin" />}
+        <span>{loading ? 'Loading...' : text}</span>
+      </button>
+    </div>
+  );
+};
+
+export default LoadMoreButton;
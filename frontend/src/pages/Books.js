@@ -1,13 +1,13 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { booksAPI, loansAPI } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import { BookOpen, Plus, Edit, Trash2, Search, X, CheckCircle, AlertCircle, BookMarked, ArrowUpDown } from 'lucide-react';
 import LoadingSpinner from '../components/LoadingSpinner';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../utils/usePagedList';
 import { validateBookForm, hasErrors } from '../utils/validation';
 
 const Books = () => {
-  const [books, setBooks] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedCategory, setSelectedCategory] = useState('all');
@@ -28,23 +28,32 @@ const Books = () => {
     category: '',
   });
 
+  // Wait for typing to pause before searching the catalog
+  const [debouncedQuery, setDebouncedQuery] = useState('');
   useEffect(() => {
-    fetchBooks();
-  }, []);
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
-  const fetchBooks = async () => {
-    try {
-      setLoading(true);
-      const response = await booksAPI.getAll();
-      setBooks(response.data);
-      setError('');
-    } catch (err) {
-      setError('Failed to fetch books');
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
+  // Search and the category filter run on the server over the whole catalog
+  // (?q= and ?category=); results are read a page at a time and sorting
+  // applies to the pages loaded so far
+  const fetchPage = useCallback((cursorUrl) => {
+    const params = {};
+    if (debouncedQuery) params.q = debouncedQuery;
+    if (selectedCategory !== 'all') params.category = selectedCategory;
+    return booksAPI.getPage(cursorUrl, params);
+  }, [debouncedQuery, selectedCategory]);
+
+  const {
+    items: books,
+    hasMore,
+    loading,
+    loadingMore,
+    error: booksError,
+    reload: fetchBooks,
+    loadMore,
+  } = usePagedList(fetchPage);
 
   const handleSearchGoogle = async () => {
     if (!searchQuery.trim()) return;
@@ -159,19 +168,15 @@ const Books = () => {
 
   const isLibrarian = user?.role === 'librarian' || user?.role === 'admin';
 
-  // Get unique categories from books
-  const categories = ['all', ...new Set(books.map(book => book.category).sort())];
+  // Remember every category seen so far, so narrowing the list does not
+  // shrink the category menu
+  const [knownCategories, setKnownCategories] = useState([]);
+  useEffect(() => {
+    setKnownCategories((current) => [...new Set([...current, ...books.map(book => book.category)])].sort());
+  }, [books]);
+  const categories = ['all', ...knownCategories];
 
-  const filteredBooks = books
-    .filter(book => {
-      const matchesSearch = book.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        book.author.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        book.category.toLowerCase().includes(searchQuery.toLowerCase());
-      
-      const matchesCategory = selectedCategory === 'all' || book.category === selectedCategory;
-      
-      return matchesSearch && matchesCategory;
-    })
+  const sortedBooks = [...books]
     .sort((a, b) => {
       let aValue = a[sortBy];
       let bValue = b[sortBy];
@@ -210,10 +215,10 @@ const Books = () => {
         )}
       </div>
 
-      {error && (
+      {(error || booksError) && (
         <div className="bg-red-50 border border-red-200 rounded-md p-4 flex items-center space-x-3">
           <AlertCircle className="h-5 w-5 text-red-600" />
-          <span className="text-red-700">{error}</span>
+          <span className="text-red-700">{error || 'Failed to fetch books'}</span>
         </div>
       )}
 
@@ -265,7 +270,7 @@ const Books = () => {
         </div>
         <div className="mt-3 flex items-center justify-between">
           <span className="text-sm text-gray-600">
-            Showing <strong>{filteredBooks.length}</strong> of <strong>{books.length}</strong> books
+            Showing <strong>{sortedBooks.length}</strong> books{hasMore && ' (more available)'}
           </span>
           {(selectedCategory !== 'all' || searchQuery) && (
             <button
@@ -286,7 +291,7 @@ const Books = () => {
         <LoadingSpinner size="lg" text="Loading books..." />
       ) : (
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-          {filteredBooks.map((book) => (
+          {sortedBooks.map((book) => (
             <div key={book.id} className="bg-white rounded-lg shadow-md p-6 hover:shadow-lg transition-shadow">
               <div className="flex items-start justify-between mb-4">
                 <BookOpen className="h-8 w-8 text-blue-600" />
@@ -346,12 +351,16 @@ const Books = () => {
         </div>
       )}
 
-      {filteredBooks.length === 0 && !loading && (
+      {sortedBooks.length === 0 && !loading && (
         <div className="text-center py-12 text-gray-500">
           No books found
         </div>
       )}
 
+      {!loading && (
+        <LoadMoreButton hasMore={hasMore} loading={loadingMore} onClick={loadMore} text="Load more books" />
+      )}
+
       {/* Add/Edit Modal */}
       {(showAddModal || showEditModal) && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center p-4 z-50">
@@ -113,14 +113,16 @@ const Dashboard = () => {
               )}
             </div>
             
-            {dashboardData.profile.activity_history && (
+            {dashboardData.recent_activity && dashboardData.recent_activity.length > 0 && (
               <div className="mt-4 pt-4 border-t">
-                <p className="text-sm text-gray-600 mb-2">Activity History</p>
-                <div className="bg-gray-50 rounded-md p-3 max-h-40 overflow-y-auto">
-                  <pre className="text-xs text-gray-700 whitespace-pre-wrap">
-                    {dashboardData.profile.activity_history}
-                  </pre>
-                </div>
+                <p className="text-sm text-gray-600 mb-2">Recent Activity</p>
+                <ul className="bg-gray-50 rounded-md p-3 max-h-40 overflow-y-auto space-y-1">
+                  {dashboardData.recent_activity.map((event) => (
+                    <li key={event.id} className="text-xs text-gray-700">
+                      {event.description} — {new Date(event.created_at).toLocaleString()}
+                    </li>
+                  ))}
+                </ul>
               </div>
             )}
           </div>
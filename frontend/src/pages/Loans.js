@@ -1,52 +1,39 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { loansAPI, booksAPI } from '../services/api';
 import { BookMarked, Plus, X, AlertCircle } from 'lucide-react';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../utils/usePagedList';
 
 const Loans = () => {
-  const [loans, setLoans] = useState([]);
-  const [books, setBooks] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showAddModal, setShowAddModal] = useState(false);
   const [formData, setFormData] = useState({
     book: '',
     due_date: '',
   });
-
-  useEffect(() => {
-    fetchLoans();
-    fetchBooks();
-  }, []);
-
-  const fetchLoans = async () => {
-    try {
-      setLoading(true);
-      const response = await loansAPI.getAll();
-      setLoans(response.data);
-      setError('');
-    } catch (err) {
-      setError('Failed to fetch loans');
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  const fetchBooks = async () => {
-    try {
-      const response = await booksAPI.getAll();
-      setBooks(response.data.filter(book => book.is_available));
-    } catch (err) {
-      console.error('Failed to fetch books:', err);
-    }
-  };
+  const {
+    items: loans,
+    hasMore: hasMoreLoans,
+    loading,
+    loadingMore: loadingMoreLoans,
+    error: loansError,
+    reload: fetchLoans,
+    loadMore: loadMoreLoans,
+  } = usePagedList(loansAPI.getPage);
+  // Books are only listed while the borrow form is open, a page at a time
+  const {
+    items: bookPage,
+    hasMore: hasMoreBooks,
+    loadingMore: loadingMoreBooks,
+    loadMore: loadMoreBooks,
+  } = usePagedList(booksAPI.getPage, { enabled: showAddModal });
+  const books = bookPage.filter(book => book.is_available);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
       await loansAPI.create(formData);
       fetchLoans();
-      fetchBooks();
       setShowAddModal(false);
       setFormData({ book: '', due_date: '' });
     } catch (err) {
@@ -59,7 +46,6 @@ const Loans = () => {
     try {
       await loansAPI.returnBook(id);
       fetchLoans();
-      fetchBooks();
     } catch (err) {
       setError('Failed to return book');
       console.error(err);
@@ -92,10 +78,10 @@ const Loans = () => {
         </button>
       </div>
 
-      {error && (
+      {(error || loansError) && (
         <div className="bg-red-50 border border-red-200 rounded-md p-4 flex items-center space-x-3">
           <AlertCircle className="h-5 w-5 text-red-600" />
-          <span className="text-red-700">{error}</span>
+          <span className="text-red-700">{error || 'Failed to fetch loans'}</span>
         </div>
       )}
 
@@ -170,6 +156,7 @@ const Loans = () => {
               No loans found
             </div>
           )}
+          <LoadMoreButton hasMore={hasMoreLoans} loading={loadingMoreLoans} onClick={loadMoreLoans} text="Load more loans" />
         </div>
       )}
 
@@ -206,6 +193,7 @@ const Loans = () => {
                       </option>
                     ))}
                   </select>
+                  <LoadMoreButton hasMore={hasMoreBooks} loading={loadingMoreBooks} onClick={loadMoreBooks} text="Load more books" />
                 </div>
 
                 <div>
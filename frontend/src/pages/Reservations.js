@@ -1,42 +1,30 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { reservationsAPI, booksAPI } from '../services/api';
 import { Calendar, Plus, X, AlertCircle } from 'lucide-react';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../utils/usePagedList';
 
 const Reservations = () => {
-  const [reservations, setReservations] = useState([]);
-  const [books, setBooks] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showAddModal, setShowAddModal] = useState(false);
   const [formData, setFormData] = useState({ book: '' });
-
-  useEffect(() => {
-    fetchReservations();
-    fetchBooks();
-  }, []);
-
-  const fetchReservations = async () => {
-    try {
-      setLoading(true);
-      const response = await reservationsAPI.getAll();
-      setReservations(response.data);
-      setError('');
-    } catch (err) {
-      setError('Failed to fetch reservations');
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  const fetchBooks = async () => {
-    try {
-      const response = await booksAPI.getAll();
-      setBooks(response.data.filter(book => book.is_available));
-    } catch (err) {
-      console.error('Failed to fetch books:', err);
-    }
-  };
+  const {
+    items: reservations,
+    hasMore: hasMoreReservations,
+    loading,
+    loadingMore: loadingMoreReservations,
+    error: reservationsError,
+    reload: fetchReservations,
+    loadMore: loadMoreReservations,
+  } = usePagedList(reservationsAPI.getPage);
+  // Books are only listed while the reservation form is open, a page at a time
+  const {
+    items: bookPage,
+    hasMore: hasMoreBooks,
+    loadingMore: loadingMoreBooks,
+    loadMore: loadMoreBooks,
+  } = usePagedList(booksAPI.getPage, { enabled: showAddModal });
+  const books = bookPage.filter(book => book.is_available);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -89,10 +77,10 @@ const Reservations = () => {
         </button>
       </div>
 
-      {error && (
+      {(error || reservationsError) && (
         <div className="bg-red-50 border border-red-200 rounded-md p-4 flex items-center space-x-3">
           <AlertCircle className="h-5 w-5 text-red-600" />
-          <span className="text-red-700">{error}</span>
+          <span className="text-red-700">{error || 'Failed to fetch reservations'}</span>
         </div>
       )}
 
@@ -161,6 +149,7 @@ const Reservations = () => {
               No reservations found
             </div>
           )}
+          <LoadMoreButton hasMore={hasMoreReservations} loading={loadingMoreReservations} onClick={loadMoreReservations} text="Load more reservations" />
         </div>
       )}
 
@@ -197,6 +186,7 @@ const Reservations = () => {
                       </option>
                     ))}
                   </select>
+                  <LoadMoreButton hasMore={hasMoreBooks} loading={loadingMoreBooks} onClick={loadMoreBooks} text="Load more books" />
                   <p className="mt-2 text-sm text-gray-500">
                     Reservation will expire in 3 days
                   </p>
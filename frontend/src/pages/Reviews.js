@@ -1,12 +1,11 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState } from 'react';
 import { reviewsAPI, booksAPI } from '../services/api';
 import { Star, Plus, X, AlertCircle, Trash2 } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import LoadMoreButton from '../components/LoadMoreButton';
+import usePagedList from '../utils/usePagedList';
 
 const Reviews = () => {
-  const [reviews, setReviews] = useState([]);
-  const [books, setBooks] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showAddModal, setShowAddModal] = useState(false);
   const [formData, setFormData] = useState({
@@ -15,34 +14,22 @@ const Reviews = () => {
     comment: '',
   });
   const { user } = useAuth();
-
-  useEffect(() => {
-    fetchReviews();
-    fetchBooks();
-  }, []);
-
-  const fetchReviews = async () => {
-    try {
-      setLoading(true);
-      const response = await reviewsAPI.getAll();
-      setReviews(response.data);
-      setError('');
-    } catch (err) {
-      setError('Failed to fetch reviews');
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
-  const fetchBooks = async () => {
-    try {
-      const response = await booksAPI.getAll();
-      setBooks(response.data);
-    } catch (err) {
-      console.error('Failed to fetch books:', err);
-    }
-  };
+  const {
+    items: reviews,
+    hasMore: hasMoreReviews,
+    loading,
+    loadingMore: loadingMoreReviews,
+    error: reviewsError,
+    reload: fetchReviews,
+    loadMore: loadMoreReviews,
+  } = usePagedList(reviewsAPI.getPage);
+  // Books are only listed while the review form is open, a page at a time
+  const {
+    items: books,
+    hasMore: hasMoreBooks,
+    loadingMore: loadingMoreBooks,
+    loadMore: loadMoreBooks,
+  } = usePagedList(booksAPI.getPage, { enabled: showAddModal });
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -99,10 +86,10 @@ const Reviews = () => {
         </button>
       </div>
 
-      {error && (
+      {(error || reviewsError) && (
         <div className="bg-red-50 border border-red-200 rounded-md p-4 flex items-center space-x-3">
           <AlertCircle className="h-5 w-5 text-red-600" />
-          <span className="text-red-700">{error}</span>
+          <span className="text-red-700">{error || 'Failed to fetch reviews'}</span>
         </div>
       )}
 
@@ -150,6 +137,10 @@ const Reviews = () => {
         </div>
       )}
 
+      {!loading && (
+        <LoadMoreButton hasMore={hasMoreReviews} loading={loadingMoreReviews} onClick={loadMoreReviews} text="Load more reviews" />
+      )}
+
       {/* Add Review Modal */}
       {showAddModal && (
         <div className="fixed inset-0 bg-black bg-opacity-50 flex items-center justify-center p-4 z-50">
@@ -183,6 +174,7 @@ const Reviews = () => {
                       </option>
                     ))}
                   </select>
+                  <LoadMoreButton hasMore={hasMoreBooks} loading={loadingMoreBooks} onClick={loadMoreBooks} text="Load more books" />
                 </div>
 
                 <div>
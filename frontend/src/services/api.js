@@ -55,6 +55,11 @@ api.interceptors.response.use(
   }
 );
 
+// Fetch one page of a paginated list: the first page, or the page behind a
+// `next` link returned with an earlier one. Query params only go on the first
+// request; `next` links already carry them.
+const pageOf = (url) => (cursorUrl, params) => api.get(cursorUrl || url, cursorUrl ? {} : { params });
+
 // Auth API
 export const authAPI = {
   login: (credentials) => axios.post(`${API_BASE_URL}/token/`, credentials),
@@ -64,7 +69,7 @@ export const authAPI = {
 
 // Books API
 export const booksAPI = {
-  getAll: () => api.get('/books/'),
+  getPage: pageOf('/books/'),
   getById: (id) => api.get(`/books/${id}/`),
   create: (bookData) => api.post('/books/', bookData),
   update: (id, bookData) => api.put(`/books/${id}/`, bookData),
@@ -74,24 +79,26 @@ export const booksAPI = {
 
 // Loans API
 export const loansAPI = {
-  getAll: () => api.get('/loans/'),
+  getPage: pageOf('/loans/'),
   getById: (id) => api.get(`/loans/${id}/`),
   create: (loanData) => api.post('/loans/', loanData),
   returnBook: (id) => api.post(`/loans/${id}/return_book/`),
+  bulkCheckout: (data) => api.post('/loans/bulk_checkout/', data),
+  bulkReturn: (loanIds) => api.post('/loans/bulk_return/', { loans: loanIds }),
 };
 
 // Reservations API
 export const reservationsAPI = {
-  getAll: () => api.get('/reservations/'),
+  getPage: pageOf('/reservations/'),
   getById: (id) => api.get(`/reservations/${id}/`),
   create: (reservationData) => api.post('/reservations/', reservationData),
   cancel: (id) => api.post(`/reservations/${id}/cancel_reservation/`),
-  getMy: () => api.get('/reservations/my_reservations/'),
+  getMyPage: pageOf('/reservations/my_reservations/'),
 };
 
 // Reviews API
 export const reviewsAPI = {
-  getAll: () => api.get('/reviews/'),
+  getPage: pageOf('/reviews/'),
   getById: (id) => api.get(`/reviews/${id}/`),
   create: (reviewData) => api.post('/reviews/', reviewData),
   delete: (id) => api.delete(`/reviews/${id}/`),
@@ -103,6 +110,11 @@ export const profileAPI = {
   update: (id, profileData) => api.put(`/profiles/${id}/`, profileData),
 };
 
+// Activity API
+export const activityAPI = {
+  getPage: pageOf('/activity/'),
+};
+
 // Dashboard API
 export const dashboardAPI = {
   get: () => api.get('/dashboard/'),
@@ -110,7 +122,7 @@ export const dashboardAPI = {
 
 // Users API
 export const usersAPI = {
-  getAll: () => api.get('/users/'),
+  getPage: pageOf('/users/'),
   getById: (id) => api.get(`/users/${id}/`),
   update: (id, userData) => api.put(`/users/${id}/`, userData),
   delete: (id) => api.delete(`/users/${id}/`),
@@ -0,0 +1,53 @@
+import { useState, useEffect, useCallback } from 'react';
+
+// Keeps a cursor-paginated list: the first page is fetched when the list is
+// enabled, and each later page only when loadMore() is called.
+// fetchPage(cursorUrl) must return the API response for one page.
+const usePagedList = (fetchPage, { enabled = true } = {}) => {
+  const [items, setItems] = useState([]);
+  const [next, setNext] = useState(null);
+  const [loading, setLoading] = useState(enabled);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [error, setError] = useState(null);
+
+  const reload = useCallback(async () => {
+    try {
+      setLoading(true);
+      const { data } = await fetchPage();
+      setItems(data.results ?? data);
+      setNext(data.next ?? null);
+      setError(null);
+    } catch (err) {
+      setError(err);
+      console.error(err);
+    } finally {
+      setLoading(false);
+    }
+  }, [fetchPage]);
+
+  const loadMore = useCallback(async () => {
+    if (!next) return;
+    try {
+      setLoadingMore(true);
+      const { data } = await fetchPage(next);
+      setItems((current) => [...current, ...data.results]);
+      setNext(data.next);
+      setError(null);
+    } catch (err) {
+      setError(err);
+      console.error(err);
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [fetchPage, next]);
+
+  useEffect(() => {
+    if (enabled) {
+      reload();
+    }
+  }, [enabled, reload]);
+
+  return { items, hasMore: Boolean(next), loading, loadingMore, error, reload, loadMore };
+};
+
+export default usePagedList;